@@ -1,21 +1,30 @@
 # app/__init__.py
+#
+# The exports are imported on first access (PEP 562), so importing one submodule, e.g.
+# app.utils.parsers in a document parser process, does not load every endpoint and provider.
+import importlib
 
-from .config import settings
-from app.endpoints import *
-from app.providers import *
-
-__all__ = [
-    "AzureProvider",
-    "ZillizProvider",
-    "settings",
+_EXPORTS = {
+    "AzureProvider": "app.providers",
+    "ZillizProvider": "app.providers",
+    "LocalProvider": "app.providers",
+    "settings": "app.config",
     # The exported names from endpoints
-    "wichita_router",
-    "wsu_router",
-    "qa_router",
-    "data_search_router",
-    "faq_router",
-    "transcribe_router",
-    "chatbot_router",
-    "ingest_router",
-    "data_delete_router",
-]
+    "wichita_router": "app.endpoints",
+    "wsu_router": "app.endpoints",
+    "qa_router": "app.endpoints",
+    "data_search_router": "app.endpoints",
+    "faq_router": "app.endpoints",
+    "transcribe_router": "app.endpoints",
+    "chatbot_router": "app.endpoints",
+    "ingest_router": "app.endpoints",
+    "data_delete_router": "app.endpoints",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
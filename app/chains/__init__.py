@@ -1,30 +1,42 @@
 from .retrieval_chain_zilliz import initialize_retrieval_chain as initialize_retrieval_chain_zilliz
 from .retrieval_chain_azure import initialize_retrieval_chain as initialize_retrieval_chain_azure
+from .retrieval_chain_local import initialize_retrieval_chain as initialize_retrieval_chain_local
 from .translation_chain_openai_api import initialize_translation_chain as initialize_translation_chain_openai_api
 from .translation_chain_azure import initialize_translation_chain as initialize_translation_chain_azure
 from .vector_store_azure import initialize_vector_store_azure
 from .vector_store_zilliz import initialize_vector_store_zilliz
+from .vector_store_local import initialize_vector_store_local, LocalVectorStore
 from .ingest_chain import initialize_ingest_chain, IngestionChainWrapper
+from .ingest_writers import KeyedIngestWriter, ZillizIngestWriter
 from .delete_documents_azure import delete_document as delete_document_azure
 from .delete_documents_azure import delete_all_documents as delete_all_documents_azure
+from .delete_documents_azure import delete_source as delete_source_azure
 from .delete_documents_zilliz import delete_document as delete_document_zilliz
 from .delete_documents_zilliz import delete_all_documents as delete_all_documents_zilliz
+from .delete_documents_zilliz import delete_source as delete_source_zilliz
 from .transcribe_openai_api import transcribe as transcribe_openai_api
 from .transcribe_azure import transcribe as transcribe_azure
 
 __all__ = [
     "initialize_retrieval_chain_zilliz",
     "initialize_retrieval_chain_azure",
+    "initialize_retrieval_chain_local",
     "initialize_vector_store_azure",
     "initialize_vector_store_zilliz",
+    "initialize_vector_store_local",
+    "LocalVectorStore",
     "initialize_translation_chain_openai_api",
     "initialize_translation_chain_azure",
     "initialize_ingest_chain",
     "IngestionChainWrapper",
+    "KeyedIngestWriter",
+    "ZillizIngestWriter",
     "transcribe_openai_api",
     "transcribe_azure",
     "delete_document_azure",
     "delete_all_documents_azure",
+    "delete_source_azure",
     "delete_document_zilliz",
-    "delete_all_documents_zilliz"
+    "delete_all_documents_zilliz",
+    "delete_source_zilliz"
 ]
\ No newline at end of file
@@ -0,0 +1,115 @@
+import logging
+from typing import List
+from langchain_core.documents import Document
+from app.config import settings
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Shortest shared span treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 50
+# Don't bother appending a truncated chunk with less room than this
+MIN_TRUNCATED_TOKENS = 50
+
+
+def overlap_length(first: str, second: str, max_overlap: int) -> int:
+    """
+    Returns the length of the longest suffix of `first` that is also a prefix of `second`
+    (at least MIN_OVERLAP_CHARS and at most max_overlap characters), or 0.
+    """
+    if len(first) < MIN_OVERLAP_CHARS or len(second) < MIN_OVERLAP_CHARS:
+        return 0
+    probe = second[:MIN_OVERLAP_CHARS]
+    position = first.find(probe, max(0, len(first) - max_overlap))
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(probe, position + 1)
+    return 0
+
+
+def merge_source_chunks(texts: List[str], max_overlap: int) -> List[str]:
+    """
+    Merges chunks of one source document that overlap (the splitter repeats up to
+    CHUNK_OVERLAP characters between neighbours) and drops chunks contained in another.
+    """
+    merged = list(texts)
+    changed = True
+    while changed and len(merged) > 1:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(len(merged)):
+                if i == j:
+                    continue
+                if merged[j] in merged[i]:
+                    del merged[j]
+                    changed = True
+                    break
+                overlap = overlap_length(merged[i], merged[j], max_overlap)
+                if overlap:
+                    merged[i] = merged[i] + merged[j][overlap:]
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+
+class ContextPacker:
+    """
+    Replaces format_docs: turns retrieved chunks into the prompt context.
+      1. Chunks from the same source are merged and their overlapping spans removed.
+      2. The result is packed, in retrieval rank order, into `token_budget` tokens;
+         the last chunk that does not fit is truncated.
+    Keeps running totals of prompt tokens before and after packing.
+    """
+    def __init__(self, token_budget: int = settings.CONTEXT_TOKEN_BUDGET, max_overlap: int = settings.CHUNK_OVERLAP):
+        self.token_budget = token_budget
+        self.max_overlap = max_overlap
+        self.requests = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def pack(self, docs: List[Document]) -> str:
+        # Group chunk texts by source, keeping sources in order of their best-ranked chunk
+        by_source = {}
+        for doc in docs:
+            by_source.setdefault(doc.metadata.get("name"), []).append(doc.page_content)
+
+        sections = []
+        for source, texts in by_source.items():
+            sections.extend(merge_source_chunks(texts, self.max_overlap) if source is not None else texts)
+
+        packed = []
+        used_tokens = 0
+        for section in sections:
+            section_tokens = count_tokens(section)
+            remaining = self.token_budget - used_tokens
+            if section_tokens <= remaining:
+                packed.append(section)
+                used_tokens += section_tokens
+                continue
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                packed.append(truncate_to_tokens(section, remaining))
+                used_tokens = self.token_budget
+            break
+
+        context = "\n\n".join(packed)
+        tokens_in = sum(count_tokens(doc.page_content) for doc in docs)
+        self.requests += 1
+        self.tokens_in += tokens_in
+        self.tokens_out += used_tokens
+        logger.debug(
+            "Packed %d chunks into %d sections: %d -> %d context tokens (%d saved)",
+            len(docs), len(packed), tokens_in, used_tokens, tokens_in - used_tokens,
+        )
+        return context
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "tokens_saved": self.tokens_in - self.tokens_out,
+        }
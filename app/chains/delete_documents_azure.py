@@ -1,6 +1,10 @@
+import json
+from typing import Iterable, Optional
 from azure.search.documents.aio import SearchClient
 from azure.core.credentials import AzureKeyCredential
 from app.config import settings
+from app.utils.jobs import Job
+from app.utils.bulk_delete import delete_ids, drain_delete
 
 async def delete_document(document_id: str) -> dict:
     search_client = SearchClient(
@@ -21,39 +25,76 @@ async def delete_document(document_id: str) -> dict:
             for r in result
         ]
         return {"deleted": serialized_result}
-    
-    
-async def delete_all_documents() -> dict:
+
+
+async def delete_all_documents(job: Optional[Job] = None) -> dict:
+    """
+    Deletes every document in the index: pages of ids are searched until none are left, and
+    each page is deleted in concurrent batches over one client.
+    """
+    job = job or Job("delete_all")
+    search_client = SearchClient(
+        endpoint=settings.AZURE_AI_SEARCH_ENDPOINT,
+        index_name=settings.AZURE_INDEX_NAME,
+        credential=AzureKeyCredential(settings.AZURE_AI_SEARCH_API_KEY)
+    )
+
+    async def fetch_page():
+        results = await search_client.search("*", select=["id"], top=settings.BULK_DELETE_PAGE_SIZE)
+        return [doc["id"] async for doc in results]
+
+    async def delete_batch(batch_ids):
+        deletion_batch = [{"@search.action": "delete", "id": doc_id} for doc_id in batch_ids]
+        result = await search_client.upload_documents(documents=deletion_batch)
+        return sum(1 for r in result if not r.succeeded)
+
+    async with search_client:
+        job.total = await search_client.get_document_count()
+        return await drain_delete(
+            fetch_page,
+            delete_batch,
+            job,
+            batch_size=settings.BULK_DELETE_BATCH_SIZE,
+            concurrency=settings.BULK_DELETE_CONCURRENCY,
+            count_remaining=search_client.get_document_count,
+        )
+
+
+async def delete_source(name: str, keep_ids: Iterable = ()) -> dict:
+    """
+    Deletes every chunk ingested from the source `name` (a filename or URL), except `keep_ids`.
+    The index keeps chunk metadata as a JSON string, which cannot be filtered on, so candidates
+    are found with a phrase search on the metadata field and matched exactly on "name".
+    """
+    keep_ids = {str(id) for id in keep_ids}
+    phrase = '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
     search_client = SearchClient(
         endpoint=settings.AZURE_AI_SEARCH_ENDPOINT,
         index_name=settings.AZURE_INDEX_NAME,
         credential=AzureKeyCredential(settings.AZURE_AI_SEARCH_API_KEY)
     )
-    document_ids = []
-    
+
+    async def delete_batch(batch_ids):
+        deletion_batch = [{"@search.action": "delete", "id": doc_id} for doc_id in batch_ids]
+        result = await search_client.upload_documents(documents=deletion_batch)
+        return sum(1 for r in result if not r.succeeded)
+
     async with search_client:
-        results = await search_client.search("*", select=["id"], top=1000)
+        # Collect every match before deleting: deleting while paging would shift later pages
+        results = await search_client.search(phrase, search_fields=["metadata"], select=["id", "metadata"])
+        document_ids = []
         async for doc in results:
-            document_ids.append(doc["id"])
-    
-        if not document_ids:
-            return {"message": "No documents found."}
-    
-        batch_size = 100
-        deletion_results = []
-        for i in range(0, len(document_ids), batch_size):
-            batch_ids = document_ids[i : i + batch_size]
-            deletion_batch = [{"@search.action": "delete", "id": doc_id} for doc_id in batch_ids]
-            result = await search_client.upload_documents(documents=deletion_batch)
-            serialized = [
-                {
-                    "key": r.key,
-                    "succeeded": r.succeeded,
-                    "errorMessage": r.error_message,
-                    "statusCode": r.status_code
-                }
-                for r in result
-            ]
-            deletion_results.append(serialized)
-    
-    return {"deleted_batches": deletion_results, "total_deleted": len(document_ids)}
+            try:
+                metadata = json.loads(doc.get("metadata") or "{}")
+            except ValueError:
+                continue
+            if metadata.get("name") == name and doc["id"] not in keep_ids:
+                document_ids.append(doc["id"])
+
+        job = await delete_ids(
+            document_ids,
+            delete_batch,
+            batch_size=settings.BULK_DELETE_BATCH_SIZE,
+            concurrency=settings.BULK_DELETE_CONCURRENCY,
+        )
+    return {"name": name, "deleted": job.processed, "failed": job.failed}
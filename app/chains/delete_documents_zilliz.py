@@ -1,96 +1,90 @@
-import httpx
+import json
+from typing import Iterable, Optional
 from app.config import settings
+from app.utils.zilliz_client import ZillizRestClient
+from app.utils.jobs import Job
+from app.utils.bulk_delete import drain_delete
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def delete_document(document_id: str) -> dict:
+async def delete_document(document_id: str, client: ZillizRestClient) -> dict:
     """
     Delete a single document in Zilliz Cloud.
     """
     logger.debug(f"Deleting document with {settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME}: {document_id}")
-    
-    url = f"{settings.ZILLIZ_URL}/v2/vectordb/entities/delete"
-    
-    payload = {
-        "collectionName": settings.ZILLIZ_COLLECTION_NAME,
-        "filter": f"{settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME} in [{document_id}]"
-    }
-    headers = {
-        "Authorization": f"Bearer {settings.ZILLIZ_AUTH_TOKEN}",
-        "Accept": "application/json",
-        "Content-Type": "application/json"
-    }
-    logger.debug(f"Sending DELETE request to {url} with payload: {payload}")
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload, headers=headers)
-        logger.debug(f"Received response status {response.status_code} for delete_document")
-        response.raise_for_status()
-        result = response.json()
-    
+
+    filter_expression = f"{settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME} in [{document_id}]"
+    logger.debug(f"Sending delete request with filter: {filter_expression}")
+
+    result = await client.delete(settings.ZILLIZ_COLLECTION_NAME, filter_expression)
+
     logger.info(f"Document deletion response for {settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME} {document_id}: {result}")
     return {"deleted": result}
 
 
-async def delete_all_documents() -> dict:
+async def delete_source(name: str, client: ZillizRestClient, keep_ids: Iterable = ()) -> dict:
+    """
+    Delete every chunk ingested from the source `name` (a filename or URL) with a single
+    filter expression. Chunks listed in `keep_ids` (e.g. the replacement chunks that were
+    just inserted) are kept.
+    """
+    # ensure_ascii=False: Milvus compares the literal text and does not decode \uXXXX escapes
+    filter_expression = f"name == {json.dumps(name, ensure_ascii=False)}"
+    keep_ids = list(keep_ids)
+    if keep_ids:
+        filter_expression += f" and {settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME} not in [{', '.join(str(id) for id in keep_ids)}]"
+    logger.debug("Deleting chunks of source %s (keeping %d)", name, len(keep_ids))
+
+    result = await client.delete(settings.ZILLIZ_COLLECTION_NAME, filter_expression)
+
+    deleted = (result.get("data") or {}).get("deleteCount")
+    logger.info("Deleted %s chunks of source %s", deleted, name)
+    return {"name": name, "deleted": deleted}
+
+
+async def count_documents(client: ZillizRestClient) -> Optional[int]:
+    """
+    Returns the number of entities in the collection, or None if Zilliz cannot tell.
+    """
+    try:
+        data = await client.query(settings.ZILLIZ_COLLECTION_NAME, output_fields=["count(*)"])
+        return int(data[0]["count(*)"]) if data else 0
+    except Exception as e:
+        logger.warning("Counting documents failed: %s", e)
+        return None
+
+
+async def delete_all_documents(client: ZillizRestClient, job: Optional[Job] = None) -> dict:
     """
-    Delete all documents in the Zilliz Cloud collection by first querying for their primary keys (pk)
-    and then deleting them in batches using a filter expression.
+    Delete all documents in the Zilliz Cloud collection.
+    Pages of primary keys (pk) are queried until the collection is empty, and every page is
+    deleted in batches using filter expressions, several batches at a time.
     """
-    logger.debug("Querying all document IDs (primary keys) for deletion")
-    
-    query_url = f"{settings.ZILLIZ_URL}/v2/vectordb/entities/query"
-    delete_url = f"{settings.ZILLIZ_URL}/v2/vectordb/entities/delete"
-    query_payload = {
-        "collectionName": settings.ZILLIZ_COLLECTION_NAME,
-        "outputFields": [settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME],
-        "limit": 1000
-    }
-    headers = {
-        "Authorization": f"Bearer {settings.ZILLIZ_AUTH_TOKEN}",
-        "Accept": "application/json",
-        "Content-Type": "application/json"
-    }
-    
-    document_ids = []
-    async with httpx.AsyncClient() as client:
-        # Query the collection for document primary keys.
-        response = await client.post(query_url, json=query_payload, headers=headers)
-        logger.debug("Query response status: %s", response.status_code)
-        response.raise_for_status()
-        result = response.json()
-        logger.debug("Query response content: %s", result)
-        
-        # Extract primary keys from the query result.
-        for item in result.get("data", []):
-            if settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME in item:
-                document_ids.append(item[settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME])
-                
-        if not document_ids:
-            logger.info("No documents found for deletion.")
-            return {"message": "No documents found."}
-        
-        logger.info("Found %d documents for deletion.", len(document_ids))
-        
-        # Delete documents in batches using filter expressions.
-        batch_size = 100
-        deletion_results = []
-        for i in range(0, len(document_ids), batch_size):
-            batch_ids = document_ids[i : i + batch_size]
-
-            deletion_payload = {
-                "collectionName": settings.ZILLIZ_COLLECTION_NAME,
-                "filter": f"{settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME} in [{', '.join(str(id) for id in batch_ids)}]"
-            }
-
-            del_response = await client.post(delete_url, json=deletion_payload, headers=headers)
-            logger.debug("Batch deletion response status: %s", del_response.status_code)
-            del_response.raise_for_status()
-
-            deletion_result = del_response.json()
-            logger.info("Batch %d deletion result: %s", i // batch_size + 1, deletion_result)
-            deletion_results.append(deletion_result)
-    
-    logger.info("Total documents deleted: %d", len(document_ids))
-    return {"deleted_batches": deletion_results, "total_deleted": len(document_ids)}
\ No newline at end of file
+    job = job or Job("delete_all")
+    job.total = await count_documents(client)
+    logger.info("Deleting all documents (%s found)", job.total)
+    pk = settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME
+
+    async def fetch_page():
+        data = await client.query(
+            settings.ZILLIZ_COLLECTION_NAME,
+            output_fields=[pk],
+            limit=settings.BULK_DELETE_PAGE_SIZE,
+        )
+        return [item[pk] for item in data if pk in item]
+
+    async def delete_batch(batch_ids):
+        filter_expression = f"{pk} in [{', '.join(str(id) for id in batch_ids)}]"
+        await client.delete(settings.ZILLIZ_COLLECTION_NAME, filter_expression)
+
+    result = await drain_delete(
+        fetch_page,
+        delete_batch,
+        job,
+        batch_size=settings.BULK_DELETE_BATCH_SIZE,
+        concurrency=settings.BULK_DELETE_CONCURRENCY,
+        count_remaining=lambda: count_documents(client),
+    )
+    logger.info("Total documents deleted: %d (%d failed)", result["total_deleted"], result["failed"])
+    return result
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Any, List
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from app.utils.metrics import EMBED_LATENCY, VECTOR_SEARCH_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+    Fuses ranked result lists with reciprocal-rank fusion: each document scores
+    sum(1 / (rrf_k + rank)) over the lists it appears in. Documents are matched by content,
+    so the same chunk found by both retrievers is counted once.
+    """
+    scores = {}
+    docs_by_content = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            scores[doc.page_content] = scores.get(doc.page_content, 0.0) + 1.0 / (rrf_k + rank)
+            docs_by_content.setdefault(doc.page_content, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs_by_content[content] for content in ranked]
+
+
+def dense_search(vector_store, query: str, k: int) -> List[Document]:
+    """Embeds the query and searches the vector store, timing both stages separately."""
+    with EMBED_LATENCY.labels("retrieval").time():
+        query_vector = vector_store.embeddings.embed_query(query)
+    with VECTOR_SEARCH_LATENCY.labels("dense").time():
+        return vector_store.similarity_search_by_vector(query_vector, k=k)
+
+
+async def adense_search(vector_store, query: str, k: int) -> List[Document]:
+    """Async version of dense_search."""
+    with EMBED_LATENCY.labels("retrieval").time():
+        query_vector = await vector_store.embeddings.aembed_query(query)
+    with VECTOR_SEARCH_LATENCY.labels("dense").time():
+        return await vector_store.asimilarity_search_by_vector(query_vector, k=k)
+
+
+def lexical_search(lexical_index, query: str, k: int) -> List[Document]:
+    with VECTOR_SEARCH_LATENCY.labels("lexical").time():
+        return lexical_index.search(query, k)
+
+
+class DenseRetriever(BaseRetriever):
+    """
+    Plain top-k vector store retriever (what vector_store.as_retriever() returns), except that
+    the query embedding and the index search are timed as separate stages.
+    """
+    vector_store: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return dense_search(self.vector_store, query, self.k)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return await adense_search(self.vector_store, query, self.k)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves `candidate_k` chunks from both the dense vector store and the lexical (BM25) index
+    and returns the top `k` after reciprocal-rank fusion.
+    """
+    vector_store: Any
+    lexical_index: Any
+    k: int = 4
+    candidate_k: int = 8
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense = dense_search(self.vector_store, query, self.candidate_k)
+        lexical = lexical_search(self.lexical_index, query, self.candidate_k)
+        return reciprocal_rank_fusion([dense, lexical], self.k, self.rrf_k)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        # The lexical index takes a lock that ingestion holds while it updates the index, so it
+        # is searched in a thread, alongside the dense search rather than after it
+        dense, lexical = await asyncio.gather(
+            adense_search(self.vector_store, query, self.candidate_k),
+            asyncio.to_thread(lexical_search, self.lexical_index, query, self.candidate_k),
+        )
+        logger.debug("Hybrid retrieval: %d dense and %d lexical candidates", len(dense), len(lexical))
+        return reciprocal_rank_fusion([dense, lexical], self.k, self.rrf_k)
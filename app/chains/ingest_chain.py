@@ -1,6 +1,13 @@
+import os
 import asyncio
+import tempfile
+import codecs
 import datetime
+import itertools
+from collections import deque
+import time
 import logging
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
 from langchain.docstore.document import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import chardet
@@ -8,104 +15,358 @@ from PyPDF2 import PdfReader
 from docx import Document as DocxDocument
 import io
 from bs4 import BeautifulSoup
-import requests
+from urllib.parse import urljoin
 from app.config import settings
 from functools import partial
+from app.utils.metrics import INGEST_LATENCY
+from app.utils.scheduler import SchedulerSaturated
+from app.utils.tokens import count_tokens
+from app.utils.ingest_manifest import chunk_hash
+from app.utils.write_pipeline import WritePipeline
+from app.utils.crawler import Crawler, CrawledPage, canonical_url, is_http_url
+from app.chains.ingest_writers import chunk_key, DocumentsIngestWriter
+from app.utils.parse_pool import get_parse_pool, discard_broken_parse_pool, parse_workers
+from app.utils.parsers import parse_pdf_pages, parse_docx
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_url(url: str) -> str:
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except Exception as e:
-        logger.error("Error fetching URL '%s': %s", url, e)
-        raise Exception(f"Error fetching URL '{url}': {e}")
-    
-    html = response.text
-    soup = BeautifulSoup(html, 'html.parser')
+# Text files are decoded in blocks of this size
+TEXT_BLOCK_BYTES = 1024 * 1024
+# Extracted text is split once this many chunks' worth of it is buffered
+SPLIT_BUFFER_CHUNKS = 4
+# Site ingestion results list the errors of at most this many pages
+MAX_REPORTED_ERRORS = 20
+# Fetched pages with these content types are parsed as HTML, or as documents (by file suffix)
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+DOCUMENT_CONTENT_TYPES = {
+    "application/pdf": ".pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+}
+
+def page_text(page: CrawledPage) -> Tuple[str, Optional[str]]:
+    """
+    Returns the text of a fetched page and its <link rel="canonical"> URL, if any. HTML is
+    decoded by BeautifulSoup (HTTP charset, <meta charset> or detection), other text/* types
+    by their charset, and PDF and DOCX responses go through the document parsers. Any other
+    content type (images, archives, ...) raises ValueError. Blocking; run it in a thread.
+    """
+    content_type = page.content_type.lower()
+    mime_type = content_type.split(";")[0].strip()
+    charset = content_type.split("charset=", 1)[1].split(";")[0].strip() if "charset=" in content_type else None
+    if mime_type in DOCUMENT_CONTENT_TYPES:
+        with tempfile.NamedTemporaryFile(suffix=DOCUMENT_CONTENT_TYPES[mime_type]) as file:
+            file.write(page.body)
+            file.flush()
+            file.seek(0)
+            return "".join(iter_file_text(file, file.name)), None
+    if mime_type and mime_type not in HTML_CONTENT_TYPES:
+        if not mime_type.startswith("text/"):
+            raise ValueError(f"Unsupported content type '{mime_type}'")
+        return page.body.decode(charset or "utf-8", errors="replace"), None
+    soup = BeautifulSoup(page.body, 'html.parser', from_encoding=charset)
+    link = soup.find("link", rel="canonical", href=True)
+    canonical = urljoin(page.final_url, link["href"]) if link else None
     text = soup.get_text(separator="\n")
-    
-    return text
+    # A malformed canonical link is ignored rather than failing the page
+    return text, canonical if canonical and is_http_url(canonical) else None
+
+def file_path(file) -> Optional[str]:
+    """Path of a file object opened from disk (e.g. a spooled upload), None for in-memory files."""
+    name = getattr(file, "name", None)
+    return name if isinstance(name, str) and os.path.isfile(name) else None
+
+def iter_pdf_pages(file, parse_stats: dict) -> Iterator[str]:
+    """
+    Yields the text of a PDF page by page. With the parser pool and a file on disk, ranges of
+    PDF_PAGES_PER_SHARD pages are parsed in the pool's processes, a bounded window of them in
+    parallel, and yielded in page order; otherwise pages are parsed here, on demand.
+    """
+    reader = PdfReader(file)
+    page_count = parse_stats["pages"] = len(reader.pages)
+    pool = get_parse_pool()
+    path = file_path(file)
+    if pool is None or path is None:
+        for page in reader.pages:
+            yield (page.extract_text() or "") + "\n"
+        return
+
+    shard_size = settings.PDF_PAGES_PER_SHARD
+    shards = [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+    parse_stats["shards"] = len(shards)
+    window = 2 * parse_workers()
+    pending = deque()
+    try:
+        for start, stop in shards:
+            pending.append(pool.submit(parse_pdf_pages, path, start, stop))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def iter_docx_paragraphs(file) -> Iterator[str]:
+    pool = get_parse_pool()
+    path = file_path(file)
+    if pool is not None and path is not None:
+        yield from pool.submit(parse_docx, path).result()
+        return
+    docx_file = DocxDocument(file)
+    for paragraph in docx_file.paragraphs:
+        yield paragraph.text + "\n"
+
+def detect_encoding(sample: bytes) -> str:
+    """Detects the encoding of a text file from a sample: BOMs and valid UTF-8 first, chardet otherwise."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # Not final: a character cut off at the end of the sample is fine
+        codecs.getincrementaldecoder("utf-8")().decode(sample)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    return chardet.detect(sample).get("encoding") or "utf-8"  # Default fallback encoding
+
+def iter_text_blocks(file, parse_stats: dict, block_size: int = TEXT_BLOCK_BYTES) -> Iterator[str]:
+    """
+    Decodes a text file block by block. The encoding is detected from the first
+    ENCODING_SAMPLE_BYTES only; bytes that do not fit it further on are replaced, not fatal.
+    """
+    block = file.read(block_size)
+    encoding = parse_stats["encoding"] = detect_encoding(block[:settings.ENCODING_SAMPLE_BYTES])
+    logger.debug("Detected encoding: %s", encoding)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    while block:
+        yield decoder.decode(block)
+        block = file.read(block_size)
+    yield decoder.decode(b"", final=True)
+
+def iter_file_text(file, filename: str, parse_stats: Optional[dict] = None) -> Iterator[str]:
+    """
+    Yields the text of an uploaded PDF, DOCX or text file piece by piece (pages, paragraphs,
+    decoded blocks), so the whole text is never held in memory. Blocking; run it in a thread.
+    `parse_stats` is filled with the format, the time spent parsing and format-specific counts.
+    """
+    parse_stats = {} if parse_stats is None else parse_stats
+    if filename.lower().endswith(".pdf"):
+        parse_stats["format"], segments = "pdf", iter_pdf_pages(file, parse_stats)
+    elif filename.lower().endswith(".docx"):
+        parse_stats["format"], segments = "docx", iter_docx_paragraphs(file)
+    else:
+        parse_stats["format"], segments = "text", iter_text_blocks(file, parse_stats)
+    parse_stats["seconds"] = 0.0
+    while True:
+        # Only the time spent producing text counts, not the time the consumer holds a segment
+        started = time.perf_counter()
+        try:
+            segment = next(segments)
+        except StopIteration:
+            return
+        except Exception as e:
+            logger.error("File decoding error: %s", e)
+            discard_broken_parse_pool(e)
+            raise Exception(f"Could not extract text from '{filename}': {e}")
+        finally:
+            parse_stats["seconds"] += time.perf_counter() - started
+        yield segment
+
+def iter_chunks(segments: Iterable[str], splitter, metadata: dict) -> Iterator[Document]:
+    """
+    Splits a stream of text segments into chunk Documents lazily. Segments are buffered until
+    they hold a few chunks' worth of text; all chunks but the last are emitted and the last one
+    is carried over, so chunks can still span segment (e.g. page) boundaries while the buffer
+    stays bounded.
+    """
+    buffer_chars = splitter._chunk_size * SPLIT_BUFFER_CHUNKS
+    buffer = ""
+    for segment in segments:
+        buffer += segment
+        if len(buffer) < buffer_chars:
+            continue
+        pieces = splitter.split_text(buffer)
+        for piece in pieces[:-1]:
+            yield Document(page_content=piece, metadata=dict(metadata))
+        buffer = pieces[-1] if pieces else ""
+    if buffer.strip():
+        for piece in splitter.split_text(buffer):
+            yield Document(page_content=piece, metadata=dict(metadata))
+
+def make_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        separators=["\n\n", "\n", " ", ""],
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP
+    )
+
+def report_stage(progress, stage: str, **counts):
+    """Tells the caller (e.g. an ingest job) which stage the ingestion has reached."""
+    if progress is not None:
+        progress(stage, counts)
+
+async def replace_source(delete_source, name: str, ids) -> dict:
+    """
+    Removes the older chunks of source `name` once its new chunks (`ids`) are in place, so the
+    source stays searchable throughout a re-ingestion (at worst briefly duplicated).
+    """
+    if delete_source is None:
+        raise ValueError("Replacing a source is not supported by this provider")
+    return await delete_source(name, keep_ids=ids)
+
+async def store_chunks(kind: str, name: str, chunks: Iterable[Document], writer, lexical_index=None, scheduler=None,
+                       manifest=None, replace: bool = False, delete_source=None, progress=None) -> dict:
+    """
+    Embeds and inserts the chunks of source `name` and returns the counts for the ingest response.
+
+    Chunks are pulled lazily from `chunks` (parsing and splitting run in a thread) and written
+    through a WritePipeline: token-budgeted embedding batches, a few embedded concurrently, are
+    bulk inserted by `writer` while the next ones embed, and a failed batch is retried on its
+    own. Memory stays flat however large the document is. Every chunk gets a content hash
+    (metadata "chunk_hash") and repeated chunks are stored once. With a manifest, only chunks
+    whose hash is not yet stored for this source are embedded and inserted, and chunks that
+    vanished from the source are deleted at the end, so re-ingesting an unchanged document
+    costs no embedding calls and leaves no duplicates.
+    """
+    embedding_model = settings.OPENAI_API_EMBEDDING_MODEL_NAME
+    stats = {"chunks": 0, "inserted": 0, "skipped": 0, "deleted": 0, "embedding_tokens": 0, "embedding_tokens_skipped": 0}
+    extract_seconds = 0.0
 
-def extract_text_from_pdf(file_contents: bytes) -> str:
-    reader = PdfReader(io.BytesIO(file_contents))
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
+    async with (manifest.lock(name) if manifest is not None else asyncio.Lock()):
+        previous = await asyncio.to_thread(manifest.get, name) if manifest is not None else {}
+        current = {}  # chunk hash -> vector store id (None until inserted)
 
-    return text
+        async def on_inserted(docs, ids):
+            inserted = {doc.metadata["chunk_hash"]: doc_id for doc, doc_id in zip(docs, ids)}
+            current.update(inserted)
+            stats["inserted"] += len(docs)
+            if lexical_index is not None:
+                # Tokenizing a batch of chunks is CPU work; keep it off the event loop
+                await asyncio.to_thread(lexical_index.add_documents, docs, ids)
+            if manifest is not None:
+                # Record inserted chunks as they land, so an interrupted ingest skips them next time
+                await asyncio.to_thread(manifest.add, name, inserted)
+            report_stage(progress, "embed_insert", **stats)
 
-async def initialize_ingest_chain_document(file_contents: bytes, filename: str, vector_store) -> dict:
+        pipeline = WritePipeline(
+            writer,
+            on_inserted,
+            scheduler,
+            batch_tokens=settings.INGEST_EMBED_BATCH_TOKENS,
+            batch_size=settings.INGEST_EMBED_BATCH_SIZE,
+            embed_concurrency=settings.INGEST_EMBED_CONCURRENCY,
+            retries=settings.INGEST_WRITE_RETRIES,
+        )
+        started = time.perf_counter()
+        chunks = iter(chunks)
+        try:
+            try:
+                while True:
+                    pulled = time.perf_counter()
+                    batch = await asyncio.to_thread(lambda: list(itertools.islice(chunks, settings.INGEST_EMBED_BATCH_SIZE)))
+                    extract_seconds += time.perf_counter() - pulled
+                    if not batch:
+                        break
+                    for doc in batch:
+                        key = doc.metadata["chunk_hash"] = chunk_hash(doc.page_content)
+                        tokens = count_tokens(doc.page_content, embedding_model)
+                        stats["chunks"] += 1
+                        if key in current or key in previous:
+                            current.setdefault(key, previous.get(key))
+                            stats["skipped"] += 1
+                            stats["embedding_tokens_skipped"] += tokens
+                        else:
+                            current[key] = None
+                            stats["embedding_tokens"] += tokens
+                            await pipeline.add(doc, tokens, chunk_key(name, key))
+                    report_stage(progress, "embed_insert", **stats)
+                await pipeline.close()
+            except BaseException:
+                pipeline.cancel()
+                raise
+            write_seconds = time.perf_counter() - started
+            INGEST_LATENCY.labels(kind, "extract_split").observe(extract_seconds)
+            INGEST_LATENCY.labels(kind, "embed_insert").observe(write_seconds)
+            if not stats["chunks"]:
+                raise ValueError(f"Extracted text from '{name}' is empty.")
+
+            vanished = [doc_id for key, doc_id in previous.items() if key not in current]
+            if vanished:
+                await asyncio.to_thread(writer.vector_store.delete, vanished)
+                stats["deleted"] = len(vanished)
+                if lexical_index is not None:
+                    await asyncio.to_thread(lexical_index.delete, vanished)
+            if manifest is not None:
+                await asyncio.to_thread(manifest.set, name, current)
+        finally:
+            if lexical_index is not None and stats["inserted"] + stats["deleted"]:
+                with INGEST_LATENCY.labels(kind, "lexical_index").time():
+                    await asyncio.to_thread(lexical_index.save)
+
+        stats["write"] = {
+            **{key: round(value, 3) for key, value in pipeline.stats.items()},
+            "chunks_per_s": round(stats["inserted"] / write_seconds, 2) if write_seconds > 0 else None,
+            "embedding_tokens_per_s": round(stats["embedding_tokens"] / write_seconds, 1) if write_seconds > 0 else None,
+        }
+        logger.info("Source '%s': %d chunks inserted in %d batches (%s chunks/s), %d unchanged skipped, %d vanished deleted",
+                    name, stats["inserted"], pipeline.stats["batches"], stats["write"]["chunks_per_s"], stats["skipped"], stats["deleted"])
+
+    if replace:
+        report_stage(progress, "replace", **stats)
+        stats["replaced"] = await replace_source(delete_source, name, list(current.values()))
+    return stats
+
+async def initialize_ingest_chain_document(file_contents: Union[bytes, BinaryIO], filename: str, vector_store, lexical_index=None,
+                                           scheduler=None, replace: bool = False, delete_source=None, manifest=None,
+                                           progress=None, writer=None) -> dict:
     """
     Ingestion chain that processes an uploaded document by:
-      1. Decoding the file contents (assumed UTF-8)
-      2. Creating a Document with metadata
-      3. Splitting the document into chunks
-      4. Adding the chunks to the index via the provided vector store
+      1. Extracting its text piece by piece (PDF pages, DOCX paragraphs, decoded text blocks)
+      2. Splitting the text into chunks with metadata as it is extracted
+      3. Adding the chunks to the index via the provided vector store, in bounded batches
 
     Parameters:
-      - file_contents: Binary content of the uploaded file.
+      - file_contents: Binary content of the uploaded file, or a binary file object to stream it from.
       - filename: Name of the file.
       - vector_store: An initialized vector store instance.
+      - lexical_index: Optional LexicalIndex that is updated with the new chunks.
+      - scheduler: Optional LLMScheduler that admits the embedding calls.
+      - replace: Remove the chunks previously ingested under the same filename afterwards.
+      - delete_source: async delete_source(name, keep_ids) of the provider, used by replace.
+      - manifest: Optional IngestManifest; unchanged chunks are then skipped and vanished ones deleted.
+      - progress: Optional callback progress(stage, counts) called as each stage starts.
+      - writer: How chunks are embedded and inserted (see app/chains/ingest_writers.py);
+        defaults to add_documents on vector_store.
 
     Returns:
-      A dictionary indicating success.
+      A dictionary indicating success, with chunk and embedding token counts and the parse
+      timings ("parse": format, seconds, and pages/shards or detected encoding).
     """
-    try:
-        if filename.lower().endswith(".pdf"):
-            # Handle PDF separately
-            text = extract_text_from_pdf(file_contents)
-            if not text.strip():
-                raise ValueError("Extracted text from PDF is empty.")
-        elif filename.lower().endswith(".docx"):
-            # Wrap the bytes in a BytesIO object
-            docx_file = DocxDocument(io.BytesIO(file_contents))
-            # Join all paragraphs together
-            text = "\n".join([p.text for p in docx_file.paragraphs])
-            if not text.strip():
-                raise ValueError("Extracted text from DOCX is empty.")
-        else:
-            # Detect encoding for text files
-            detection = chardet.detect(file_contents)
-            encoding = detection.get("encoding")
-            if not encoding:
-                encoding = "utf-8"  # Default fallback encoding
-            print("Detected encoding:", encoding)
-            text = file_contents.decode(encoding)
+    started = time.perf_counter()
+    file = io.BytesIO(file_contents) if isinstance(file_contents, bytes) else file_contents
+    metadata = {
+        "name": filename,
+        "timestamp": int(datetime.datetime.now().timestamp())
+    }
+    report_stage(progress, "extract")
+    parse_stats = {}
+    chunks = iter_chunks(iter_file_text(file, filename, parse_stats), make_splitter(), metadata)
 
-    except Exception as e:
-        logger.error("File decoding error: %s", e)
-        raise Exception("File must be UTF-8 encoded text")
+    # Ingest the new chunks into the vector store.
+    writer = writer or DocumentsIngestWriter(vector_store)
+    stats = await store_chunks("document", filename, chunks, writer, lexical_index, scheduler, manifest, replace, delete_source, progress)
+    parse_stats["seconds"] = round(parse_stats["seconds"], 3)
+    INGEST_LATENCY.labels("document", f"parse_{parse_stats['format']}").observe(parse_stats["seconds"])
+    result = {"status": "success", "message": f"File '{filename}' ingested successfully.", **stats, "parse": parse_stats}
+    INGEST_LATENCY.labels("document", "total").observe(time.perf_counter() - started)
     
-    # Create a Document object for the file
-    doc = Document(
-        page_content=text,
-        metadata={
-            "name": filename,
-            "timestamp": int(datetime.datetime.now().timestamp())
-        }
-    )
-    
-    # Split the document into manageable chunks
-    splitter = RecursiveCharacterTextSplitter(
-      separators=["\n\n", "\n", " ", ""],
-      chunk_size=settings.CHUNK_SIZE,
-      chunk_overlap=settings.CHUNK_OVERLAP
-    )
-    docs = splitter.split_documents([doc])
-    print(f"Number of chunks: {len(docs)}")
-    for i, d in enumerate(docs):
-        print(f"Chunk {i} length: {len(d.page_content)}")
-
-    # Ingest the chunks into the vector store.
-    # This call runs in a background thread since vector_store.add_documents is blocking.
-    await asyncio.to_thread(vector_store.add_documents, docs)
-    
-    logger.info("File '%s' ingested successfully.", filename)
-    return {"status": "success", "message": f"File '{filename}' ingested successfully."}
+    logger.info("File '%s' ingested successfully (%d chunks).", filename, stats["chunks"])
+    return result
 
-async def initialize_ingest_chain_url(url: str, vector_store) -> dict:
+async def initialize_ingest_chain_url(url: str, vector_store, lexical_index=None, scheduler=None,
+                                      replace: bool = False, delete_source=None, manifest=None, progress=None,
+                                      writer=None) -> dict:
     """
     Ingestion chain for processing a URL.
     This function fetches the URL, extracts text content, splits it, and adds the chunks to the vector store.
@@ -113,54 +374,198 @@ async def initialize_ingest_chain_url(url: str, vector_store) -> dict:
     Parameters:
       - url: The URL to ingest.
       - vector_store: An initialized vector store instance.
+      - lexical_index: Optional LexicalIndex that is updated with the new chunks.
+      - scheduler: Optional LLMScheduler that admits the embedding calls.
+      - replace: Remove the chunks previously ingested from the same URL afterwards.
+      - delete_source: async delete_source(name, keep_ids) of the provider, used by replace.
+      - manifest: Optional IngestManifest; unchanged chunks are then skipped and vanished ones deleted.
+      - progress: Optional callback progress(stage, counts) called as each stage starts.
+      - writer: How chunks are embedded and inserted (see app/chains/ingest_writers.py);
+        defaults to add_documents on vector_store.
       
     Returns:
       A dictionary indicating the ingestion status.
     """
+    started = time.perf_counter()
+    report_stage(progress, "extract")
     try:
-        text = extract_text_from_url(url)
+        async with Crawler.from_settings() as crawler:
+            page = await crawler.fetch(url)
+        if not page.ok:
+            raise Exception(f"Error fetching URL '{url}': {page.error}")
+        text, _ = await asyncio.to_thread(page_text, page)
         if not text.strip():
             raise ValueError("Extracted text from URL is empty.")
     except Exception as e:
         logger.error("URL ingestion error for '%s': %s", url, e)
         raise Exception(f"URL ingestion error: {e}")
+    INGEST_LATENCY.labels("url", "extract").observe(time.perf_counter() - started)
     
-    doc = Document(
-        page_content=text,
-        metadata={
-            "name": url,
-            "timestamp": int(datetime.datetime.now().timestamp())
-        }
-    )
-    
-    splitter = RecursiveCharacterTextSplitter(
-        separators=["\n\n", "\n", " ", ""],
-        chunk_size=settings.CHUNK_SIZE,
-        chunk_overlap=settings.CHUNK_OVERLAP
-    )
-    docs = splitter.split_documents([doc])
-    logger.info("Number of chunks from URL '%s': %d", url, len(docs))
-    
-    await asyncio.to_thread(vector_store.add_documents, docs)
+    writer = writer or DocumentsIngestWriter(vector_store)
+    stats = await store_page(url, text, writer, lexical_index, scheduler, manifest, replace, delete_source, progress)
+    result = {"status": "success", "message": f"URL '{url}' ingested successfully.", **stats}
+    INGEST_LATENCY.labels("url", "total").observe(time.perf_counter() - started)
     
-    logger.info("URL '%s' ingested successfully.", url)
-    return {"status": "success", "message": f"URL '{url}' ingested successfully."}
+    logger.info("URL '%s' ingested successfully (%d chunks).", url, stats["chunks"])
+    return result
+
+async def store_page(name: str, text: str, writer, lexical_index=None, scheduler=None, manifest=None,
+                     replace: bool = False, delete_source=None, progress=None) -> dict:
+    metadata = {
+        "name": name,
+        "timestamp": int(datetime.datetime.now().timestamp())
+    }
+    chunks = iter_chunks([text], make_splitter(), metadata)
+    return await store_chunks("url", name, chunks, writer, lexical_index, scheduler, manifest, replace, delete_source, progress)
+
+async def initialize_ingest_chain_site(urls: List[str], sitemaps: List[str], vector_store, lexical_index=None, scheduler=None,
+                                       replace: bool = False, delete_source=None, manifest=None, progress=None,
+                                       writer=None) -> dict:
+    """
+    Bulk ingestion of a list of URLs and/or the pages listed in sitemaps (e.g. a department site).
+
+    Pages are fetched concurrently within the crawler's politeness limits (see app.utils.crawler)
+    and each page is ingested as soon as it arrives, CRAWL_INGEST_CONCURRENCY pages at a time;
+    fetching pauses while all ingest slots are busy. Pages are deduplicated by canonical URL,
+    after redirects and <link rel="canonical">, and are stored under that URL. A page that fails
+    is counted and reported but does not stop the crawl.
+
+    Returns:
+      A dictionary with page counts (listed, fetched, ingested, duplicates, failed), the summed
+      chunk counts of the ingested pages, pages/s and the first errors.
+    """
+    started = time.perf_counter()
+    site = {"pages": 0, "fetched": 0, "ingested": 0, "duplicates": 0, "failed": 0,
+            "chunks": 0, "inserted": 0, "skipped": 0, "deleted": 0, "embedding_tokens": 0}
+    errors = []
+    seen = set()
+    writer = writer or DocumentsIngestWriter(vector_store)
+
+    def failed(url: str, error: str):
+        site["failed"] += 1
+        logger.warning("Skipping page %s: %s", url, error)
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"url": url, "error": error})
+
+    async def ingest(page: CrawledPage):
+        try:
+            text, canonical = await asyncio.to_thread(page_text, page)
+            name = canonical_url(page.final_url)
+            if canonical is not None and canonical_url(canonical) != name:
+                if canonical_url(canonical) in seen:
+                    site["duplicates"] += 1
+                    return
+                name = canonical_url(canonical)
+                seen.add(name)
+            if not text.strip():
+                failed(page.url, "Extracted text is empty")
+                return
+            stats = await store_page(name, text, writer, lexical_index, scheduler, manifest, replace, delete_source)
+            site["ingested"] += 1
+            for key in ("chunks", "inserted", "skipped", "deleted", "embedding_tokens"):
+                site[key] += stats[key]
+        except SchedulerSaturated:
+            raise
+        except Exception as e:
+            failed(page.url, str(e))
+        finally:
+            ingest_slots.release()
+            report_stage(progress, "crawl", **site)
+
+    ingest_slots = asyncio.Semaphore(settings.CRAWL_INGEST_CONCURRENCY)
+    tasks = []
+    async with Crawler.from_settings() as crawler:
+        report_stage(progress, "expand")
+        page_urls = await crawler.expand(urls, sitemaps)
+        if not page_urls:
+            raise ValueError("No pages to ingest: the URL list and sitemaps are empty.")
+        site["pages"] = len(page_urls)
+        report_stage(progress, "crawl", **site)
+        try:
+            async for page in crawler.crawl(page_urls):
+                site["fetched"] += 1
+                if not page.ok:
+                    failed(page.url, page.error)
+                    continue
+                key = canonical_url(page.final_url)
+                if key in seen:
+                    # e.g. two listed URLs redirecting to the same page
+                    site["duplicates"] += 1
+                    continue
+                seen.add(key)
+                await ingest_slots.acquire()
+                tasks.append(asyncio.ensure_future(ingest(page)))
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    elapsed = time.perf_counter() - started
+    INGEST_LATENCY.labels("site", "total").observe(elapsed)
+    logger.info("Site ingestion finished: %d of %d pages ingested (%d duplicates, %d failed) in %.1fs",
+                site["ingested"], site["pages"], site["duplicates"], site["failed"], elapsed)
+    return {
+        "status": "success",
+        "message": f"Ingested {site['ingested']} of {site['pages']} pages.",
+        **site,
+        "pages_per_s": round(site["fetched"] / elapsed, 2) if elapsed > 0 else None,
+        "errors": errors,
+    }
 
 # --- Ingestion Chain Wrapper Implementation ---
 
 class IngestionChainWrapper:
     """
-    Wrapper that holds ingestion functions for both documents and URLs.
+    Wrapper that holds ingestion functions for documents, URLs and whole sites.
     The functions are pre-bound with the vector_store dependency.
+    If given, on_corpus_change is called after every successful ingestion
+    (e.g. to invalidate caches built on top of the vector store), and
+    lexical_index is kept in sync with the vector store. A scheduler, if given, admits
+    the embedding calls at ingest priority. delete_source (the provider's) lets an ingestion
+    replace the chunks previously ingested from the same source, a manifest makes
+    re-ingestion incremental (see store_chunks), and writer (see ingest_writers) is how
+    chunks are embedded and inserted.
     """
-    def __init__(self, vector_store):
+    def __init__(self, vector_store, on_corpus_change=None, lexical_index=None, scheduler=None, delete_source=None, manifest=None,
+                 writer=None):
         self.vector_store = vector_store
+        self.writer = writer
+        self.on_corpus_change = on_corpus_change
+        self.lexical_index = lexical_index
+        self.scheduler = scheduler
+        self.delete_source = delete_source
+        self.manifest = manifest
         # Pre-bind vector_store to each ingestion function using partial
-        self.ingest_document = partial(initialize_ingest_chain_document, vector_store=vector_store)
-        self.ingest_url = partial(initialize_ingest_chain_url, vector_store=vector_store)
+        self._ingest_document = partial(initialize_ingest_chain_document, vector_store=vector_store, lexical_index=lexical_index,
+                                        scheduler=scheduler, delete_source=delete_source, manifest=manifest, writer=writer)
+        self._ingest_url = partial(initialize_ingest_chain_url, vector_store=vector_store, lexical_index=lexical_index,
+                                   scheduler=scheduler, delete_source=delete_source, manifest=manifest, writer=writer)
+        self._ingest_site = partial(initialize_ingest_chain_site, vector_store=vector_store, lexical_index=lexical_index,
+                                    scheduler=scheduler, delete_source=delete_source, manifest=manifest, writer=writer)
+
+    def _notify_corpus_change(self):
+        if self.on_corpus_change is not None:
+            self.on_corpus_change()
+
+    async def ingest_document(self, file_contents: Union[bytes, BinaryIO], filename: str, replace: bool = False, progress=None) -> dict:
+        result = await self._ingest_document(file_contents, filename, replace=replace, progress=progress)
+        self._notify_corpus_change()
+        return result
+
+    async def ingest_url(self, url: str, replace: bool = False, progress=None) -> dict:
+        result = await self._ingest_url(url, replace=replace, progress=progress)
+        self._notify_corpus_change()
+        return result
+
+    async def ingest_site(self, urls: List[str], sitemaps: List[str], replace: bool = False, progress=None) -> dict:
+        result = await self._ingest_site(urls, sitemaps, replace=replace, progress=progress)
+        self._notify_corpus_change()
+        return result
 
-async def initialize_ingest_chain(vector_store) -> IngestionChainWrapper:
+async def initialize_ingest_chain(vector_store, on_corpus_change=None, lexical_index=None, scheduler=None, delete_source=None,
+                                  manifest=None, writer=None) -> IngestionChainWrapper:
     """
     Initializes and returns an IngestionChainWrapper with the provided vector_store.
     """
-    return IngestionChainWrapper(vector_store)
+    return IngestionChainWrapper(vector_store, on_corpus_change, lexical_index, scheduler, delete_source, manifest, writer)
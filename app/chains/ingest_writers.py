@@ -0,0 +1,82 @@
+import json
+import hashlib
+import logging
+from typing import List
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_key(name: str, chunk_hash: str) -> str:
+    """Stable id of a chunk of a source, used as its key by stores that accept our own keys."""
+    return hashlib.sha256(f"{name}\0{chunk_hash}".encode("utf-8")).hexdigest()[:32]
+
+
+class KeyedIngestWriter:
+    """
+    Ingestion writer (see app.utils.write_pipeline) for stores that take pre-embedded chunks
+    under keys we choose: AzureSearch and LocalVectorStore (add_embeddings). Chunks are stored
+    under chunk_key(), and both stores overwrite an existing key, so a retried insert cannot
+    duplicate anything and discard() has nothing to do.
+    """
+    def __init__(self, vector_store, embeddings):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def insert(self, docs, vectors, keys: List[str]) -> List[str]:
+        texts = [doc.page_content for doc in docs]
+        metadatas = [doc.metadata for doc in docs]
+        return self.vector_store.add_embeddings(list(zip(texts, vectors)), metadatas, keys=keys)
+
+    def discard(self, docs, keep_ids):
+        pass
+
+
+class ZillizIngestWriter:
+    """
+    Ingestion writer for the Zilliz store. The collection assigns primary keys itself (auto_id)
+    and langchain's Zilliz store cannot insert pre-embedded texts, so insert() goes through
+    add_documents: the vectors embed() just computed are read back from the embedding cache
+    rather than requested again. An insert that failed may still have been applied (e.g. a
+    timeout after the server committed), so before a retry discard() deletes the rows of the
+    batch's ingest run (source name and timestamp) whose ids the pipeline does not know.
+    """
+    def __init__(self, vector_store, embeddings):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def insert(self, docs, vectors, keys: List[str]) -> List:
+        return self.vector_store.add_documents(docs)
+
+    def discard(self, docs, keep_ids):
+        metadata = docs[0].metadata
+        filter_expression = f"name == {json.dumps(metadata['name'], ensure_ascii=False)} and timestamp == {int(metadata['timestamp'])}"
+        if keep_ids:
+            filter_expression += f" and {settings.ZILLIZ_PRIMARY_KEY_FIELD_NAME} not in [{', '.join(str(id) for id in keep_ids)}]"
+        logger.info("Discarding partial insert of %s before retrying", metadata["name"])
+        self.vector_store.delete(expr=filter_expression)
+
+
+class DocumentsIngestWriter:
+    """
+    Fallback writer for any other langchain vector store: add_documents embeds again (a cache
+    hit with cache-backed embeddings), and a retried insert may duplicate chunks.
+    """
+    def __init__(self, vector_store, embeddings=None):
+        self.vector_store = vector_store
+        self.embeddings = embeddings or vector_store.embeddings
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def insert(self, docs, vectors, keys: List[str]) -> List:
+        return self.vector_store.add_documents(docs)
+
+    def discard(self, docs, keep_ids):
+        pass
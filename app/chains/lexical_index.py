@@ -0,0 +1,375 @@
+import os
+import re
+import gzip
+import json
+import math
+import heapq
+import logging
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from collections import Counter
+from typing import Iterable, List, Optional
+from langchain_core.documents import Document
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: the index files are then not shared between processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this to "
+    "was what when where which who why will with you your".split()
+)
+
+# Terms with a lower idf appear in more than ~60% of chunks
+MIN_TERM_IDF = 0.5
+
+# The journal is folded into a new snapshot once it is larger than the snapshot (uncompressed)
+# and this floor, so the bytes written to persist the index stay proportional to the changes
+JOURNAL_COMPACT_MIN_BYTES = 4 * 1024 * 1024
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_PART_RE = re.compile(r"[a-z]+|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens tuned for campus queries:
+      - "CS-101", "CS 101" and "CS101" all produce the token "cs101"
+      - "cs101" also produces "cs" and "101" so partial codes still match
+    """
+    words = [w for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+    tokens = []
+    previous = ""
+    for word in words:
+        tokens.append(word)
+        parts = _PART_RE.findall(word)
+        if len(parts) > 1:
+            tokens.extend(parts)
+        # Join a letter prefix with a following number ("ahlberg 105", "cs 101")
+        if previous.isalpha() and word.isdigit():
+            tokens.append(previous + word)
+        previous = word
+    return tokens
+
+
+def _file_id(path: str, with_mtime: bool = True):
+    """Identifies a version of a file (None if missing); a replaced file gets a new inode."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns) if with_mtime else stat.st_ino
+
+
+@contextmanager
+def _locked(path: str):
+    """Exclusive lock on `path` across processes (a no-op without fcntl)."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class LexicalIndex:
+    """
+    Incremental BM25 index over ingested chunks.
+
+    Postings live in memory (term -> {doc: term frequency}) so a lookup only touches the
+    postings of the query terms. Only the chunks themselves (id, text, metadata) are persisted,
+    as a gzipped JSON snapshot plus a journal of the changes made since (JSON lines); postings
+    are rebuilt on load. save() appends the changes since the previous save to the journal and
+    only rewrites the snapshot once the journal has outgrown it.
+
+    The files are shared by the worker processes on a host: save() holds a file lock, first
+    applies what other workers wrote, then appends or compacts. refresh() (run by search()
+    every `refresh_interval` seconds and by delete_source()) applies journal records written
+    since, or reloads after another worker compacted, so chunks deleted or replaced elsewhere
+    stop being returned.
+
+    Adding, deleting, searching and saving tokenize text or touch files, so call them in a thread.
+    """
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75, refresh_interval: float = 2.0):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._docs = {}          # doc key -> (id, text, metadata, length)
+        self._postings = {}      # term -> {doc key: tf}
+        self._key_by_id = {}     # vector store id -> doc key
+        self._next_key = 0
+        self._total_length = 0
+        # Changes not saved yet (journal records), kept only when the index is persisted
+        self._pending = []
+        self._save_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._snapshot_bytes = 0
+        self._journal_bytes = 0  # journal bytes applied to this instance
+        self._snapshot_id = None
+        self._journal_id = None
+        self._refreshed_at = 0.0
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "LexicalIndex":
+        index = cls(path)
+        if path:
+            index._read_files()
+        if len(index):
+            logger.info("Loaded lexical index from %s with %d chunks", path, len(index))
+        return index
+
+    def _journal_path(self) -> str:
+        return f"{self.path}.journal"
+
+    def _read_files(self):
+        """Builds the index from the snapshot and journal (on a fresh instance)."""
+        self._snapshot_id = _file_id(self.path)
+        if self._snapshot_id is not None:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                contents = f.read()
+            for doc_id, text, metadata in json.loads(contents)["docs"]:
+                self._add(doc_id, text, metadata)
+            self._snapshot_bytes = len(contents)
+        self._replay_journal()
+
+    def _replay_journal(self, truncate: bool = False):
+        """
+        Applies the journal records past the ones already applied. A trailing partial record
+        is left for later (another worker may be writing it), or cut off with `truncate` (only
+        under the file lock, where it can only be the remains of a crash).
+        """
+        path = self._journal_path()
+        journal_id = _file_id(path, with_mtime=False)
+        if journal_id != self._journal_id:
+            # A new journal, started after a compaction
+            self._journal_id = journal_id
+            self._journal_bytes = 0
+        if journal_id is None:
+            return
+        with open(path, "rb") as f:
+            f.seek(self._journal_bytes)
+            tail = f.read()
+        *lines, partial = tail.split(b"\n")
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping unreadable record of lexical index journal %s", path)
+                continue
+            with self._lock:
+                self._apply(record)
+        offset = self._journal_bytes + len(tail) - len(partial)
+        if partial and truncate:
+            # A record torn by a crash mid-write; everything before it is intact
+            logger.warning("Truncating torn record of lexical index journal %s", path)
+            os.truncate(path, offset)
+        self._journal_bytes = offset
+
+    def refresh(self, truncate: bool = False):
+        """Applies what other workers saved since; reloads everything after they compacted."""
+        if not self.path:
+            return
+        with self._refresh_lock:
+            self._refreshed_at = time.monotonic()
+            if _file_id(self.path) == self._snapshot_id:
+                self._replay_journal(truncate)
+                return
+            fresh = LexicalIndex(self.path, self.k1, self.b, self.refresh_interval)
+            fresh._read_files()
+            with self._lock:
+                # Changes of this worker that are not saved yet still apply on top
+                for record in self._pending:
+                    fresh._apply(record)
+                for name in ("_docs", "_postings", "_key_by_id", "_next_key", "_total_length",
+                             "_snapshot_bytes", "_journal_bytes", "_snapshot_id", "_journal_id"):
+                    setattr(self, name, getattr(fresh, name))
+            if truncate:
+                self._replay_journal(truncate)
+            logger.info("Reloaded lexical index from %s with %d chunks", self.path, len(self))
+
+    def _maybe_refresh(self):
+        if self.path and time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self.refresh()
+
+    def _apply(self, record: dict):
+        # Records set or remove chunks, so replaying them over a snapshot that already has them is harmless
+        if record["op"] == "add":
+            for doc_id, text, metadata in record["docs"]:
+                self._add(doc_id, text, metadata)
+        elif record["op"] == "delete":
+            for doc_id in record["ids"]:
+                self._remove(doc_id)
+        elif record["op"] == "clear":
+            self._clear()
+
+    def _record(self, record: dict):
+        if self.path:
+            self._pending.append(record)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _add(self, doc_id: str, text: str, metadata: dict, term_counts: Optional[Counter] = None):
+        if doc_id in self._key_by_id:
+            self._remove(doc_id)
+        key = self._next_key
+        self._next_key += 1
+        if term_counts is None:
+            term_counts = Counter(tokenize(text))
+        length = sum(term_counts.values())
+        self._docs[key] = (doc_id, text, metadata, length)
+        self._key_by_id[doc_id] = key
+        self._total_length += length
+        for term, tf in term_counts.items():
+            self._postings.setdefault(term, {})[key] = tf
+
+    def _remove(self, doc_id: str):
+        key = self._key_by_id.pop(doc_id, None)
+        if key is None:
+            return
+        _, text, _, length = self._docs.pop(key)
+        self._total_length -= length
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+
+    def add_documents(self, docs: List[Document], ids: Iterable):
+        """Indexes chunks under the ids the vector store assigned to them."""
+        added = [[str(doc_id), doc.page_content, doc.metadata] for doc, doc_id in zip(docs, ids)]
+        # Tokenize before taking the lock, so searches are not held up by a whole batch
+        term_counts = [Counter(tokenize(text)) for _, text, _ in added]
+        with self._lock:
+            for (doc_id, text, metadata), counts in zip(added, term_counts):
+                self._add(doc_id, text, metadata, counts)
+            self._record({"op": "add", "docs": added})
+
+    def delete(self, ids: Iterable):
+        ids = [str(doc_id) for doc_id in ids]
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+            self._record({"op": "delete", "ids": ids})
+
+    def delete_source(self, name: str, keep_ids: Iterable = ()) -> int:
+        """Removes the chunks whose metadata name is `name`, except `keep_ids`; returns how many."""
+        keep_ids = {str(doc_id) for doc_id in keep_ids}
+        # Chunks of the source may have been added by another worker
+        self.refresh()
+        with self._lock:
+            doc_ids = [
+                doc_id for doc_id, _, metadata, _ in self._docs.values()
+                if metadata.get("name") == name and doc_id not in keep_ids
+            ]
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+            if doc_ids:
+                self._record({"op": "delete", "ids": doc_ids})
+        return len(doc_ids)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+            # Earlier unsaved changes are moot; save() writes an empty snapshot
+            self._pending = [{"op": "clear"}] if self.path else []
+
+    def _clear(self):
+        self._docs.clear()
+        self._postings.clear()
+        self._key_by_id.clear()
+        self._total_length = 0
+
+    def search(self, query: str, k: int = 4) -> List[Document]:
+        """Returns the top-k chunks by BM25 score."""
+        self._maybe_refresh()
+        terms = set(tokenize(query))
+        with self._lock:
+            if not self._docs:
+                return []
+            n_docs = len(self._docs)
+            avg_length = self._total_length / n_docs or 1.0
+            weighted_terms = []
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings:
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    weighted_terms.append((idf, postings))
+            # Terms found in most chunks barely move the ranking but dominate the cost of a lookup,
+            # so skip them unless the query has nothing more selective.
+            selective_terms = [(idf, postings) for idf, postings in weighted_terms if idf >= MIN_TERM_IDF]
+            scores = {}
+            for idf, postings in selective_terms or weighted_terms:
+                for key, tf in postings.items():
+                    length = self._docs[key][3]
+                    norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+                    scores[key] = scores.get(key, 0.0) + idf * norm
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [
+                Document(page_content=self._docs[key][1], metadata={**self._docs[key][2], "pk": self._docs[key][0]})
+                for key, _ in top
+            ]
+
+    def save(self):
+        """
+        Persists the changes made since the last save, if the index has a path: appends them to
+        the journal, or writes a new snapshot (atomically) once the journal would outgrow it.
+        """
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._save_lock, _locked(f"{self.path}.lock"):
+            with self._lock:
+                if not self._pending:
+                    return
+            # What other workers saved goes first; the journal then has no gaps for this worker
+            self.refresh(truncate=True)
+            with self._lock:
+                pending, self._pending = self._pending, []
+                lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in pending).encode("utf-8")
+                compact = (
+                    any(record["op"] == "clear" for record in pending)
+                    or self._journal_bytes + len(lines) > max(JOURNAL_COMPACT_MIN_BYTES, self._snapshot_bytes)
+                )
+                if compact:
+                    docs = [[doc_id, text, metadata] for doc_id, text, metadata, _ in self._docs.values()]
+            if compact:
+                self._write_snapshot(docs, directory)
+            else:
+                with open(self._journal_path(), "ab") as f:
+                    f.write(lines)
+                self._journal_id = _file_id(self._journal_path(), with_mtime=False)
+                self._journal_bytes += len(lines)
+
+    def _write_snapshot(self, docs: list, directory: str):
+        contents = json.dumps({"docs": docs}, separators=(",", ":"))
+        fd, tmp_path = tempfile.mkstemp(dir=directory or None, prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                f.write(contents)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        # A crash before this point replays the old journal over the new snapshot, which is harmless
+        try:
+            os.remove(self._journal_path())
+        except FileNotFoundError:
+            pass
+        self._snapshot_bytes = len(contents)
+        self._snapshot_id = _file_id(self.path)
+        self._journal_id = None
+        self._journal_bytes = 0
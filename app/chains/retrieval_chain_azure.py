@@ -4,6 +4,7 @@ from langchain.chains import RetrievalQA
 from langchain.prompts import ChatPromptTemplate
 from langchain_openai import AzureChatOpenAI
 from app.config import settings
+from app.chains.context_packing import ContextPacker
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
@@ -14,10 +15,12 @@ class RetrievalChainWrapper:
     Wrapper to hold:
       - The RetrievalQA chain (which queries our Azure AI Search index)
       - The cached embeddings
+      - The context packer (for token savings stats)
     """
-    def __init__(self, chain, embeddings):
+    def __init__(self, chain, embeddings, context_packer=None):
         self.chain = chain
         self.embeddings = embeddings
+        self.context_packer = context_packer
 
 async def initialize_retrieval_chain(vector_store, cached_embeddings) -> RetrievalChainWrapper:
     logger.info("Starting chain initialization...")
@@ -50,19 +53,18 @@ async def initialize_retrieval_chain(vector_store, cached_embeddings) -> Retriev
     ])
     logger.info("Prompt created")
 
-    def format_docs(docs):
-        """Helper function to format retrieved documents into a single string."""
-        return "\n\n".join(doc.page_content for doc in docs)
+    # Merges overlapping chunks and fits the context into CONTEXT_TOKEN_BUDGET tokens
+    context_packer = ContextPacker()
 
     # Initialize the LCEL chain
     lcel_chain = (
-        {"context": retriever | format_docs, "question": RunnablePassthrough()}
+        {"context": retriever | context_packer.pack, "question": RunnablePassthrough()}
         | question_prompt
         | llm
     )
     logger.info("LCEL RAG chain initialized")
     
-    return RetrievalChainWrapper(lcel_chain, cached_embeddings)
+    return RetrievalChainWrapper(lcel_chain, cached_embeddings, context_packer)
 
 async def answer_query(query: str, wrapper: RetrievalChainWrapper) -> dict:
     """
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import datetime
+from langchain_openai import ChatOpenAI
+from langchain.prompts import ChatPromptTemplate
+from langchain.docstore.document import Document
+from app.config import settings
+from app.chains.vector_store_local import LocalVectorStore
+from app.chains.context_packing import ContextPacker
+from app.utils.metrics import mark_llm_start
+from app.utils.scheduler import SchedulerSaturated
+from app.chains.hybrid_retriever import DenseRetriever
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from langchain_core.output_parsers import StrOutputParser
+
+logger = logging.getLogger(__name__)
+
+class RetrievalChainWrapper:
+    """
+    A simple wrapper to hold:
+      - The LCEL chain
+      - A separate user_queries_vectorstore
+      - The cached embeddings
+      - The context packer (for token savings stats)
+    """
+    def __init__(self, chain, embeddings, user_queries_vectorstore, context_packer=None):
+        self.chain = chain # This will be an LCEL chain
+        self.embeddings = embeddings
+        self.user_queries_vectorstore = user_queries_vectorstore
+        self.context_packer = context_packer
+
+async def initialize_retrieval_chain(vector_store, cached_embeddings) -> RetrievalChainWrapper:
+    """Initializes and returns a RetrievalChainWrapper with an LCEL chain over the in-process vector store."""
+
+    retriever = DenseRetriever(vector_store=vector_store, k=settings.RETRIEVAL_K) # Retrieve top k relevant documents
+    logger.debug("Retriever created")
+
+    llm = ChatOpenAI(
+        model_name=settings.OPENAI_API_CHAT_MODEL_NAME,
+        openai_api_key=settings.OPENAI_API_KEY,
+        temperature=settings.TEMPERATURE,
+        request_timeout=settings.REQUEST_TIMEOUT,
+        streaming=True
+    )
+    logger.debug("LLM loaded")
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", settings.SYSTEM_PROMPT),
+        ("human", "Context: {context}\n\nQuestion: {question}\n\nAnswer:")
+    ])
+    logger.debug("Prompt created for LCEL chain using system and human messages.")
+
+    # Merges overlapping chunks and fits the context into CONTEXT_TOKEN_BUDGET tokens
+    context_packer = ContextPacker()
+
+    # Same chain shape as the Zilliz provider, only the retriever is in-process
+    lcel_chain = (
+        {"context": retriever | context_packer.pack, "question": RunnablePassthrough()}
+        | prompt
+        | RunnableLambda(mark_llm_start) # Timestamps the LLM call for TTFT metrics
+        | llm # Outputs AIMessageChunk objects when streamed
+    )
+    logger.debug("LCEL RAG chain initialized for streaming")
+
+    user_queries_vectorstore = await asyncio.to_thread(
+        LocalVectorStore,
+        embedding_function=cached_embeddings,
+        persist_directory=settings.LOCAL_VECTOR_STORE_PATH,
+        collection_name=settings.LOCAL_USER_QUERIES_COLLECTION_NAME,
+    )
+    logger.debug("Opened local store for user queries insertion")
+
+    return RetrievalChainWrapper(lcel_chain, cached_embeddings, user_queries_vectorstore, context_packer)
+
+def store_user_query(query: str, wrapper: RetrievalChainWrapper, scheduler=None):
+    """
+    Stores the user's query into the local user queries store for analytics.
+    Runs as a non-blocking background task; with a scheduler, the embedding call waits in the
+    lowest-priority pool and is dropped if that pool is saturated.
+    """
+    doc = Document(
+        page_content=query,
+        metadata={
+            "timestamp": int(datetime.datetime.now().timestamp()),
+        }
+    )
+    asyncio.create_task(run_analytics_insert(wrapper.user_queries_vectorstore, doc, scheduler))
+
+async def run_analytics_insert(user_queries_vectorstore, doc: Document, scheduler=None):
+    try:
+        if scheduler is None:
+            await asyncio.to_thread(user_queries_vectorstore.add_documents, [doc])
+        else:
+            await scheduler.run("analytics", asyncio.to_thread, user_queries_vectorstore.add_documents, [doc])
+    except SchedulerSaturated:
+        logger.warning("Dropped analytics insert for a user query: scheduler saturated")
+    except Exception as e:
+        logger.error("Analytics insert for a user query failed: %s", e)
+
+async def answer_and_store(query: str, wrapper: RetrievalChainWrapper, scheduler=None) -> dict:
+    """
+    1) Uses the LCEL chain from the wrapper to get a non-streaming answer.
+    2) Stores the user's query into the local user queries store for analytics.
+    """
+    chain_for_full_answer = wrapper.chain | StrOutputParser()
+
+    logger.debug(f"answer_and_store: Invoking LCEL chain for full answer with query: {query}")
+    result_content = await chain_for_full_answer.ainvoke(query)
+    logger.debug(f"answer_and_store: Full answer received (first 200 chars): {result_content[:200]}...")
+
+    store_user_query(query, wrapper, scheduler)
+
+    return {"result": result_content, "source_documents": []}
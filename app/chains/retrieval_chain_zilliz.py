@@ -6,7 +6,11 @@ from langchain.prompts import ChatPromptTemplate
 from langchain_community.vectorstores import Zilliz
 from langchain.docstore.document import Document
 from app.config import settings
-from langchain_core.runnables import RunnablePassthrough
+from app.chains.hybrid_retriever import HybridRetriever, DenseRetriever
+from app.chains.context_packing import ContextPacker
+from app.utils.metrics import mark_llm_start
+from app.utils.scheduler import SchedulerSaturated
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 
 logger = logging.getLogger(__name__)
@@ -17,19 +21,32 @@ class RetrievalChainWrapper:
       - The LCEL chain
       - A separate user_queries_vectorstore
       - The cached embeddings
+      - The context packer (for token savings stats)
     """
-    def __init__(self, chain, embeddings, user_queries_vectorstore):
+    def __init__(self, chain, embeddings, user_queries_vectorstore, context_packer=None):
         self.chain = chain # This will be an LCEL chain
         self.embeddings = embeddings
         self.user_queries_vectorstore = user_queries_vectorstore
+        self.context_packer = context_packer
 
-async def initialize_retrieval_chain(vector_store, cached_embeddings) -> RetrievalChainWrapper:
-    """Initializes and returns a RetrievalChainWrapper with an LCEL chain for Zilliz."""
+async def initialize_retrieval_chain(vector_store, cached_embeddings, lexical_index=None) -> RetrievalChainWrapper:
+    """
+    Initializes and returns a RetrievalChainWrapper with an LCEL chain for Zilliz.
+    If a lexical index is given (and hybrid retrieval is enabled), dense hits are fused with BM25 hits.
+    """
 
-    retriever = vector_store.as_retriever(
-        search_kwargs={"k": 4} # Retrieve top 4 relevant documents
-    )
-    logger.debug("Retriever created")
+    if lexical_index is not None and settings.HYBRID_RETRIEVAL_ENABLED:
+        retriever = HybridRetriever(
+            vector_store=vector_store,
+            lexical_index=lexical_index,
+            k=settings.RETRIEVAL_K,
+            candidate_k=settings.HYBRID_CANDIDATE_K,
+            rrf_k=settings.HYBRID_RRF_K,
+        )
+        logger.debug("Hybrid (dense + BM25) retriever created")
+    else:
+        retriever = DenseRetriever(vector_store=vector_store, k=settings.RETRIEVAL_K) # Retrieve top k relevant documents
+        logger.debug("Retriever created")
     
     llm = ChatOpenAI(
         model_name=settings.OPENAI_API_CHAT_MODEL_NAME,
@@ -47,9 +64,8 @@ async def initialize_retrieval_chain(vector_store, cached_embeddings) -> Retriev
     ])
     logger.debug("Prompt created for LCEL chain using system and human messages.")
     
-    def format_docs(docs):
-        """Helper function to format retrieved documents into a single string."""
-        return "\n\n".join(doc.page_content for doc in docs)
+    # Merges overlapping chunks and fits the context into CONTEXT_TOKEN_BUDGET tokens
+    context_packer = ContextPacker()
 
     # LCEL Chain for streaming:
     # 1. Retrieve context using the retriever and format it.
@@ -57,8 +73,9 @@ async def initialize_retrieval_chain(vector_store, cached_embeddings) -> Retriev
     # 3. Combine context and question into the prompt.
     # 4. Send to LLM for generation.
     lcel_chain = (
-        {"context": retriever | format_docs, "question": RunnablePassthrough()}
+        {"context": retriever | context_packer.pack, "question": RunnablePassthrough()}
         | prompt
+        | RunnableLambda(mark_llm_start) # Timestamps the LLM call for TTFT metrics
         | llm # Outputs AIMessageChunk objects when streamed
     )
     logger.debug("LCEL RAG chain initialized for streaming")
@@ -87,9 +104,34 @@ async def initialize_retrieval_chain(vector_store, cached_embeddings) -> Retriev
     )
     logger.debug("Connected to Zilliz for user queries insertion")
     
-    return RetrievalChainWrapper(lcel_chain, cached_embeddings, user_queries_vectorstore)
+    return RetrievalChainWrapper(lcel_chain, cached_embeddings, user_queries_vectorstore, context_packer)
 
-async def answer_and_store(query: str, wrapper: RetrievalChainWrapper) -> dict:
+def store_user_query(query: str, wrapper: RetrievalChainWrapper, scheduler=None):
+    """
+    Stores the user's query into the 'user_queries' Zilliz collection for analytics.
+    Runs as a non-blocking background task; with a scheduler, the embedding call waits in the
+    lowest-priority pool and is dropped if that pool is saturated.
+    """
+    doc = Document(
+        page_content=query,
+        metadata={
+            "timestamp": int(datetime.datetime.now().timestamp()),
+        }
+    )
+    asyncio.create_task(run_analytics_insert(wrapper.user_queries_vectorstore, doc, scheduler))
+
+async def run_analytics_insert(user_queries_vectorstore, doc: Document, scheduler=None):
+    try:
+        if scheduler is None:
+            await asyncio.to_thread(user_queries_vectorstore.add_documents, [doc])
+        else:
+            await scheduler.run("analytics", asyncio.to_thread, user_queries_vectorstore.add_documents, [doc])
+    except SchedulerSaturated:
+        logger.warning("Dropped analytics insert for a user query: scheduler saturated")
+    except Exception as e:
+        logger.error("Analytics insert for a user query failed: %s", e)
+
+async def answer_and_store(query: str, wrapper: RetrievalChainWrapper, scheduler=None) -> dict:
     """
     1) Uses the LCEL chain from the wrapper to get a non-streaming answer.
     2) Stores the user's query into the 'user_queries' Zilliz collection for analytics.
@@ -103,13 +145,7 @@ async def answer_and_store(query: str, wrapper: RetrievalChainWrapper) -> dict:
     logger.debug(f"answer_and_store: Full answer received (first 200 chars): {result_content[:200]}...")
     
     # Store the user's query in the background
-    doc = Document(
-        page_content=query,
-        metadata={
-            "timestamp": int(datetime.datetime.now().timestamp()),
-        }
-    )
-    asyncio.create_task(asyncio.to_thread(wrapper.user_queries_vectorstore.add_documents, [doc]))
+    store_user_query(query, wrapper, scheduler)
     
     # Mimic previous output structure if necessary, though source_documents are not directly part of this simple LCEL answer stream
     return {"result": result_content, "source_documents": []}
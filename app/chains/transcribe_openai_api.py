@@ -3,6 +3,7 @@ import tempfile
 import aiofiles
 from fastapi import UploadFile
 import logging
+from app.utils.metrics import TRANSCRIBE_LATENCY
 
 logger = logging.getLogger(__name__)
 
@@ -38,10 +39,11 @@ async def transcribe(self, file: "UploadFile") -> str:
     try:
         with open(temp_path, "rb") as audio:
             logger.info("Sending audio file for transcription")
-            transcript = self.client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio
-            )
+            with TRANSCRIBE_LATENCY.time():
+                transcript = self.client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio
+                )
             logger.info("Transcription response received")
     except Exception as e:
         logger.error(f"Error during transcription: {e}")
@@ -0,0 +1,150 @@
+import re
+import json
+import asyncio
+import logging
+from typing import List, Optional
+from langchain.prompts import ChatPromptTemplate
+from app.config import settings
+from app.utils.tokens import count_tokens
+from app.utils.metrics import TRANSLATION_BATCHES
+
+logger = logging.getLogger(__name__)
+
+# Per-item prompt, also used as the fallback when a batched answer cannot be used
+ITEM_PROMPT = ChatPromptTemplate.from_messages([
+    (
+        "system",
+        "Translate the following text to {target_lang}. Provide only the translation."
+    ),
+    ("human", "{faq}")
+])
+
+BATCH_PROMPT = ChatPromptTemplate.from_messages([
+    (
+        "system",
+        "Translate every string in the JSON array sent by the user to {target_lang}. "
+        "Reply with only a JSON array of exactly {count} strings, the translations in the same order. "
+        "Keep markdown, links and placeholders unchanged."
+    ),
+    ("human", "{items}")
+])
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def parse_batch_output(content: str, expected: int) -> Optional[List[str]]:
+    """Returns the translated strings, or None unless the reply is a JSON array of `expected` strings."""
+    try:
+        translations = json.loads(_FENCE_RE.sub("", content.strip()))
+    except ValueError:
+        return None
+    if not isinstance(translations, list) or len(translations) != expected:
+        return None
+    if not all(isinstance(text, str) for text in translations):
+        return None
+    return translations
+
+
+def _content(message) -> str:
+    return message.content if hasattr(message, "content") else str(message)
+
+
+class TranslationChainWrapper:
+    """
+    Translates lists of strings with as few LLM calls as possible.
+
+    Strings are packed into JSON-array batches of at most `max_batch_tokens` input tokens and
+    `max_batch_items` strings, and the batches run concurrently through the native async chain
+    API (at most `max_concurrency` at a time, or one scheduler slot each). A batch whose reply is
+    not a JSON array of the same length is retried one string at a time, so a malformed answer
+    never shifts translations onto the wrong FAQ.
+    Calling the wrapper like the old chain (invoke/ainvoke with {"faq", "target_lang"})
+    still translates a single string.
+    """
+    def __init__(self, llm, max_batch_tokens: int, max_batch_items: int, max_concurrency: int):
+        self.llm = llm
+        self.chain = ITEM_PROMPT | llm
+        self.batch_chain = BATCH_PROMPT | llm
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.max_concurrency = max_concurrency
+
+    def invoke(self, inputs: dict, config=None):
+        return self.chain.invoke(inputs, config)
+
+    async def ainvoke(self, inputs: dict, config=None):
+        return await self.chain.ainvoke(inputs, config)
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        batches, current, current_tokens = [], [], 0
+        for text in texts:
+            tokens = count_tokens(text)
+            if current and (current_tokens + tokens > self.max_batch_tokens or len(current) >= self.max_batch_items):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _translate_batch(self, batch: List[str], target_lang: str, scheduler=None) -> List[str]:
+        if len(batch) > 1:
+            inputs = {"items": json.dumps(batch, ensure_ascii=False), "target_lang": target_lang, "count": len(batch)}
+            if scheduler is None:
+                reply = await self.batch_chain.ainvoke(inputs)
+            else:
+                reply = await scheduler.run("translation", self.batch_chain.ainvoke, inputs)
+            translations = parse_batch_output(_content(reply), len(batch))
+            if translations is not None:
+                TRANSLATION_BATCHES.labels("batched").inc()
+                return translations
+            logger.warning("Batched translation to '%s' returned an unusable reply, translating %d strings one by one",
+                           target_lang, len(batch))
+            TRANSLATION_BATCHES.labels("fallback").inc()
+        else:
+            TRANSLATION_BATCHES.labels("single").inc()
+
+        inputs = [{"faq": text, "target_lang": target_lang} for text in batch]
+        if scheduler is None:
+            replies = await self.chain.abatch(inputs, config={"max_concurrency": self.max_concurrency})
+        else:
+            replies = await scheduler.gather("translation", self.chain.ainvoke, inputs)
+        return [_content(reply) for reply in replies]
+
+    async def translate(self, texts: List[str], target_lang: str, scheduler=None) -> List[str]:
+        """
+        Returns `texts` translated to `target_lang`, in order. With a scheduler, every upstream
+        call holds a slot in its "translation" pool; otherwise at most `max_concurrency` batches
+        run at once.
+        """
+        if not texts:
+            return []
+        batches = self._batches(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(batch):
+            if scheduler is not None:
+                return await self._translate_batch(batch, target_lang, scheduler)
+            async with semaphore:
+                return await self._translate_batch(batch, target_lang)
+
+        tasks = [asyncio.ensure_future(run(batch)) for batch in batches]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            # One failed batch fails the whole list, so stop spending on the others
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        logger.debug("Translated %d strings to '%s' in %d batches", len(texts), target_lang, len(batches))
+        return [translation for batch in results for translation in batch]
+
+    @classmethod
+    def from_settings(cls, llm) -> "TranslationChainWrapper":
+        return cls(
+            llm,
+            max_batch_tokens=settings.TRANSLATION_BATCH_MAX_TOKENS,
+            max_batch_items=settings.TRANSLATION_BATCH_MAX_ITEMS,
+            max_concurrency=settings.TRANSLATION_MAX_CONCURRENCY,
+        )
@@ -1,15 +1,15 @@
 import asyncio
 import logging
 from langchain_openai import AzureChatOpenAI
-from langchain.prompts import ChatPromptTemplate
 from app.config import settings
+from app.chains.translation_batching import TranslationChainWrapper
 
 logger = logging.getLogger(__name__)
 
-async def initialize_translation_chain():
+async def initialize_translation_chain() -> TranslationChainWrapper:
     """
-    Initializes a translation chain using the new RunnableSequence style.
-    This chain is composed by piping a prompt template into the LLM.
+    Initializes a TranslationChainWrapper: a per-string chain (prompt | llm) plus a batched
+    chain that translates a JSON array of strings in one call.
     """
     logger.info("Starting translation chain initialization...")
     
@@ -26,19 +26,8 @@ async def initialize_translation_chain():
     )
     logger.info("LLM loaded for translation")
     
-    # Create prompt template for translation
-    prompt = ChatPromptTemplate.from_messages([
-        (
-            "system",
-            "Translate the following text to {target_lang}. Provide only the translation."
-        ),
-        ("human", "{faq}")
-    ])
-    logger.info("Prompt created for translation chain")
-    
-    # Compose the translation chain using the new style: prompt | llm
-    # This creates a pipeline where the prompt processes the input and passes it to the LLM.
-    translation_chain = prompt | llm
-    logger.info("Translation chain initialized using RunnableSequence (prompt | llm)")
+    # Both chains pipe their prompt into the same LLM (RunnableSequence: prompt | llm)
+    translation_chain = TranslationChainWrapper.from_settings(llm)
+    logger.info("Translation chain initialized with batching (up to %d strings per call)", translation_chain.max_batch_items)
     
     return translation_chain
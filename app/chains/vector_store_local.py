@@ -0,0 +1,466 @@
+import os
+import json
+import uuid
+import base64
+import asyncio
+import logging
+import threading
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain_openai import OpenAIEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from app.config import settings
+from app.utils.embedding_store import SQLiteEmbeddingStore
+
+logger = logging.getLogger(__name__)
+
+# The journal is folded into a new snapshot once it is larger than the snapshot (and this floor),
+# so the bytes written to persist the store stay proportional to the rows written
+JOURNAL_COMPACT_MIN_BYTES = 16 * 1024 * 1024
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store backed by a contiguous NumPy matrix of unit-normalized embeddings.
+
+    Search is a single matrix-vector product followed by a partial sort, so it needs no network
+    round trip. Optionally:
+      - quantize=True keeps vectors as int8 with a per-row scale (4x less memory than float32).
+      - ivf_lists > 0 partitions the rows with spherical k-means and only scores the `ivf_nprobe`
+        closest partitions, which keeps latency flat for larger corpora.
+
+    The matrix is persisted as a .npy snapshot next to a JSON sidecar (ids, texts, metadata) and
+    is memory-mapped on load, so startup cost does not grow with the corpus. Writes append only
+    the rows they add or the ids they delete to a journal, which is replayed on load and folded
+    into a new snapshot once it outgrows the last one.
+    """
+    def __init__(
+        self,
+        embedding_function: Embeddings,
+        persist_directory: Optional[str] = None,
+        collection_name: str = "documents",
+        quantize: bool = False,
+        ivf_lists: int = 0,
+        ivf_nprobe: int = 8,
+    ):
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.quantize = quantize
+        self.ivf_lists = ivf_lists
+        self.ivf_nprobe = ivf_nprobe
+        self._lock = threading.RLock()
+
+        # Row storage: the first `_size` rows of `_matrix` (and `_scales` when quantized) are live.
+        self._matrix = None
+        self._scales = None
+        self._size = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._row_by_id = {}
+
+        # IVF state, rebuilt lazily whenever the row count has doubled since the last training
+        self._centroids = None
+        self._assignments = None
+        self._ivf_trained_size = 0
+
+        # Persistence: snapshot generation (its files and journal are named after it) and sizes
+        self._generation = 0
+        self._snapshot_bytes = 0
+        self._journal_bytes = 0
+
+        if persist_directory:
+            os.makedirs(persist_directory, exist_ok=True)
+            self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    # --- persistence ---
+
+    def _path(self, suffix: str) -> str:
+        return os.path.join(self.persist_directory, f"{self.collection_name}{suffix}")
+
+    def _snapshot_path(self, generation: int, suffix: str) -> str:
+        # Generation 0 is the layout of stores persisted before snapshots were versioned
+        return self._path(suffix if generation == 0 else f".{generation}{suffix}")
+
+    def _journal_path(self) -> str:
+        return self._path(f".{self._generation}.journal")
+
+    def _load(self):
+        sidecar_path = self._path(".json")
+        if os.path.exists(sidecar_path):
+            self._load_snapshot(sidecar_path)
+        self._replay_journal()
+        logger.info("Loaded local vector store '%s' with %d vectors", self.collection_name, self._size)
+
+    def _load_snapshot(self, sidecar_path: str):
+        with open(sidecar_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        if sidecar.get("quantize", False) != self.quantize:
+            logger.warning(
+                "Local vector store '%s' was persisted with quantize=%s; keeping the persisted format",
+                self.collection_name, sidecar.get("quantize"),
+            )
+            self.quantize = sidecar.get("quantize", False)
+
+        self._generation = sidecar.get("generation", 0)
+        self._ids = sidecar["ids"]
+        self._texts = sidecar["texts"]
+        self._metadatas = sidecar["metadatas"]
+        self._size = len(self._ids)
+        self._row_by_id = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._snapshot_bytes = os.path.getsize(sidecar_path)
+        if self._size:
+            self._matrix = np.load(self._snapshot_path(self._generation, ".npy"), mmap_mode="r")
+            self._snapshot_bytes += self._matrix.nbytes
+            if self.quantize:
+                self._scales = np.load(self._snapshot_path(self._generation, ".scales.npy"), mmap_mode="r")
+
+    def _replay_journal(self):
+        path = self._journal_path()
+        if not os.path.exists(path):
+            return
+        applied = 0
+        offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A record torn by a crash mid-write; everything before it is intact
+                    logger.warning("Truncating torn journal record of local vector store '%s'", self.collection_name)
+                    break
+                self._apply(record)
+                offset += len(line)
+                applied += 1
+        if offset != os.path.getsize(path):
+            os.truncate(path, offset)
+        self._journal_bytes = offset
+        logger.info("Replayed %d journaled writes of local vector store '%s'", applied, self.collection_name)
+
+    def _apply(self, record: dict):
+        if record["op"] == "add":
+            dtype = np.int8 if self.quantize else np.float32
+            encoded = np.frombuffer(base64.b64decode(record["rows"]), dtype=dtype).reshape(len(record["ids"]), -1)
+            scales = np.frombuffer(base64.b64decode(record["scales"]), dtype=np.float32) if self.quantize else None
+            self._append_rows(encoded, scales, record["texts"], record["metadatas"], record["ids"])
+        elif record["op"] == "delete":
+            self._drop_rows(record["ids"])
+
+    def _journal(self, record: dict):
+        """Appends one write to the journal, or writes a new snapshot once the journal outgrows the last one."""
+        if not self.persist_directory:
+            return
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with open(self._journal_path(), "ab") as f:
+            f.write(line)
+        self._journal_bytes += len(line)
+        if self._journal_bytes > max(JOURNAL_COMPACT_MIN_BYTES, self._snapshot_bytes):
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        """
+        Writes the live rows as the next snapshot generation. The sidecar is replaced last and
+        names the generation, so it is the commit point: a crash before it leaves the previous
+        snapshot and its journal in place.
+        """
+        if not self.persist_directory:
+            return
+
+        def atomic_save(path: str, array: np.ndarray):
+            # np.save appends .npy to paths that lack it, so write through an open file handle
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+
+        previous = self._generation
+        generation = previous + 1
+        if self._size:
+            atomic_save(self._snapshot_path(generation, ".npy"), np.ascontiguousarray(self._matrix[: self._size]))
+            if self.quantize:
+                atomic_save(self._snapshot_path(generation, ".scales.npy"), np.ascontiguousarray(self._scales[: self._size]))
+
+        tmp_path = self._path(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"quantize": self.quantize, "generation": generation,
+                 "ids": self._ids, "texts": self._texts, "metadatas": self._metadatas},
+                f,
+            )
+        os.replace(tmp_path, self._path(".json"))
+
+        journal_path = self._journal_path()
+        self._generation = generation
+        for path in (self._snapshot_path(previous, ".npy"), self._snapshot_path(previous, ".scales.npy"), journal_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already gone, or still mapped on a platform that forbids removing it
+        self._journal_bytes = 0
+        self._snapshot_bytes = os.path.getsize(self._path(".json")) + (self._matrix[: self._size].nbytes if self._size else 0)
+
+    # --- row storage ---
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _encode_rows(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if not self.quantize:
+            return vectors.astype(np.float32), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def _ensure_capacity(self, extra_rows: int, dim: int):
+        """Grows the row buffers geometrically so appends are amortized O(1) per row."""
+        required = self._size + extra_rows
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        # Memory-mapped arrays loaded from disk are read-only and must be copied before appending
+        writable = self._matrix is not None and self._matrix.flags.writeable
+        if required <= capacity and writable:
+            return
+        new_capacity = max(required, capacity * 2, 64)
+        matrix = np.zeros((new_capacity, dim), dtype=np.int8 if self.quantize else np.float32)
+        scales = np.ones(new_capacity, dtype=np.float32) if self.quantize else None
+        if self._size:
+            matrix[: self._size] = self._matrix[: self._size]
+            if self.quantize:
+                scales[: self._size] = self._scales[: self._size]
+        self._matrix = matrix
+        self._scales = scales
+
+    def _append_rows(self, encoded: np.ndarray, scales: Optional[np.ndarray], texts: List[str], metadatas: List[dict], ids: List[str]):
+        self._ensure_capacity(len(texts), encoded.shape[1])
+        start = self._size
+        self._matrix[start : start + len(texts)] = encoded
+        if self.quantize:
+            self._scales[start : start + len(texts)] = scales
+        for offset, doc_id in enumerate(ids):
+            self._row_by_id[doc_id] = start + offset
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._metadatas.extend(metadatas)
+        self._size += len(texts)
+
+    def _add_vectors(self, texts: List[str], vectors: List[List[float]], metadatas: List[dict], ids: List[str]) -> List[str]:
+        rows = self._normalize(np.asarray(vectors, dtype=np.float32))
+        encoded, scales = self._encode_rows(rows)
+        with self._lock:
+            self._append_rows(encoded, scales, texts, metadatas, ids)
+            if self._assignments is not None:
+                # Keep the IVF lists current until the next retraining
+                self._assignments = np.concatenate([self._assignments, np.argmax(rows @ self._centroids.T, axis=1)])
+            self._journal({
+                "op": "add",
+                "ids": ids,
+                "texts": texts,
+                "metadatas": metadatas,
+                "rows": base64.b64encode(np.ascontiguousarray(encoded).tobytes()).decode("ascii"),
+                "scales": base64.b64encode(scales.tobytes()).decode("ascii") if self.quantize else None,
+            })
+        return ids
+
+    # --- IVF partitioning ---
+
+    def _train_ivf(self):
+        """Spherical k-means over the live rows (deterministic seed so results are reproducible)."""
+        rows = self._rows_as_float()
+        lists = min(self.ivf_lists, self._size)
+        rng = np.random.RandomState(0)
+        centroids = rows[rng.choice(self._size, size=lists, replace=False)].copy()
+        for _ in range(10):
+            assignments = np.argmax(rows @ centroids.T, axis=1)
+            for i in range(lists):
+                members = rows[assignments == i]
+                if len(members):
+                    centroids[i] = members.sum(axis=0)
+            centroids = self._normalize(centroids)
+        self._centroids = centroids
+        self._assignments = np.argmax(rows @ centroids.T, axis=1)
+        self._ivf_trained_size = self._size
+        logger.info("Trained IVF index for '%s' with %d lists over %d vectors", self.collection_name, lists, self._size)
+
+    def _rows_as_float(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if rows is None:
+            rows = np.arange(self._size)
+        if self.quantize:
+            return self._matrix[rows].astype(np.float32) * self._scales[rows, None]
+        return self._matrix[rows]
+
+    def _candidate_rows(self, query_vector: np.ndarray) -> Optional[np.ndarray]:
+        """Returns the rows to score, or None to score every row."""
+        if self.ivf_lists <= 0 or self._size < self.ivf_lists * 20:
+            return None
+        if self._centroids is None or self._size >= 2 * self._ivf_trained_size:
+            self._train_ivf()
+        nprobe = min(self.ivf_nprobe, len(self._centroids))
+        probe_lists = np.argpartition(-(self._centroids @ query_vector), nprobe - 1)[:nprobe]
+        return np.flatnonzero(np.isin(self._assignments, probe_lists))
+
+    # --- search ---
+
+    def _search(self, embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+        query_vector = self._normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            if not self._size:
+                return []
+            candidates = self._candidate_rows(query_vector)
+            if candidates is None:
+                scores = self._matrix[: self._size] @ query_vector
+                if self.quantize:
+                    scores = scores * self._scales[: self._size]
+                rows = np.arange(self._size)
+            else:
+                scores = self._rows_as_float(candidates) @ query_vector
+                rows = candidates
+
+            k = min(k, len(rows))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (
+                    Document(
+                        page_content=self._texts[rows[i]],
+                        metadata={**self._metadatas[rows[i]], "pk": self._ids[rows[i]]},
+                    ),
+                    float(scores[i]),
+                )
+                for i in top
+            ]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self._search(embedding, k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self._search(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self._search(self.embedding_function.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities in [-1, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    # --- writes ---
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = [dict(m) for m in metadatas] if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        vectors = self.embedding_function.embed_documents(texts)
+        return self._add_vectors(texts, vectors, metadatas, ids)
+
+    def add_embeddings(self, text_embeddings: Iterable[Tuple[str, List[float]]], metadatas: Optional[List[dict]] = None, *,
+                       keys: Optional[List[str]] = None) -> List[str]:
+        """
+        Adds pre-embedded texts (same signature as AzureSearch.add_embeddings). Rows whose key
+        already exists are replaced, so adding the same keys twice is harmless.
+        """
+        text_embeddings = list(text_embeddings)
+        if not text_embeddings:
+            return []
+        texts = [text for text, _ in text_embeddings]
+        vectors = [vector for _, vector in text_embeddings]
+        metadatas = [dict(m) for m in metadatas] if metadatas else [{} for _ in texts]
+        ids = list(keys) if keys else [uuid.uuid4().hex for _ in texts]
+        with self._lock:
+            existing = [doc_id for doc_id in ids if doc_id in self._row_by_id]
+            if existing:
+                self.delete(existing)
+            return self._add_vectors(texts, vectors, metadatas, ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Deletes the given ids, or every vector when ids is None."""
+        ids = list(ids) if ids is not None else None
+        with self._lock:
+            if not self._drop_rows(ids):
+                return False
+            if ids is None:
+                self._write_snapshot()
+            else:
+                self._journal({"op": "delete", "ids": ids})
+        return True
+
+    def _drop_rows(self, ids: Optional[List[str]]) -> bool:
+        if ids is None:
+            keep = np.zeros(0, dtype=np.intp)
+        else:
+            drop = {self._row_by_id[doc_id] for doc_id in ids if doc_id in self._row_by_id}
+            if not drop:
+                return False
+            keep = np.array([row for row in range(self._size) if row not in drop], dtype=np.intp)
+
+        self._matrix = self._matrix[keep] if len(keep) else None
+        self._scales = self._scales[keep] if self.quantize and len(keep) else None
+        self._ids = [self._ids[row] for row in keep]
+        self._texts = [self._texts[row] for row in keep]
+        self._metadatas = [self._metadatas[row] for row in keep]
+        self._size = len(keep)
+        self._row_by_id = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._centroids = None
+        self._assignments = None
+        return True
+
+    def ids_for_source(self, name: str) -> List[str]:
+        """Returns the ids of the chunks ingested from the source `name` (metadata "name")."""
+        with self._lock:
+            return [doc_id for doc_id, metadata in zip(self._ids, self._metadatas) if metadata.get("name") == name]
+
+    def count(self) -> int:
+        return self._size
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs: Any) -> "LocalVectorStore":
+        ids = kwargs.pop("ids", None)
+        store = cls(embedding_function=embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+
+async def initialize_vector_store_local():
+    embeddings = OpenAIEmbeddings(
+        openai_api_key = settings.OPENAI_API_KEY,
+        model = settings.OPENAI_API_EMBEDDING_MODEL_NAME
+    )
+
+    # Same persistent embedding cache as the other providers, in its own namespace
+    embedding_store = SQLiteEmbeddingStore(
+        path=settings.EMBEDDING_CACHE_PATH,
+        namespace=f"local:{settings.OPENAI_API_EMBEDDING_MODEL_NAME}",
+        max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+        float16=settings.EMBEDDING_CACHE_FLOAT16,
+    )
+    cached_embeddings = CacheBackedEmbeddings(embeddings, embedding_store, query_embedding_store=embedding_store)
+    logger.info("Cached embeddings initialized")
+
+    # Loading memory-maps the persisted matrix, so keep it off the event loop
+    vector_store = await asyncio.to_thread(
+        LocalVectorStore,
+        embedding_function=cached_embeddings,
+        persist_directory=settings.LOCAL_VECTOR_STORE_PATH,
+        collection_name=settings.LOCAL_COLLECTION_NAME,
+        quantize=settings.LOCAL_VECTOR_STORE_QUANTIZE,
+        ivf_lists=settings.LOCAL_VECTOR_STORE_IVF_LISTS,
+        ivf_nprobe=settings.LOCAL_VECTOR_STORE_IVF_NPROBE,
+    )
+
+    return vector_store, cached_embeddings
@@ -1,9 +1,9 @@
 from langchain.embeddings import CacheBackedEmbeddings
 from langchain_openai import OpenAIEmbeddings
-from langchain.storage import InMemoryByteStore
 from langchain_community.vectorstores import Zilliz
 import asyncio
 from app.config import settings
+from app.utils.embedding_store import SQLiteEmbeddingStore
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,9 +14,15 @@ async def initialize_vector_store_zilliz():
         model = settings.OPENAI_API_EMBEDDING_MODEL_NAME
     )
 
-    # 2. Set up an in-memory byte store and create a cached embeddings function
-    byte_store = InMemoryByteStore()
-    cached_embeddings = CacheBackedEmbeddings(embeddings, byte_store)
+    # 2. Set up a persistent, size-bounded embedding store and create a cached embeddings function
+    #    Query embeddings are cached as well so repeated queries are embedded once across restarts.
+    embedding_store = SQLiteEmbeddingStore(
+        path=settings.EMBEDDING_CACHE_PATH,
+        namespace=f"zilliz:{settings.OPENAI_API_EMBEDDING_MODEL_NAME}",
+        max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+        float16=settings.EMBEDDING_CACHE_FLOAT16,
+    )
+    cached_embeddings = CacheBackedEmbeddings(embeddings, embedding_store, query_embedding_store=embedding_store)
     logger.info("Cached embeddings initialized")
 
     # 3. Create an Azure AI Search vector store (index) for retrieval
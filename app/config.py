@@ -12,6 +12,16 @@ class Settings(BaseSettings):
     ZILLIZ_VECTOR_FIELD_NAME: str = "vector"
     ZILLIZ_VECTOR_TEXT_FIELD_NAME: str = "vector_content"
     ZILLIZ_PRIMARY_KEY_FIELD_NAME: str = "pk"
+    # Shared REST client (FAQs, analytics search, deletes): pooled keep-alive connections
+    ZILLIZ_TIMEOUT: float = 10.0
+    ZILLIZ_CONNECT_TIMEOUT: float = 5.0
+    ZILLIZ_MAX_CONNECTIONS: int = 20
+    ZILLIZ_HTTP2: bool = False  # needs the 'h2' package
+    ZILLIZ_MAX_RETRIES: int = 3  # retries on 429/5xx and connection errors, with jittered backoff
+    # Bulk deletes drain the collection page by page, deleting batches concurrently
+    BULK_DELETE_PAGE_SIZE: int = 1000
+    BULK_DELETE_BATCH_SIZE: int = 100
+    BULK_DELETE_CONCURRENCY: int = 4
 
     AZURE_OPENAI_ENDPOINT: str
     AZURE_OPENAI_API_KEY: str
@@ -32,6 +42,124 @@ class Settings(BaseSettings):
     CHUNK_OVERLAP: int = 400
     PORT: int = 8000
     MAX_GENERATED_SENTENCES: int = 5
+
+    # Semantic answer cache: replays a previous answer when a new query embeds close enough to one already answered
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_TTL: int = 3600  # seconds
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+
+    # Persistent embedding cache shared by every vector store and worker process on the host
+    EMBEDDING_CACHE_PATH: str = ".cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    EMBEDDING_CACHE_FLOAT16: bool = False
+
+    # In-process provider (served under /local) with a NumPy vector index persisted to disk
+    LOCAL_PROVIDER_ENABLED: bool = False
+    LOCAL_VECTOR_STORE_PATH: str = ".cache/local_vector_store"
+    LOCAL_COLLECTION_NAME: str = "documents"
+    LOCAL_USER_QUERIES_COLLECTION_NAME: str = "user_queries"
+    LOCAL_VECTOR_STORE_QUANTIZE: bool = False  # int8 vectors with a per-row scale
+    LOCAL_VECTOR_STORE_IVF_LISTS: int = 0  # 0 disables IVF partitioning (exact search)
+    LOCAL_VECTOR_STORE_IVF_NPROBE: int = 8
+    LOCAL_FAQ_PATH: str = "faqs.json"
+    LOCAL_FAQ_TRANSLATION_CACHE_PATH: str = ".cache/faq_translations_local.json"
+    LOCAL_INGEST_MANIFEST_PATH: str = ".cache/ingest_manifest_local.sqlite3"
+
+    # Retrieval: dense Zilliz hits fused with a BM25 index over ingested chunks (reciprocal-rank fusion)
+    RETRIEVAL_K: int = 4
+    HYBRID_RETRIEVAL_ENABLED: bool = True
+    HYBRID_CANDIDATE_K: int = 8  # candidates taken from each retriever before fusion
+    HYBRID_RRF_K: int = 60
+    LEXICAL_INDEX_PATH: str = ".cache/lexical_index_zilliz.json.gz"
+
+    # Incremental ingestion: chunk content hashes per source (SQLite, shared by the workers on one
+    # host), so re-ingests only embed changed chunks. A manifest left at the same path with a
+    # .json extension is imported on startup.
+    INGEST_MANIFEST_PATH: str = ".cache/ingest_manifest_zilliz.sqlite3"
+    AZURE_INGEST_MANIFEST_PATH: str = ".cache/ingest_manifest_azure.sqlite3"
+    # Background jobs (ingestion, bulk deletes) are recorded in SQLite, shared by the workers on
+    # one host. Ingest jobs are resumed after a restart: a job whose worker stops heartbeating for
+    # JOB_LEASE seconds is picked up again (delete jobs are then reported as failed). Uploads are
+    # spooled to disk until their job has run.
+    JOB_STORE_PATH: str = ".cache/jobs.sqlite3"
+    JOB_LEASE: float = 60.0
+    INGEST_SPOOL_DIR: str = ".cache/ingest_spool"
+    INGEST_WORKERS: int = 2
+    # Documents are parsed and split lazily. New chunks are embedded in batches of at most
+    # INGEST_EMBED_BATCH_SIZE chunks and INGEST_EMBED_BATCH_TOKENS tokens, INGEST_EMBED_CONCURRENCY
+    # batches at a time, and inserted while the next batches embed. A failed batch is retried
+    # INGEST_WRITE_RETRIES times on its own.
+    INGEST_EMBED_BATCH_SIZE: int = 64
+    INGEST_EMBED_BATCH_TOKENS: int = 32000
+    INGEST_EMBED_CONCURRENCY: int = 2
+    INGEST_WRITE_RETRIES: int = 3
+    # PDF and DOCX parsing runs in a process pool started by the first document (PARSE_WORKERS
+    # processes, 0 = one per CPU core up to 4); PDFs are parsed PDF_PAGES_PER_SHARD pages per task, several shards in parallel
+    PARSE_POOL_ENABLED: bool = True
+    PARSE_WORKERS: int = 0
+    PDF_PAGES_PER_SHARD: int = 16
+    # Text file encodings are detected from a sample of this many bytes
+    ENCODING_SAMPLE_BYTES: int = 64 * 1024
+    # URL and sitemap ingestion: at most CRAWL_CONCURRENCY fetches in flight, CRAWL_PER_HOST_CONCURRENCY
+    # per host, spaced CRAWL_PER_HOST_DELAY seconds apart (or robots.txt Crawl-delay); pages are
+    # ingested as they arrive, CRAWL_INGEST_CONCURRENCY at a time
+    CRAWL_CONCURRENCY: int = 8
+    CRAWL_PER_HOST_CONCURRENCY: int = 2
+    CRAWL_PER_HOST_DELAY: float = 0.25
+    CRAWL_TIMEOUT: float = 15.0
+    CRAWL_MAX_PAGES: int = 2000
+    CRAWL_MAX_PAGE_BYTES: int = 5 * 1024 * 1024
+    CRAWL_USER_AGENT: str = "chatbot-ingest/1.0"
+    CRAWL_RESPECT_ROBOTS: bool = True
+    CRAWL_INGEST_CONCURRENCY: int = 4
+
+    # Prompt context: overlapping chunks are merged, then packed into this many tokens
+    CONTEXT_TOKEN_BUDGET: int = 4000
+
+    # Identical in-flight chat queries subscribe to one upstream generation
+    STREAM_COALESCING_ENABLED: bool = True
+
+    # JSON SSE framing (qa/stream with "framing": "json"): tokens are batched per flush window
+    SSE_FLUSH_INTERVAL_MS: int = 25
+    SSE_FLUSH_BYTES: int = 256
+
+    # Upstream LLM/embedding admission control (per provider). Size LLM_MAX_CONCURRENCY against the
+    # API rate-limit tier; background pools can never take the last LLM_INTERACTIVE_RESERVED slots.
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_INTERACTIVE_RESERVED: int = 4
+    LLM_POOL_LIMITS: dict = {"interactive": 16, "translation": 8, "ingest": 4, "analytics": 2}
+    LLM_QUEUE_LIMITS: dict = {"interactive": 64, "translation": 256, "ingest": 32, "analytics": 256}
+    LLM_QUEUE_TIMEOUT: float = 10.0  # seconds a call may wait for a slot before it is rejected
+
+    # FAQs are refreshed from the store in the background after FAQ_CACHE_TTL seconds;
+    # browsers may reuse a FAQ response for FAQ_BROWSER_MAX_AGE seconds before revalidating (ETag)
+    FAQ_CACHE_TTL: int = 300
+    FAQ_BROWSER_MAX_AGE: int = 60
+
+    # Translated FAQs are cached per language (keyed by a hash of each FAQ) and persisted. Only the
+    # languages offered by the chatbot widget (and "en") are accepted; /faqs/translate answers 400
+    # for any other. The prewarm languages are refreshed in the background.
+    FAQ_TRANSLATION_CACHE_PATH: str = ".cache/faq_translations_zilliz.json"
+    FAQ_TRANSLATION_LANGUAGES: list = ["es", "vi", "fr", "de", "ja", "ru", "ar", "ko", "hi", "bn"]
+    FAQ_TRANSLATION_PREWARM_LANGUAGES: list = ["es", "vi", "fr", "de", "ja", "ru", "ar", "ko", "hi", "bn"]
+    FAQ_TRANSLATION_REFRESH_INTERVAL: int = 300  # seconds, matches the FAQ cache TTL
+    # Strings are translated in JSON-array batches of at most this many input tokens / strings
+    TRANSLATION_BATCH_MAX_TOKENS: int = 1500
+    TRANSLATION_BATCH_MAX_ITEMS: int = 40
+    TRANSLATION_MAX_CONCURRENCY: int = 4  # concurrent batches when no LLM scheduler is used
+
+    # Per-IP token bucket for /api/ routes. "memory" keeps buckets per worker; "sqlite" shares
+    # them between the workers on one host through RATE_LIMIT_SQLITE_PATH.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_SQLITE_PATH: str = ".cache/rate_limit.sqlite3"
+    RATE_LIMIT_PER_MINUTE: float = 60
+    RATE_LIMIT_BURST: int = 60
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    # Routes with a bucket of their own per IP: path suffix -> [requests per minute, burst]
+    RATE_LIMIT_ROUTE_LIMITS: dict = {"/api/transcribe": [5, 5]}
+
     SYSTEM_PROMPT: str = (
         "1. Only use information explicitly contained in the context.\n"
         "2. Do not fabricate or guess any links that are not in the context.\n"
@@ -7,4 +7,8 @@ def set_azure_provider(request: Request):
 
 def set_zilliz_provider(request: Request):
     request.state.provider = request.app.state.zilliz_provider
-    request.state.template = {**settings.WSU_TEMPLATE, "api_base_url": "/wsu/api"}
\ No newline at end of file
+    request.state.template = {**settings.WSU_TEMPLATE, "api_base_url": "/wsu/api"}
+
+def set_local_provider(request: Request):
+    request.state.provider = request.app.state.local_provider
+    request.state.template = {**settings.WSU_TEMPLATE, "api_base_url": "/local/api"}
@@ -22,19 +22,44 @@ async def document_delete(request: Request, id: str = Query(..., description="Th
         
     return JSONResponse(content=result)
 
-@router.get("/document_delete_all")
+@router.get("/document_delete_source")
+async def document_delete_source(request: Request, name: str = Query(..., description="Filename or URL the chunks were ingested from")):
+    """
+    Deletes every chunk ingested from one source document.
+    Called with a query parameter, e.g.:
+      localhost:8000/api/document_delete_source?name=handbook.pdf
+    """
+    logger.debug("Received request to delete source %s", name)
+    try:
+        result = await request.state.provider.delete_source(name)
+        logger.info("Source %s deleted with result: %s", name, result)
+    except Exception as e:
+        logger.error("Source deletion error for %s: %s", name, e)
+        raise HTTPException(status_code=500, detail="Source deletion failed")
+
+    return JSONResponse(content=result)
+
+@router.get("/document_delete_all", status_code=202)
 async def document_delete_all(request: Request):
     """
-    Deletes all documents from the provider.
+    Starts deleting all documents from the provider in the background.
     Called without parameters, e.g.:
       localhost:8000/api/document_delete_all
+    Returns the job; poll the URL in its Location header for progress.
     """
     logger.debug("Received request to delete all documents")
-    try:
-        result = await request.state.provider.delete_all_documents()
-        logger.info(f"All documents deleted successfully with result: {result}")
-    except Exception as e:
-        logger.error("Delete all documents error: %s", e)
-        raise HTTPException(status_code=500, detail="Delete all documents failed")
-        
-    return JSONResponse(content=result)
+    job = await request.app.state.jobs.submit("delete_all", request.state.provider.delete_all_documents,
+                                              source=request.url.path)
+    status_url = request.url.path.rsplit("/", 1)[0] + f"/document_delete_jobs/{job['id']}"
+    return JSONResponse(status_code=202, content=job, headers={"Location": status_url})
+
+@router.get("/document_delete_jobs/{job_id}")
+async def document_delete_job(request: Request, job_id: str):
+    """
+    Reports progress, throughput and failures of a delete job, e.g.:
+      localhost:8000/api/document_delete_jobs/JOB_ID
+    """
+    job = await request.app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=job)
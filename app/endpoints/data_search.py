@@ -3,6 +3,7 @@
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse
 import logging
+from app.utils.scheduler import SchedulerSaturated
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -15,6 +16,8 @@ async def search_data(request: Request, query: str, limit: int = 100, radius: fl
     try:
         result = await request.state.provider.search_data(query, limit, radius)
         return JSONResponse(result)
+    except SchedulerSaturated:
+        raise  # answered with 503 + Retry-After by the app's exception handler
     except Exception as e:
         logger.exception("Search data error")
         raise HTTPException(status_code=500, detail=str(e))
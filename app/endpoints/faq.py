@@ -1,17 +1,36 @@
+import asyncio
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 import logging
+from app.config import settings
+from app.utils.scheduler import SchedulerSaturated
+from app.utils.translation_cache import UnsupportedLanguage, translation_language
+from app.utils.http_cache import PayloadCache, cached_json_response
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Serialized, hashed and compressed FAQ bodies per (provider, language)
+faq_payloads = PayloadCache()
+
+# Browsers reuse the FAQs for a minute, then revalidate with If-None-Match (usually a 304)
+FAQ_CACHE_CONTROL = f"public, max-age={settings.FAQ_BROWSER_MAX_AGE}, stale-while-revalidate={settings.FAQ_CACHE_TTL}"
+
+
+async def faq_response(request: Request, lang: str, faqs: list):
+    key = (id(request.state.provider), lang)
+    payload = faq_payloads.get(key, faqs)
+    if payload is None:
+        payload = await asyncio.to_thread(faq_payloads.encode, key, faqs)
+    return cached_json_response(request, payload, FAQ_CACHE_CONTROL)
+
 @router.get("/faqs")
 async def get_faqs(request: Request):
     provider = request.state.provider
     try:
         faq_texts = await provider.get_faqs()
         logger.debug("FAQs: %s", faq_texts)
-        return JSONResponse(faq_texts)
+        return await faq_response(request, "en", faq_texts)
     except Exception as e:
         logger.error(f"Failed to retrieve FAQs: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
@@ -19,10 +38,16 @@ async def get_faqs(request: Request):
 @router.get("/faqs/translate")
 async def translate_faqs(request: Request, lang: str = 'en'):
     provider = request.state.provider
+    try:
+        lang = translation_language(lang)
+    except UnsupportedLanguage as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     try:
         translated_faqs = await provider.translate_faqs(target_lang=lang)
         logger.debug("Translated FAQs: %s", translated_faqs)
-        return JSONResponse(translated_faqs)
+        return await faq_response(request, lang, translated_faqs)
+    except SchedulerSaturated:
+        raise  # answered with 503 + Retry-After by the app's exception handler
     except Exception as e:
         logger.error(f"Failed to translate FAQs: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
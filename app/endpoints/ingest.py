@@ -1,35 +1,40 @@
-from fastapi import APIRouter, Request, HTTPException, UploadFile, File
+from fastapi import APIRouter, Request, HTTPException, UploadFile, File, Query
 from fastapi.responses import JSONResponse
 import logging
+from urllib.parse import urlsplit
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/ingest_document")
-async def ingest_document(request: Request, file: UploadFile = File(...)):
+def job_accepted(request: Request, job: dict) -> JSONResponse:
+    """202 response for a queued ingest job, pointing at its status URL."""
+    status_url = request.url.path.rsplit("/", 1)[0] + f"/ingest_jobs/{job['id']}"
+    return JSONResponse(status_code=202, content=job, headers={"Location": status_url})
+
+@router.post("/ingest_document", status_code=202)
+async def ingest_document(request: Request, file: UploadFile = File(...),
+                          replace: bool = Query(False, description="Replace the chunks previously ingested from this filename")):
     """
-    Receives an uploaded document, processes it using the ingestion chain,
-    and ingests its contents into vector_store
+    Receives an uploaded document and queues it for ingestion into vector_store.
+    Returns the job right away; GET /ingest_jobs/{id} reports its progress.
+    With ?replace=true the new chunks are written first, then the old chunks of the same filename are removed.
     """
+    # The upload is already spooled to a temp file by the multipart parser; copy it into the
+    # ingest spool block by block instead of reading it into memory.
     try:
-        contents = await file.read()
-    except Exception as e:
-        logger.error("Failed to read uploaded file: %s", e)
-        raise HTTPException(status_code=400, detail="Failed to read file")
-    
-    try:
-        result = await request.state.provider.ingest_chain.ingest_document(contents, file.filename)
+        job = await request.state.provider.ingest_queue.submit_document(file.file, file.filename, replace=replace)
     except Exception as e:
-        logger.error("Ingestion chain error: %s", e)
+        logger.error("Failed to queue ingestion of %s: %s", file.filename, e)
         raise HTTPException(status_code=500, detail="Ingestion failed")
         
-    return JSONResponse(result)
+    return job_accepted(request, job)
 
-@router.post("/ingest_url")
+@router.post("/ingest_url", status_code=202)
 async def ingest_document(request: Request):
     """
-    Receives a url, processes it using the ingestion chain,
-    and ingests its contents into vector_store
+    Receives a url and queues it for ingestion into vector_store.
+    Returns the job right away; GET /ingest_jobs/{id} reports its progress.
+    With {"replace": true} the new chunks are written first, then the old chunks of the same URL are removed.
     """
     try:
         data = await request.json()
@@ -38,11 +43,55 @@ async def ingest_document(request: Request):
         raise HTTPException(status_code=400, detail="Failed to read file")
     
     url = data.get("url")
+    if not url:
+        raise HTTPException(status_code=400, detail="Missing url")
     
     try:
-        result = await request.state.provider.ingest_chain.ingest_url(url)
+        job = await request.state.provider.ingest_queue.submit_url(url, replace=bool(data.get("replace", False)))
     except Exception as e:
-        logger.error("Ingestion chain error: %s", e)
+        logger.error("Failed to queue ingestion of %s: %s", url, e)
         raise HTTPException(status_code=500, detail="Ingestion failed")
         
-    return JSONResponse(result)
\ No newline at end of file
+    return job_accepted(request, job)
+
+@router.post("/ingest_site", status_code=202)
+async def ingest_site(request: Request):
+    """
+    Receives a list of URLs and/or sitemaps, e.g. {"sitemap": "https://host/sitemap.xml"} or
+    {"urls": [...], "sitemaps": [...]}, and queues one job that crawls and ingests every page.
+    Returns the job right away; GET /ingest_jobs/{id} reports pages fetched, ingested and failed.
+    With {"replace": true} each page replaces the chunks previously ingested from it.
+    """
+    try:
+        data = await request.json()
+    except Exception as e:
+        logger.error("Failed to read request body: %s", e)
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+    urls = data.get("urls") or []
+    sitemaps = data.get("sitemaps") or ([data["sitemap"]] if data.get("sitemap") else [])
+    if not isinstance(urls, list) or not isinstance(sitemaps, list):
+        raise HTTPException(status_code=400, detail="urls and sitemaps must be lists")
+    if not urls and not sitemaps:
+        raise HTTPException(status_code=400, detail="Missing urls or sitemap")
+    invalid = [url for url in urls + sitemaps if not isinstance(url, str) or urlsplit(url).scheme not in ("http", "https")]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Not an http(s) URL: {invalid[0]}")
+
+    try:
+        job = await request.state.provider.ingest_queue.submit_site(urls, sitemaps, replace=bool(data.get("replace", False)))
+    except Exception as e:
+        logger.error("Failed to queue site ingestion: %s", e)
+        raise HTTPException(status_code=500, detail="Ingestion failed")
+
+    return job_accepted(request, job)
+
+@router.get("/ingest_jobs/{job_id}")
+async def ingest_job(request: Request, job_id: str):
+    """
+    Reports the status, current stage, chunk counts, throughput and error of an ingest job.
+    """
+    job = await request.state.provider.ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=job)
@@ -1,6 +1,11 @@
 from fastapi import APIRouter, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
+import json
+import time
 import logging
+from app.config import settings
+from app.utils.metrics import SSE_FRAMING_LATENCY, SSE_FRAMES
+from app.utils.sse import coalesce_tokens, close_on_disconnect, prefetch_first
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -9,6 +14,8 @@ router = APIRouter()
 async def qa_stream(request: Request):
     body = await request.json()
     user_query = body.get("userMessage", "")
+    # "json" framing: one JSON object per SSE event, several tokens per event (see json_event_source)
+    framing = body.get("framing", "text")
     logger.debug(f"qa_stream: Received streaming request for query: '{user_query}'")
 
     # Define a placeholder for newlines to ensure SSE compatibility
@@ -17,36 +24,95 @@ async def qa_stream(request: Request):
     async def event_source():
         logger.debug(f"qa_stream: Starting event_source for query: '{user_query}'")
         processed_token_count = 0
-        async for token_from_provider in request.state.provider.answer_query_stream(user_query):
-            
-            parts_to_send = []
-            current_segment = ""
-            # Split the token from provider by actual newlines,
-            # then send text segments and newline placeholders as separate SSE events.
-            for char in token_from_provider:
-                if char == "\n":
-                    if current_segment: # Send accumulated segment before the newline
-                        parts_to_send.append(current_segment)
-                        current_segment = ""
-                    parts_to_send.append(NEWLINE_PLACEHOLDER) # Send newline placeholder
-                else:
-                    current_segment += char
-            if current_segment: # Send any remaining segment after the loop
-                parts_to_send.append(current_segment)
-
-            for part_to_yield in parts_to_send:
-                # This log can be very verbose, ensure it's DEBUG or commented out for production
-                logger.debug(f"qa_stream: Server sending part to client (repr): {part_to_yield!r}")
-                yield f"data: {part_to_yield}\n\n"
-                processed_token_count += 1
+        framing_time = 0.0 # Summed per stream and observed once, to keep the per-token cost down
+        tokens = request.state.provider.answer_query_stream(user_query)
+        try:
+            async for token_from_provider in tokens:
+                framing_started = time.perf_counter()
+                parts_to_send = []
+                current_segment = ""
+                # Split the token from provider by actual newlines,
+                # then send text segments and newline placeholders as separate SSE events.
+                for char in token_from_provider:
+                    if char == "\n":
+                        if current_segment: # Send accumulated segment before the newline
+                            parts_to_send.append(current_segment)
+                            current_segment = ""
+                        parts_to_send.append(NEWLINE_PLACEHOLDER) # Send newline placeholder
+                    else:
+                        current_segment += char
+                if current_segment: # Send any remaining segment after the loop
+                    parts_to_send.append(current_segment)
+                framing_time += time.perf_counter() - framing_started
+
+                for part_to_yield in parts_to_send:
+                    # This log can be very verbose, ensure it's DEBUG or commented out for production
+                    logger.debug(f"qa_stream: Server sending part to client (repr): {part_to_yield!r}")
+                    yield f"data: {part_to_yield}\n\n"
+                    processed_token_count += 1
+        finally:
+            # Explicitly closing the provider stream cancels the LLM generation if the client left
+            await tokens.aclose()
             
+        SSE_FRAMING_LATENCY.observe(framing_time)
+        SSE_FRAMES.labels("text").inc(processed_token_count + 1)
         logger.debug(f"qa_stream: Finished sending parts. Total parts sent: {processed_token_count}. Sending end-of-stream.")
         yield f"data: end-of-stream\n\n"  # Sentinel for browser‑side cleanup
         logger.debug(f"qa_stream: Event_source completed for query: '{user_query}'")
 
+    async def json_event_source():
+        """
+        Sends {"t": text} events, where text is every token produced within the flush window
+        (SSE_FLUSH_INTERVAL_MS or SSE_FLUSH_BYTES), and a final {"done": true} event.
+        Newlines are escaped by JSON, so no placeholder events are needed.
+        """
+        logger.debug(f"qa_stream: Starting json_event_source for query: '{user_query}'")
+        frame_count = 0
+        framing_time = 0.0
+        tokens = request.state.provider.answer_query_stream(user_query)
+        texts = coalesce_tokens(tokens, settings.SSE_FLUSH_INTERVAL_MS / 1000.0, settings.SSE_FLUSH_BYTES)
+        try:
+            async for text in texts:
+                framing_started = time.perf_counter()
+                frame = f"data: {json.dumps({'t': text}, ensure_ascii=False)}\n\n"
+                framing_time += time.perf_counter() - framing_started
+                frame_count += 1
+                yield frame
+        finally:
+            await texts.aclose()
+
+        SSE_FRAMING_LATENCY.observe(framing_time)
+        SSE_FRAMES.labels("json").inc(frame_count + 1)
+        logger.debug(f"qa_stream: Finished sending {frame_count} frames for query: '{user_query}'")
+        yield 'data: {"done": true}\n\n'
+
     headers = {
         "Content-Type": "text/event-stream",
         "Cache-Control": "no-cache",
         "X-Accel-Buffering": "no",  # disable nginx buffering if you use it
     }
-    return StreamingResponse(event_source(), headers=headers)
\ No newline at end of file
+    frames = json_event_source() if framing == "json" else event_source()
+    # A saturated LLM scheduler raises before the first frame; the app turns that into a 503
+    stream = await prefetch_first(close_on_disconnect(request, frames))
+    return StreamingResponse(stream, headers=headers)
+
+@router.get("/qa/cache_stats")
+async def qa_cache_stats(request: Request):
+    """
+    Reports hit/miss counters of the provider's semantic answer cache.
+    """
+    answer_cache = getattr(request.state.provider, "answer_cache", None)
+    if answer_cache is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **answer_cache.stats()})
+
+
+@router.get("/qa/context_stats")
+async def qa_context_stats(request: Request):
+    """
+    Reports how many prompt context tokens the context packer has saved.
+    """
+    context_packer = getattr(request.state.provider.retrieval_chain, "context_packer", None)
+    if context_packer is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **context_packer.stats()})
@@ -1,7 +1,7 @@
 import os
+import asyncio
 import uvicorn
 import logging
-import time
 from fastapi import FastAPI, Request, Response, APIRouter, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -9,14 +9,42 @@ from fastapi.responses import RedirectResponse, JSONResponse
 from contextlib import asynccontextmanager
 from app import *
 from app.config import settings
-from app.dependencies import set_azure_provider, set_zilliz_provider
+from app.dependencies import set_azure_provider, set_zilliz_provider, set_local_provider
+from app.utils import metrics
+from app.utils.scheduler import SchedulerSaturated
+from app.utils.rate_limit import RateLimiter
+from app.utils.zilliz_client import ZillizRestClient
+from app.utils.jobs import JobRegistry
+from app.utils.parse_pool import shutdown_parse_pool
 
 logger = logging.getLogger(__name__)
 
-# Rate limiting configuration
-API_RATE_LIMIT = 60  # Max API requests per IP per minute
-API_RATE_WINDOW = 60  # Seconds
-api_user_requests = {} # Stores IP and their request timestamps for API routes
+# Per-IP token buckets for API routes (see RATE_LIMIT_* settings)
+rate_limiter = RateLimiter.from_settings()
+
+def provider_stats(provider) -> dict:
+    """Exposes counters the provider already keeps (answer cache, context packer, coalescer) as metrics."""
+    values = {}
+    answer_cache = getattr(provider, "answer_cache", None)
+    if answer_cache is not None:
+        stats = answer_cache.stats()
+        values["chatbot_answer_cache_hits"] = ("counter", "Answer cache hits.", stats["hits"])
+        values["chatbot_answer_cache_misses"] = ("counter", "Answer cache misses.", stats["misses"])
+    context_packer = getattr(provider.retrieval_chain, "context_packer", None)
+    if context_packer is not None:
+        stats = context_packer.stats()
+        values["chatbot_context_tokens_in"] = ("counter", "Retrieved context tokens before packing.", stats["tokens_in"])
+        values["chatbot_context_tokens_out"] = ("counter", "Context tokens sent to the LLM after packing.", stats["tokens_out"])
+    stream_coalescer = getattr(provider, "stream_coalescer", None)
+    if stream_coalescer is not None:
+        values["chatbot_stream_coalesced"] = ("counter", "Streams served by joining an in-flight generation.", stream_coalescer.coalesced)
+    faq_translations = getattr(provider, "faq_translations", None)
+    if faq_translations is not None:
+        stats = faq_translations.stats()
+        values["chatbot_faq_translation_cache_hits"] = ("counter", "FAQ translation requests served from the cache.", stats["hits"])
+        values["chatbot_faq_translation_cache_misses"] = ("counter", "FAQ translation requests that had to translate.", stats["misses"])
+        values["chatbot_faq_translations_generated"] = ("counter", "FAQs sent to the LLM for translation.", stats["translated"])
+    return values
 
 # runs at startup
 @asynccontextmanager
@@ -27,13 +55,34 @@ async def lifespan(app: FastAPI):
     #azure_provider = await AzureProvider.create()
     #app.state.azure_provider = azure_provider
 
+    # One pooled Zilliz REST client for the whole process
+    zilliz_client = ZillizRestClient.from_settings()
+    app.state.zilliz_client = zilliz_client
+
+    # Long-running admin operations (e.g. bulk deletes) run as background jobs, recorded in the
+    # job store the ingest queues use, so every worker can report on them
+    app.state.jobs = JobRegistry.from_settings()
+
     # Initialize Zilliz Provider
-    zilliz_provider = await ZillizProvider.create()
+    zilliz_provider = await ZillizProvider.create(zilliz_client)
     app.state.zilliz_provider = zilliz_provider
+    metrics.REGISTRY.register_collector(lambda: provider_stats(zilliz_provider))
+
+    # Initialize Local Provider (in-process vector index)
+    if settings.LOCAL_PROVIDER_ENABLED:
+        local_provider = await LocalProvider.create()
+        app.state.local_provider = local_provider
 
     logger.info("Chains stored in app state.")
     yield
 
+    await zilliz_provider.aclose()
+    if settings.LOCAL_PROVIDER_ENABLED:
+        await local_provider.aclose()
+    await asyncio.to_thread(shutdown_parse_pool)
+    await app.state.jobs.aclose()
+    await zilliz_client.aclose()
+
 app = FastAPI(lifespan=lifespan)
 
 # origin control
@@ -49,32 +98,35 @@ app.add_middleware(
 @app.middleware("http")
 async def rate_limit_api_requests(request: Request, call_next):
     # Check if the path is an API path we want to rate limit
-    if "/api/" in request.url.path:
+    if settings.RATE_LIMIT_ENABLED and "/api/" in request.url.path:
         
         user_ip = request.client.host if request.client else "unknown_client" # Get client IP
-        current_time = time.time()
-
-        # Get existing timestamps for this IP, or an empty list if new IP
-        request_timestamps = api_user_requests.get(user_ip, [])
+        # Expensive routes (e.g. transcription) also have a per-IP bucket of their own
+        allowed, retry_after, bucket = await rate_limiter.hit(f"ip:{user_ip}", request.url.path)
         
-        # Filter out timestamps older than the rate limit window
-        valid_timestamps = [t for t in request_timestamps if current_time - t < API_RATE_WINDOW]
-        
-        if len(valid_timestamps) >= API_RATE_LIMIT:
+        if not allowed:
             logger.warning(f"API rate limit exceeded for IP {user_ip} on path {request.url.path}")
+            # Labeled by bucket, not by the client-chosen path, so the number of series stays fixed
+            metrics.RATE_LIMITED.labels(bucket).inc()
             return JSONResponse(
                 status_code=429, # HTTP 429 Too Many Requests
-                content={"detail": "Rate limit exceeded. Please try again later."}
+                content={"detail": "Rate limit exceeded. Please try again later."},
+                headers={"Retry-After": str(retry_after)},
             )
-        
-        # Add current request timestamp and update the store
-        valid_timestamps.append(current_time)
-        api_user_requests[user_ip] = valid_timestamps
 
     # Proceed with the request if not rate-limited
     response = await call_next(request)
     return response
 
+# Upstream LLM capacity exhausted: tell the client when to come back instead of queueing forever
+@app.exception_handler(SchedulerSaturated)
+async def scheduler_saturated_handler(request: Request, exc: SchedulerSaturated):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The assistant is busy. Please try again shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # allows framing
 @app.middleware("http")
 async def frame_control(request: Request, call_next):
@@ -91,6 +143,11 @@ async def frame_control(request: Request, call_next):
 static_folder = os.path.join(os.path.dirname(__file__), "..", "static")
 app.mount("/static", StaticFiles(directory=static_folder), name="static")
 
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics_route():
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 # Redirect to /wichita route by default
 @app.get("/")
 async def default_route():
@@ -119,6 +176,16 @@ wsu_api_router.include_router(data_search_router, prefix="/api")
 wsu_api_router.include_router(faq_router, prefix="/api")
 wsu_api_router.include_router(transcribe_router, prefix="/api")
 
+# Local API: endpoints will be available at /local/api/...
+local_api_router = APIRouter(prefix="/local", dependencies=[Depends(set_local_provider)])
+local_api_router.include_router(chatbot_router, prefix="/api")
+local_api_router.include_router(ingest_router, prefix="/api")
+local_api_router.include_router(data_delete_router, prefix="/api")
+local_api_router.include_router(qa_router, prefix="/api")
+local_api_router.include_router(data_search_router, prefix="/api")
+local_api_router.include_router(faq_router, prefix="/api")
+local_api_router.include_router(transcribe_router, prefix="/api")
+
 # -------------------------------------------------
 # Include non-API routes and provider-specific API routers
 # -------------------------------------------------
@@ -126,6 +193,8 @@ app.include_router(wichita_router)
 app.include_router(wsu_router)
 #app.include_router(wichita_api_router)
 app.include_router(wsu_api_router)
+if settings.LOCAL_PROVIDER_ENABLED:
+    app.include_router(local_api_router)
 
 if __name__ == '__main__':
     uvicorn.run("app.main:app", host="0.0.0.0", port=settings.PORT, reload=False)
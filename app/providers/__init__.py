@@ -1,14 +1,18 @@
 from .azure_provider import AzureProvider
 from .zilliz_provider import ZillizProvider
+from .local_provider import LocalProvider
 from app.chains import *
 
 __all__ = [
     "ZillizProvider",
     "AzureProvider",
+    "LocalProvider",
     "initialize_retrieval_chain_azure",
     "initialize_retrieval_chain_zilliz",
+    "initialize_retrieval_chain_local",
     "initialize_ingest_chain",
     "IngestionChainWrapper",
     "initialize_vector_store_azure",
     "initialize_vector_store_zilliz",
+    "initialize_vector_store_local",
 ]
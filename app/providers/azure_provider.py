@@ -7,10 +7,13 @@ import logging
 import asyncio
 from fastapi import UploadFile
 from openai import OpenAI
-import time
 from langchain_core.messages import AIMessageChunk
 from langchain.docstore.document import Document
 from app.chains.retrieval_chain_azure import answer_query as answer
+from app.utils.swr_cache import StaleWhileRevalidate
+from app.utils.ingest_manifest import IngestManifest
+from app.utils.ingest_queue import IngestQueue
+from app.utils.translation_cache import translation_language
 
 logger = logging.getLogger(__name__)
 
@@ -29,10 +32,12 @@ class AzureProvider(BaseProvider):
         self.retrieval_chain = None
         self.ingest_chain = None
         self.translation_chain = None
-        # Initialize caching variables for FAQs
-        self._cached_faqs = None
-        self._cache_timestamp = None
-        self._cache_ttl = 300  # seconds, e.g., re-fetch every 5 minutes
+        # Chunk hashes per ingested source, so re-ingesting only embeds what changed
+        self.ingest_manifest = IngestManifest(settings.AZURE_INGEST_MANIFEST_PATH)
+        # Background ingestion jobs (started in create)
+        self.ingest_queue = None
+        # FAQs are served from memory and refreshed in the background once older than the TTL
+        self._faqs = StaleWhileRevalidate(self._load_faqs, ttl=settings.FAQ_CACHE_TTL, name="Azure FAQs")
 
     @classmethod
     async def create(cls):
@@ -42,7 +47,15 @@ class AzureProvider(BaseProvider):
         instance = cls()
         vector_store, cached_embeddings = await initialize_vector_store_azure()
         instance.retrieval_chain = await initialize_retrieval_chain_azure(vector_store, cached_embeddings)
-        instance.ingest_chain = await initialize_ingest_chain(vector_store)
+        await asyncio.to_thread(instance.ingest_manifest.load)
+        instance.ingest_chain = await initialize_ingest_chain(
+            vector_store,
+            delete_source=instance.delete_source,
+            manifest=instance.ingest_manifest,
+            writer=KeyedIngestWriter(vector_store, cached_embeddings),
+        )
+        instance.ingest_queue = IngestQueue.from_settings("azure", instance.ingest_chain)
+        await instance.ingest_queue.start()
         instance.translation_chain = await initialize_translation_chain_azure()
         return instance
 
@@ -96,12 +109,9 @@ class AzureProvider(BaseProvider):
 
     
     async def get_faqs(self) -> list:
-        current_time = time.time()
-        # Check if the cache exists and is still valid.
-        if self._cached_faqs is not None and (current_time - self._cache_timestamp) < self._cache_ttl:
-            logger.debug("Using cached FAQs")
-            return self._cached_faqs
+        return await self._faqs.get()
 
+    async def _load_faqs(self) -> list:
         logger.debug("Retrieving FAQs from database")
         cursor = self.faq_collection.find({})
         faqs = await cursor.to_list(length=1000) # Adjust length as needed
@@ -118,46 +128,31 @@ class AzureProvider(BaseProvider):
             for item in doc.get("faqs", [])
             if isinstance(item, dict) and item.get("heading")
         ]
-        # Update cache and timestamp.
-        self._cached_faqs = faq_list
-        self._cache_timestamp = current_time
         return faq_list
 
     async def translate_faqs(self, target_lang: str = 'en') -> list:
         """
         Translates FAQs to the target language using the translation chain.
         If target language is English, returns cached FAQs.
-        Leverages asyncio.gather for concurrent translation of heading and subheadings.
+        All headings and subheadings are flattened into one list and translated in batches.
+        Raises UnsupportedLanguage for languages outside FAQ_TRANSLATION_LANGUAGES.
         """
+        target_lang = translation_language(target_lang)
         faq_texts = await self.get_faqs()  # This now uses caching with TTL
-        if target_lang.lower() == 'en':
+        if target_lang == 'en':
             return faq_texts
 
-        translated_faqs = []
-
+        texts = []
         for faq in faq_texts:
-            heading_task = asyncio.to_thread(
-                self.translation_chain.invoke,
-                {"faq": faq["heading"], "target_lang": target_lang}
-            )
-
-            subheading_tasks = [
-                asyncio.to_thread(
-                    self.translation_chain.invoke,
-                    {"faq": sub, "target_lang": target_lang}
-                ) for sub in faq.get("subheading", [])
-            ]
-
-            results = await asyncio.gather(heading_task, *subheading_tasks)
-            heading_result = results[0]
-            subheading_results = results[1:]
+            texts.append(faq["heading"])
+            texts.extend(faq.get("subheading", []))
+        translations = iter(await self.translation_chain.translate(texts, target_lang))
 
+        translated_faqs = []
+        for faq in faq_texts:
             translated_faqs.append({
-                "heading": heading_result.content if hasattr(heading_result, "content") else str(heading_result),
-                "subheading": [
-                    r.content if hasattr(r, "content") else str(r)
-                    for r in subheading_results
-                ]
+                "heading": next(translations),
+                "subheading": [next(translations) for _ in faq.get("subheading", [])]
             })
 
         return translated_faqs
@@ -177,17 +172,36 @@ class AzureProvider(BaseProvider):
         """
         try:
             # Note: Successful or not found deletion will return the same message, making it hard to tell if it was really deleted.
-            return await delete_document_azure(id)
+            result = await delete_document_azure(id)
+            await asyncio.to_thread(self.ingest_manifest.forget_ids, [id])
+            return result
         except Exception as e:
             logger.error(f"Error deleting document {id}: {e}")
             return {"message": f"Error deleting document: {str(e)}", "status": "error"}
 
-    async def delete_all_documents(self) -> dict:
+    async def delete_source(self, name: str, keep_ids=()) -> dict:
+        """
+        Delete all chunks of the source `name` (filename or URL) using the Azure-specific delete functionality.
+        """
+        try:
+            result = await delete_source_azure(name, keep_ids)
+            await asyncio.to_thread(self.ingest_manifest.forget_source, name, keep_ids)
+            return result
+        except Exception as e:
+            # Raised rather than returned, so a replacing ingest fails instead of keeping the old chunks
+            logger.error(f"Error deleting source {name}: {e}")
+            raise RuntimeError("Source deletion failed") from e
+
+    async def delete_all_documents(self, job=None) -> dict:
         """
         Delete all documents using the Azure-specific delete functionality.
         """
         try:
-            return await delete_all_documents_azure()
+            result = await delete_all_documents_azure(job)
+            await asyncio.to_thread(self.ingest_manifest.clear)
+            return result
         except Exception as e:
+            if job is not None:
+                raise  # the job records the failure
             logger.error(f"Error deleting all documents: {e}")
             return {"message": f"Error deleting all documents: {str(e)}", "status": "error"}
@@ -84,9 +84,18 @@ class BaseProvider(ABC):
         pass
 
     @abstractmethod
-    async def delete_all_documents(self) -> dict:
+    async def delete_source(self, name: str, keep_ids=()) -> dict:
+        """
+        Delete every chunk ingested from the source `name` (its filename or URL), except the
+        chunks in `keep_ids`. Returns a status message.
+        """
+        pass
+
+    @abstractmethod
+    async def delete_all_documents(self, job=None) -> dict:
         """
         Delete all documents from the relevant collection(s) in the underlying data store.
+        Runs as a background job; progress is reported on `job` (an app.utils.jobs.Job) when given.
         Returns a status message.
         """
         pass
\ No newline at end of file
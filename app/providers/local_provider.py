@@ -0,0 +1,274 @@
+import os
+import json
+from .base import BaseProvider
+from app.config import settings
+from app.chains import *
+import logging
+import asyncio
+import pandas as pd
+import time
+from fastapi import UploadFile
+from openai import OpenAI
+from langchain_core.messages import AIMessageChunk
+from app.chains.retrieval_chain_local import answer_and_store as answer
+from app.chains.retrieval_chain_local import store_user_query
+from app.utils.scheduler import LLMScheduler, SchedulerSaturated
+from app.utils.translation_cache import FaqTranslationCache, translation_language
+from app.utils.swr_cache import StaleWhileRevalidate
+from app.utils.ingest_manifest import IngestManifest
+from app.utils.ingest_queue import IngestQueue
+from app.utils.metrics import (
+    STREAM_DURATION, STREAMS_IN_FLIGHT, GENERATIONS_IN_FLIGHT, LLM_GENERATIONS, SEARCH_DATA_LATENCY, StreamTimer,
+)
+logger = logging.getLogger(__name__)
+
+class LocalProvider(BaseProvider):
+    """
+    Provider that keeps the document index in-process (see LocalVectorStore).
+    Retrieval needs no network hop, which suits small tenants and load testing.
+    The LLM, embeddings and transcription still go through the OpenAI API.
+    """
+    def __init__(self):
+        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        # These will be set during asynchronous initialization
+        self.retrieval_chain = None
+        self.ingest_chain = None
+        self.translation_chain = None
+        self.vector_store = None
+        # Chunk hashes per ingested source, so re-ingesting only embeds what changed
+        self.ingest_manifest = IngestManifest(settings.LOCAL_INGEST_MANIFEST_PATH)
+        # Background ingestion jobs (started in create)
+        self.ingest_queue = None
+        # FAQs are served from memory and refreshed in the background once older than the TTL
+        self._faqs = StaleWhileRevalidate(self._load_faqs, ttl=settings.FAQ_CACHE_TTL, name="local FAQs")
+        # Bounds and prioritizes concurrent calls to the OpenAI API (chat ahead of background work)
+        self.scheduler = LLMScheduler.from_settings("local")
+        # Translated FAQs per language, persisted across restarts
+        self.faq_translations = FaqTranslationCache(settings.LOCAL_FAQ_TRANSLATION_CACHE_PATH)
+        self._faq_refresh_task = None
+
+
+    @classmethod
+    async def create(cls):
+        """
+        Async factory method to initialize all chains upon creation.
+        """
+        instance = cls()
+        vector_store, cached_embeddings = await initialize_vector_store_local()
+        instance.vector_store = vector_store
+        instance.retrieval_chain = await initialize_retrieval_chain_local(vector_store, cached_embeddings)
+        await asyncio.to_thread(instance.ingest_manifest.load)
+        instance.ingest_chain = await initialize_ingest_chain(
+            vector_store,
+            scheduler=instance.scheduler,
+            delete_source=instance.delete_source,
+            manifest=instance.ingest_manifest,
+            writer=KeyedIngestWriter(vector_store, cached_embeddings),
+        )
+        instance.ingest_queue = IngestQueue.from_settings("local", instance.ingest_chain)
+        await instance.ingest_queue.start()
+        instance.translation_chain = await initialize_translation_chain_openai_api()
+        await asyncio.to_thread(instance.faq_translations.load)
+        if settings.FAQ_TRANSLATION_PREWARM_LANGUAGES:
+            instance._faq_refresh_task = asyncio.create_task(instance._refresh_faq_translations())
+        return instance
+
+
+    async def aclose(self):
+        """Stops the background work started by create(): FAQ translation refreshes and ingest workers."""
+        if self._faq_refresh_task is not None:
+            self._faq_refresh_task.cancel()
+            await asyncio.gather(self._faq_refresh_task, return_exceptions=True)
+            self._faq_refresh_task = None
+        # Running ingest jobs are handed back to the persistent queue and resume on the next start
+        if self.ingest_queue is not None:
+            await self.ingest_queue.aclose()
+
+
+    async def answer_query(self, query):
+        async with self.scheduler.slot("interactive"):
+            return await answer(query, self.retrieval_chain, self.scheduler)
+
+
+    async def answer_query_stream(self, query: str):
+        """Yield tokens from the LLM as they are produced by LangChain using LCEL."""
+
+        logger.debug(f"answer_query_stream (LCEL): Initialized for query: '{query}'")
+
+        # Raises SchedulerSaturated (answered with 503) before anything is sent upstream
+        await self.scheduler.acquire("interactive")
+        slot_acquired = time.perf_counter()
+        token_count = 0
+        timer = StreamTimer()
+        status = "completed"
+        STREAMS_IN_FLIGHT.inc()
+        GENERATIONS_IN_FLIGHT.inc()
+        chunks = self.retrieval_chain.chain.astream(query, config={"metadata": {"stream_timer": timer}})
+        try:
+            async for chunk in chunks:
+                actual_token = ""
+                if isinstance(chunk, AIMessageChunk):
+                    actual_token = chunk.content
+                elif isinstance(chunk, str):
+                    actual_token = chunk
+                    logger.warning(f"answer_query_stream (LCEL): Received a direct string chunk: '{actual_token}'")
+                elif chunk:
+                    logger.warning(f"answer_query_stream (LCEL): Received chunk of unexpected type or structure: {type(chunk)} - {chunk!r}")
+
+                if actual_token:
+                    if timer.first_token is None:
+                        timer.first_token = time.perf_counter()
+                    token_count += 1
+                    yield actual_token
+
+            timer.record(token_count)
+
+        except (GeneratorExit, asyncio.CancelledError):
+            status = "cancelled"
+            raise
+        except Exception as e:
+            status = "errored"
+            logger.error(f"answer_query_stream (LCEL): Error during streaming for query '{query}': {e}", exc_info=True)
+            yield f"Error: An error occurred while streaming the response."
+        finally:
+            # Closes the upstream LLM stream right away when the asker disconnected
+            await chunks.aclose()
+            self.scheduler.release("interactive", time.perf_counter() - slot_acquired)
+            STREAMS_IN_FLIGHT.dec()
+            GENERATIONS_IN_FLIGHT.dec()
+            LLM_GENERATIONS.labels(status).inc()
+            STREAM_DURATION.labels("cancelled" if status == "cancelled" else "generated").observe(time.perf_counter() - timer.started)
+
+        logger.debug(f"answer_query_stream (LCEL): Finished yielding tokens. Total tokens: {token_count} for query: '{query}'")
+
+        # Analytics insert (non‑blocking background task)
+        store_user_query(query, self.retrieval_chain, self.scheduler)
+
+
+    async def get_faqs(self) -> list:
+        """
+        Reads FAQs from the local JSON file (a list of strings), cached with a TTL.
+        """
+        return await self._faqs.get()
+
+
+    async def _load_faqs(self) -> list:
+        def read_faqs():
+            if not os.path.exists(settings.LOCAL_FAQ_PATH):
+                logger.warning("FAQ file %s not found; serving no FAQs", settings.LOCAL_FAQ_PATH)
+                return []
+            with open(settings.LOCAL_FAQ_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        return await asyncio.to_thread(read_faqs)
+
+
+    async def translate_faqs(self, target_lang: str = 'en') -> list:
+        """
+        Translates FAQs to the target language using the translation chain.
+        If target language is English, returns FAQs as is. Raises UnsupportedLanguage for
+        languages outside FAQ_TRANSLATION_LANGUAGES.
+        """
+        target_lang = translation_language(target_lang)
+        faq_texts = await self.get_faqs()
+        if target_lang == 'en':
+            return faq_texts
+
+        # Served from the translation cache; only new or changed FAQs go to the LLM
+        return await self.faq_translations.translate(target_lang, faq_texts, self._translate_texts)
+
+
+    async def _translate_texts(self, faq_texts: list, target_lang: str) -> list:
+        # Batched translation; background priority, so calls queue behind chat traffic for upstream slots
+        return await self.translation_chain.translate(faq_texts, target_lang, scheduler=self.scheduler)
+
+
+    async def _refresh_faq_translations(self):
+        """
+        Pre-warms the translation cache for FAQ_TRANSLATION_PREWARM_LANGUAGES at startup and then
+        every FAQ_TRANSLATION_REFRESH_INTERVAL seconds, so FAQ edits are picked up without a request
+        paying for the LLM calls.
+        """
+        while True:
+            for lang in settings.FAQ_TRANSLATION_PREWARM_LANGUAGES:
+                try:
+                    await self.translate_faqs(lang)
+                except Exception as e:
+                    logger.warning("Pre-warming FAQ translations for '%s' failed: %s", lang, e)
+            await asyncio.sleep(settings.FAQ_TRANSLATION_REFRESH_INTERVAL)
+
+
+    async def transcribe_audio(self, file: UploadFile) -> str:
+        return await transcribe_openai_api(self, file)
+
+
+    async def search_data(self, query: str, limit: int = 100, radius: float = 0.8) -> dict:
+        """
+        Searches the local user queries store and aggregates matches within `radius` by hour.
+        """
+        try:
+            with SEARCH_DATA_LATENCY.labels("embed").time():
+                query_vector = await self.scheduler.run("analytics", self.retrieval_chain.embeddings.aembed_query, query)
+        except SchedulerSaturated:
+            raise
+        except Exception as e:
+            logger.exception("Embedding generation failed")
+            raise RuntimeError(f"Embedding generation failed: {e}")
+
+        with SEARCH_DATA_LATENCY.labels("search").time():
+            matches = await asyncio.to_thread(
+                self.retrieval_chain.user_queries_vectorstore.similarity_search_with_score_by_vector, query_vector, limit
+            )
+        data = [{"timestamp": doc.metadata.get("timestamp")} for doc, score in matches if score >= radius]
+        df = pd.DataFrame(data)
+        if df.empty or "timestamp" not in df.columns:
+            logger.warning("No data found or missing 'timestamp' field in local user queries")
+            return {"frequency": 0, "result": []}
+
+        df["datetime"] = pd.to_datetime(df["timestamp"], unit="s")
+        grouped = (
+            df.groupby(df["datetime"].dt.floor("h"))
+              .size()
+              .reset_index(name="frequency")
+        )
+        grouped.sort_values(by="datetime", inplace=True)
+        grouped["datetime"] = grouped["datetime"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        return {"frequency": int(grouped["frequency"].sum()), "result": grouped.to_dict(orient="records")}
+
+
+    async def delete_document(self, id: str) -> dict:
+        """
+        Deletes a single chunk from the local vector store by its ID.
+        """
+        logger.debug("Attempting to delete document with id: %s", id)
+        deleted = await asyncio.to_thread(self.vector_store.delete, [id])
+        await asyncio.to_thread(self.ingest_manifest.forget_ids, [id])
+        return {"deleted": {"id": id, "found": bool(deleted)}}
+
+
+    async def delete_source(self, name: str, keep_ids=()) -> dict:
+        """
+        Deletes every chunk ingested from the source `name` (filename or URL), except `keep_ids`.
+        """
+        keep_ids = {str(doc_id) for doc_id in keep_ids}
+        ids = [doc_id for doc_id in self.vector_store.ids_for_source(name) if doc_id not in keep_ids]
+        if ids:
+            await asyncio.to_thread(self.vector_store.delete, ids)
+        await asyncio.to_thread(self.ingest_manifest.forget_source, name, keep_ids)
+        logger.info("Deleted %d chunks of source %s", len(ids), name)
+        return {"name": name, "deleted": len(ids)}
+
+
+    async def delete_all_documents(self, job=None) -> dict:
+        """
+        Deletes every chunk from the local vector store.
+        """
+        total = self.vector_store.count()
+        if job is not None:
+            job.total = total
+        await asyncio.to_thread(self.vector_store.delete, None)
+        await asyncio.to_thread(self.ingest_manifest.clear)
+        if job is not None:
+            job.progress(processed=total)
+        logger.info("Total documents deleted: %d", total)
+        return {"total_deleted": total}
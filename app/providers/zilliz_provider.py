@@ -1,4 +1,3 @@
-import requests
 from .base import BaseProvider
 from app.config import settings
 from app.chains import *
@@ -9,38 +8,131 @@ import time
 from fastapi import UploadFile
 from openai import OpenAI
 from langchain_core.messages import AIMessageChunk
-from langchain.docstore.document import Document
 from app.chains.retrieval_chain_zilliz import answer_and_store as answer
+from app.chains.retrieval_chain_zilliz import store_user_query
+from app.chains.lexical_index import LexicalIndex
+from app.utils.answer_cache import SemanticAnswerCache
+from app.utils.single_flight import StreamCoalescer
+from app.utils.scheduler import LLMScheduler, SchedulerSaturated
+from app.utils.translation_cache import FaqTranslationCache, translation_language
+from app.utils.swr_cache import StaleWhileRevalidate
+from app.utils.zilliz_client import ZillizRestClient
+from app.utils.ingest_manifest import IngestManifest
+from app.utils.ingest_queue import IngestQueue
+from app.utils.metrics import (
+    EMBED_LATENCY, STREAM_DURATION, STREAMS_IN_FLIGHT, GENERATIONS_IN_FLIGHT, LLM_GENERATIONS, SEARCH_DATA_LATENCY,
+    StreamTimer,
+)
 logger = logging.getLogger(__name__)
 
 class ZillizProvider(BaseProvider):
-    def __init__(self):
+    def __init__(self, rest_client: ZillizRestClient = None):
         self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        # Shared, pooled client for the Zilliz REST API (owned by the app lifespan)
+        self.rest_client = rest_client
         # These will be set during asynchronous initialization
         self.retrieval_chain = None
         self.ingest_chain = None
         self.translation_chain = None
-        # Initialize caching variables for FAQs
-        self._cached_faqs = None
-        self._cache_timestamp = None
-        self._cache_ttl = 300  # Time-to-live in seconds (e.g., 5 minutes)
+        self.lexical_index = None
+        # Chunk hashes per ingested source, so re-ingesting only embeds what changed
+        self.ingest_manifest = IngestManifest(settings.INGEST_MANIFEST_PATH)
+        # Background ingestion jobs (started in create)
+        self.ingest_queue = None
+        # FAQs are served from memory and refreshed in the background once older than the TTL
+        self._faqs = StaleWhileRevalidate(self._load_faqs, ttl=settings.FAQ_CACHE_TTL, name="Zilliz FAQs")
+        # Semantic answer cache in front of the retrieval chain (None when disabled)
+        self.answer_cache = SemanticAnswerCache(
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            ttl=settings.ANSWER_CACHE_TTL,
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        ) if settings.ANSWER_CACHE_ENABLED else None
+        # Identical questions asked while an answer is being generated share that generation
+        self.stream_coalescer = StreamCoalescer() if settings.STREAM_COALESCING_ENABLED else None
+        # Bounds and prioritizes concurrent calls to the OpenAI API (chat ahead of background work)
+        self.scheduler = LLMScheduler.from_settings("zilliz")
+        # Translated FAQs per language, persisted across restarts
+        self.faq_translations = FaqTranslationCache(settings.FAQ_TRANSLATION_CACHE_PATH)
+        self._faq_refresh_task = None
 
 
     @classmethod
-    async def create(cls):
+    async def create(cls, rest_client: ZillizRestClient):
         """
         Async factory method to initialize all chains upon creation.
         """
-        instance = cls()
+        instance = cls(rest_client)
         vector_store, cached_embeddings = await initialize_vector_store_zilliz()
-        instance.retrieval_chain = await initialize_retrieval_chain_zilliz(vector_store, cached_embeddings)
-        instance.ingest_chain = await initialize_ingest_chain(vector_store)
+        if settings.HYBRID_RETRIEVAL_ENABLED:
+            instance.lexical_index = await asyncio.to_thread(LexicalIndex.load, settings.LEXICAL_INDEX_PATH)
+        instance.retrieval_chain = await initialize_retrieval_chain_zilliz(vector_store, cached_embeddings, instance.lexical_index)
+        await asyncio.to_thread(instance.ingest_manifest.load)
+        instance.ingest_chain = await initialize_ingest_chain(
+            vector_store,
+            on_corpus_change=instance._invalidate_answer_cache,
+            lexical_index=instance.lexical_index,
+            scheduler=instance.scheduler,
+            delete_source=instance.delete_source,
+            manifest=instance.ingest_manifest,
+            writer=ZillizIngestWriter(vector_store, cached_embeddings),
+        )
+        instance.ingest_queue = IngestQueue.from_settings("zilliz", instance.ingest_chain)
+        await instance.ingest_queue.start()
         instance.translation_chain = await initialize_translation_chain_openai_api()
+        await asyncio.to_thread(instance.faq_translations.load)
+        if settings.FAQ_TRANSLATION_PREWARM_LANGUAGES:
+            instance._faq_refresh_task = asyncio.create_task(instance._refresh_faq_translations())
         return instance
 
 
+    async def aclose(self):
+        """Stops the background work started by create(): FAQ translation refreshes and ingest workers."""
+        if self._faq_refresh_task is not None:
+            self._faq_refresh_task.cancel()
+            await asyncio.gather(self._faq_refresh_task, return_exceptions=True)
+            self._faq_refresh_task = None
+        # Running ingest jobs are handed back to the persistent queue and resume on the next start
+        if self.ingest_queue is not None:
+            await self.ingest_queue.aclose()
+
+
+    def _invalidate_answer_cache(self):
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate()
+
+
+    async def _embed_query_for_cache(self, query: str):
+        """
+        Returns the query embedding used for answer cache lookups, or None if the cache is disabled
+        or the embedding failed (in which case the query is answered normally). The embedding call
+        holds an interactive slot; SchedulerSaturated is raised like for the answer itself.
+        """
+        if self.answer_cache is None:
+            return None
+        try:
+            with EMBED_LATENCY.labels("answer_cache").time():
+                return await self.scheduler.run("interactive", self.retrieval_chain.embeddings.aembed_query, query)
+        except SchedulerSaturated:
+            raise
+        except Exception as e:
+            logger.warning("Answer cache lookup skipped, query embedding failed: %s", e)
+            return None
+
+
     async def answer_query(self, query):
-        return await answer(query, self.retrieval_chain)
+        query_vector = await self._embed_query_for_cache(query)
+        if query_vector is not None:
+            cached_answer = self.answer_cache.lookup(query_vector)
+            if cached_answer is not None:
+                store_user_query(query, self.retrieval_chain, self.scheduler)
+                return {"result": cached_answer, "source_documents": []}
+            cache_generation = self.answer_cache.generation
+
+        async with self.scheduler.slot("interactive"):
+            result = await answer(query, self.retrieval_chain, self.scheduler)
+        if query_vector is not None:
+            self.answer_cache.store(query_vector, query, result["result"], cache_generation)
+        return result
     
 
     async def answer_query_stream(self, query: str):
@@ -48,12 +140,70 @@ class ZillizProvider(BaseProvider):
         
         logger.debug(f"answer_query_stream (LCEL): Initialized for query: '{query}'")
 
+        started = time.perf_counter()
+        outcome = "generated"
+        tokens = None
+        STREAMS_IN_FLIGHT.inc()
+        try:
+            query_vector = await self._embed_query_for_cache(query)
+            cache_generation = None
+            if query_vector is not None:
+                cached_answer = self.answer_cache.lookup(query_vector)
+                if cached_answer is not None:
+                    logger.debug(f"answer_query_stream (LCEL): Replaying cached answer for query: '{query}'")
+                    outcome = "cached"
+                    yield cached_answer
+                    store_user_query(query, self.retrieval_chain, self.scheduler)
+                    return
+                cache_generation = self.answer_cache.generation
+
+            if self.stream_coalescer is not None:
+                tokens = self.stream_coalescer.subscribe(
+                    self.stream_coalescer.normalize(query),
+                    lambda: self._generate_answer_stream(query, query_vector, cache_generation),
+                )
+            else:
+                tokens = self._generate_answer_stream(query, query_vector, cache_generation)
+            async for token in tokens:
+                yield token
+        except (GeneratorExit, asyncio.CancelledError):
+            # The asker went away (qa_stream closes this generator on client disconnect)
+            outcome = "cancelled"
+            raise
+        except SchedulerSaturated:
+            outcome = "rejected"
+            raise
+        finally:
+            # Closing the token source explicitly propagates the cancellation down to the LLM stream
+            if tokens is not None:
+                await tokens.aclose()
+            STREAMS_IN_FLIGHT.dec()
+            STREAM_DURATION.labels(outcome).observe(time.perf_counter() - started)
+
+        # Analytics insert (non‑blocking background task), once per asker even when coalesced
+        store_user_query(query, self.retrieval_chain, self.scheduler)
+        logger.debug(f"answer_query_stream (LCEL): Analytics task created for query: '{query}'")
+
+
+    async def _generate_answer_stream(self, query: str, query_vector, cache_generation):
+        """
+        Runs the LCEL chain for one generation and yields its tokens.
+        A completed answer is stored in the answer cache under query_vector (if given).
+        """
         token_count = 0
         full_response_for_analytics = [] 
+        # Raises SchedulerSaturated (answered with 503) before anything is sent upstream
+        await self.scheduler.acquire("interactive")
+        slot_acquired = time.perf_counter()
+        timer = StreamTimer()
+        status = "completed"
+        GENERATIONS_IN_FLIGHT.inc()
 
+        # The LCEL chain expects the query string directly as input.
+        # The timer rides along in the run metadata so the chain can mark when the LLM is called.
+        chunks = self.retrieval_chain.chain.astream(query, config={"metadata": {"stream_timer": timer}})
         try:
-            # The LCEL chain expects the query string directly as input.
-            async for chunk in self.retrieval_chain.chain.astream(query):
+            async for chunk in chunks:
                 # logger.info(f"answer_query_stream (LCEL): RAW chunk received: {chunk!r}") # Can be very verbose
 
                 actual_token = ""
@@ -68,6 +218,8 @@ class ZillizProvider(BaseProvider):
                 
                 if actual_token: # Only yield if we have actual string content
                     # logger.info(f"answer_query_stream (LCEL): Yielding processed token: '{actual_token}'") # Verbose
+                    if timer.first_token is None:
+                        timer.first_token = time.perf_counter()
                     token_count += 1
                     full_response_for_analytics.append(actual_token)
                     yield actual_token
@@ -75,70 +227,73 @@ class ZillizProvider(BaseProvider):
                     # logger.debug(f"answer_query_stream (LCEL): Empty actual_token from chunk: {chunk!r}")
 
 
+            timer.record(token_count)
+
+            # Only complete, error-free answers are cached
+            if query_vector is not None:
+                self.answer_cache.store(query_vector, query, "".join(full_response_for_analytics), cache_generation)
+
+        except (GeneratorExit, asyncio.CancelledError):
+            status = "cancelled"
+            logger.debug(f"answer_query_stream (LCEL): Generation cancelled after {token_count} tokens for query: '{query}'")
+            raise
         except Exception as e:
+            status = "errored"
             logger.error(f"answer_query_stream (LCEL): Error during streaming for query '{query}': {e}", exc_info=True)
             yield f"Error: An error occurred while streaming the response." 
+        finally:
+            # Closes the upstream HTTP stream right away when the generation is abandoned
+            await chunks.aclose()
+            self.scheduler.release("interactive", time.perf_counter() - slot_acquired)
+            GENERATIONS_IN_FLIGHT.dec()
+            LLM_GENERATIONS.labels(status).inc()
         
         logger.debug(f"answer_query_stream (LCEL): Finished yielding tokens. Total tokens: {token_count} for query: '{query}'")
 
-        # Analytics insert (non‑blocking background task)
-        doc = Document(page_content=query, metadata={"timestamp": int(time.time())})
-        asyncio.create_task(
-            asyncio.to_thread(self.retrieval_chain.user_queries_vectorstore.add_documents, [doc])
-        )
-        logger.debug(f"answer_query_stream (LCEL): Analytics task created for query: '{query}'")
-
 
     async def get_faqs(self) -> list:
-        current_time = time.time()
-        # Check if the cache exists and is still valid.
-        if self._cached_faqs is not None and (current_time - self._cache_timestamp) < self._cache_ttl:
-            logger.debug("Using cached FAQs for ZillizProvider")
-            return self._cached_faqs
+        return await self._faqs.get()
 
-        logger.debug("Retrieving FAQs from Zilliz database")
-        payload = {
-            "collectionName": "faq_collection",
-            "outputFields": ["faq"]
-        }
-        headers = {
-            "Authorization": f"Bearer {settings.ZILLIZ_AUTH_TOKEN}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-        response = requests.post(settings.ZILLIZ_URL + "/v2/vectordb/entities/query", json=payload, headers=headers)
-        result = response.json()
-        faq_list = [item["faq"] for item in result.get("data", []) if "faq" in item]
-        
-        # Cache the result and update the timestamp
-        self._cached_faqs = faq_list
-        self._cache_timestamp = current_time
 
-        return faq_list
+    async def _load_faqs(self) -> list:
+        logger.debug("Retrieving FAQs from Zilliz database")
+        data = await self.rest_client.query("faq_collection", output_fields=["faq"])
+        return [item["faq"] for item in data if "faq" in item]
 
 
     async def translate_faqs(self, target_lang: str = 'en') -> list:
         """
         Translates FAQs to the target language using the translation chain.
-        If target language is English, returns FAQs as is.
+        If target language is English, returns FAQs as is. Raises UnsupportedLanguage for
+        languages outside FAQ_TRANSLATION_LANGUAGES.
         """
+        target_lang = translation_language(target_lang)
         faq_texts = await self.get_faqs()
-        if target_lang.lower() == 'en':
+        if target_lang == 'en':
             return faq_texts
 
-        tasks = [
-            asyncio.to_thread(self.translation_chain.invoke, {"faq": faq, "target_lang": target_lang})
-            for faq in faq_texts
-        ]
-        results = await asyncio.gather(*tasks)
-        translated_faqs = [result.content if hasattr(result, "content") else str(result) for result in results]
-        # Currently not storing translated faqs in cache. Only en faqs
-        # Would make sense to store faqs in cache at server startup and periodicalliy update them instead of at chatbot open request
-        #   For larger user base this would significantly decrease request count
-        #   For smaller and infrequent usage user base, would significantly increase request count
-        #   Consider a toggleable option for this
-
-        return translated_faqs
+        # Served from the translation cache; only new or changed FAQs go to the LLM
+        return await self.faq_translations.translate(target_lang, faq_texts, self._translate_texts)
+
+
+    async def _translate_texts(self, faq_texts: list, target_lang: str) -> list:
+        # Batched translation; background priority, so calls queue behind chat traffic for upstream slots
+        return await self.translation_chain.translate(faq_texts, target_lang, scheduler=self.scheduler)
+
+
+    async def _refresh_faq_translations(self):
+        """
+        Pre-warms the translation cache for FAQ_TRANSLATION_PREWARM_LANGUAGES at startup and then
+        every FAQ_TRANSLATION_REFRESH_INTERVAL seconds, so FAQ edits are picked up without a request
+        paying for the LLM calls.
+        """
+        while True:
+            for lang in settings.FAQ_TRANSLATION_PREWARM_LANGUAGES:
+                try:
+                    await self.translate_faqs(lang)
+                except Exception as e:
+                    logger.warning("Pre-warming FAQ translations for '%s' failed: %s", lang, e)
+            await asyncio.sleep(settings.FAQ_TRANSLATION_REFRESH_INTERVAL)
     
 
     async def transcribe_audio(self, file: UploadFile) -> str:
@@ -153,12 +308,17 @@ class ZillizProvider(BaseProvider):
         # 1. Generate embedding for the input query
         try:
             logger.debug("Generating embedding for query: %s", query)
-            embedding_response = await asyncio.to_thread(
-                self.client.embeddings.create,
-                input=query,
-                model=settings.OPENAI_API_EMBEDDING_MODEL_NAME
-            )
+            with SEARCH_DATA_LATENCY.labels("embed").time():
+                embedding_response = await self.scheduler.run(
+                    "analytics",
+                    asyncio.to_thread,
+                    self.client.embeddings.create,
+                    input=query,
+                    model=settings.OPENAI_API_EMBEDDING_MODEL_NAME
+                )
             query_vector = embedding_response.data[0].embedding
+        except SchedulerSaturated:
+            raise
         except Exception as e:
             logger.exception("Embedding generation failed")
             raise RuntimeError(f"Embedding generation failed: {e}")
@@ -177,24 +337,14 @@ class ZillizProvider(BaseProvider):
         }
         logger.debug("Payload for vectordb search: %s", payload)
 
-        headers = {
-            "Authorization": f"Bearer {settings.ZILLIZ_AUTH_TOKEN}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-
         # 3. Query Zilliz vector database
         try:
-            search_url = f"{settings.ZILLIZ_URL}/v2/vectordb/entities/search"
-            logger.debug("Sending request to Zilliz URL: %s", search_url)
-            response = requests.post(search_url, json=payload, headers=headers)
-            response.raise_for_status() # Raise HTTPError for bad responses (4XX or 5XX)
-            logger.debug("Response status code: %s", response.status_code)
-            result = response.json()
-            logger.debug("Response JSON (first 500 chars): %s", str(result)[:500])
+            with SEARCH_DATA_LATENCY.labels("search").time():
+                data = await self.rest_client.search(payload)
+            logger.debug("Search returned %d matches", len(data))
 
+            aggregation_started = time.perf_counter()
             # 4. Convert response data to a Pandas DataFrame for easier manipulation
-            data = result.get("data", [])
             df = pd.DataFrame(data)
             if df.empty or "timestamp" not in df.columns:
                 logger.warning("No data found or missing 'timestamp' field in response")
@@ -211,6 +361,7 @@ class ZillizProvider(BaseProvider):
             grouped["datetime"] = grouped["datetime"].dt.strftime("%Y-%m-%dT%H:%M:%SZ") # Format datetime for consistency
             aggregated_results = grouped.to_dict(orient="records")
             total_frequency = int(grouped["frequency"].sum())
+            SEARCH_DATA_LATENCY.labels("aggregate").observe(time.perf_counter() - aggregation_started)
             logger.debug("Successfully aggregated data with total frequency: %d", total_frequency)
         except Exception as e:
             logger.exception("Zilliz query failed")
@@ -226,20 +377,47 @@ class ZillizProvider(BaseProvider):
 
         logger.debug("Attempting to delete document with id: %s", id)
         try:
-            result = await delete_document_zilliz(id)
+            result = await delete_document_zilliz(id, self.rest_client)
+            self._invalidate_answer_cache()
+            if self.lexical_index is not None:
+                await asyncio.to_thread(self.lexical_index.delete, [id])
+                await asyncio.to_thread(self.lexical_index.save)
+            await asyncio.to_thread(self.ingest_manifest.forget_ids, [id])
             logger.debug("Document %s deletion attempt result: %s", id, result)
             return result
         except Exception as e:
             logger.error("Error deleting document %s: %s", id, e)
             raise RuntimeError("Document deletion failed") from e
 
-    async def delete_all_documents(self) -> dict:
+    async def delete_source(self, name: str, keep_ids=()) -> dict:
+        """
+        Deletes all chunks of the source `name` (filename or URL) in Zilliz Cloud, except `keep_ids`.
+        """
+        logger.debug("Attempting to delete source %s", name)
+        try:
+            result = await delete_source_zilliz(name, self.rest_client, keep_ids)
+            self._invalidate_answer_cache()
+            if self.lexical_index is not None:
+                await asyncio.to_thread(self.lexical_index.delete_source, name, keep_ids)
+                await asyncio.to_thread(self.lexical_index.save)
+            await asyncio.to_thread(self.ingest_manifest.forget_source, name, keep_ids)
+            return result
+        except Exception as e:
+            logger.error("Error deleting source %s: %s", name, e)
+            raise RuntimeError("Source deletion failed") from e
+
+    async def delete_all_documents(self, job=None) -> dict:
         """
         Deletes all documents in the Zilliz Cloud collection.
         """
         logger.debug("Attempting to delete all documents")
         try:
-            result = await delete_all_documents_zilliz()
+            result = await delete_all_documents_zilliz(self.rest_client, job)
+            self._invalidate_answer_cache()
+            if self.lexical_index is not None:
+                await asyncio.to_thread(self.lexical_index.clear)
+                await asyncio.to_thread(self.lexical_index.save)
+            await asyncio.to_thread(self.ingest_manifest.clear)
             logger.debug("All documents deletion attempt result: %s", result)
             return result
         except Exception as e:
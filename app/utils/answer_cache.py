@@ -0,0 +1,127 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of generated answers keyed by the embedding of the query that produced them.
+
+    A lookup compares the query embedding against every cached query embedding in one vectorized
+    cosine-similarity pass and returns the stored answer of the closest match if it is at or above
+    the similarity threshold. Entries expire after `ttl` seconds and the least recently used entry
+    is evicted once `max_entries` is reached.
+
+    The whole cache is dropped by `invalidate()` whenever the underlying corpus changes, since any
+    cached answer may then be out of date. Answers generated while an invalidation happened are not
+    stored (see `generation`).
+    """
+    def __init__(self, max_entries: int, ttl: float, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        # Row-per-slot matrix of unit-normalized query embeddings, allocated on first store
+        # once the embedding dimension is known.
+        self._vectors = None
+        # slot -> (query, answer, created_at); ordered from least to most recently used.
+        self._entries = OrderedDict()
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        # Bumped on every invalidation so in-flight generations can tell their answer is stale.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _release(self, slot: int):
+        del self._entries[slot]
+        self._free_slots.append(slot)
+
+    def _purge_expired(self, now: float):
+        expired = [slot for slot, (_, _, created_at) in self._entries.items() if now - created_at >= self.ttl]
+        for slot in expired:
+            self._release(slot)
+
+    def lookup(self, vector) -> Optional[str]:
+        """
+        Returns the cached answer for the most similar previously answered query, or None on a miss.
+        """
+        now = time.time()
+        self._purge_expired(now)
+        if not self._entries:
+            self.misses += 1
+            return None
+
+        query_vector = self._normalize(vector)
+        slots = np.fromiter(self._entries.keys(), dtype=np.intp, count=len(self._entries))
+        similarities = self._vectors[slots] @ query_vector
+        best = int(np.argmax(similarities))
+        best_similarity = float(similarities[best])
+
+        if best_similarity < self.similarity_threshold:
+            self.misses += 1
+            logger.debug("Answer cache miss (best similarity %.4f)", best_similarity)
+            return None
+
+        slot = int(slots[best])
+        self._entries.move_to_end(slot)
+        cached_query, answer, _ = self._entries[slot]
+        self.hits += 1
+        logger.debug("Answer cache hit (similarity %.4f) on cached query: '%s'", best_similarity, cached_query)
+        return answer
+
+    def store(self, vector, query: str, answer: str, generation: int):
+        """
+        Stores an answer under its query embedding.
+        Ignored if the cache was invalidated after the answer's generation started.
+        """
+        if generation != self.generation or not answer or self.max_entries <= 0:
+            return
+
+        query_vector = self._normalize(vector)
+        if self._vectors is None or self._vectors.shape[1] != query_vector.shape[0]:
+            self._vectors = np.zeros((self.max_entries, query_vector.shape[0]), dtype=np.float32)
+            self._entries.clear()
+            self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+        if not self._free_slots:
+            self._purge_expired(time.time())
+        if not self._free_slots:
+            # Evict the least recently used entry
+            lru_slot = next(iter(self._entries))
+            self._release(lru_slot)
+            self.evictions += 1
+
+        slot = self._free_slots.pop()
+        self._vectors[slot] = query_vector
+        self._entries[slot] = (query, answer, time.time())
+
+    def invalidate(self):
+        """Drops every cached answer. Called whenever documents are ingested or deleted."""
+        self._entries.clear()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self.generation += 1
+        self.invalidations += 1
+        logger.info("Answer cache invalidated (generation %d)", self.generation)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
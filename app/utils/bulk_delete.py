@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+from app.utils.jobs import Job
+
+logger = logging.getLogger(__name__)
+
+
+async def delete_ids(
+    ids: List,
+    delete_batch: Callable[[List], Awaitable[Optional[int]]],
+    job: Optional[Job] = None,
+    batch_size: int = 100,
+    concurrency: int = 4,
+) -> Job:
+    """
+    Deletes `ids` in batches of `batch_size`, at most `concurrency` batches in flight.
+    delete_batch(ids) returns the number of ids it could not delete (None for all deleted);
+    a batch that raises counts as failed entirely. Progress and failures are reported on `job`.
+    """
+    job = job or Job("delete")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def delete(batch):
+        async with semaphore:
+            try:
+                failed = await delete_batch(batch) or 0
+            except Exception as e:
+                logger.warning("Deleting a batch of %d failed: %s", len(batch), e)
+                job.progress(failed=len(batch), error=str(e))
+                return
+            job.progress(processed=len(batch) - failed, failed=failed,
+                         error=f"{failed} of {len(batch)} deletes in a batch failed" if failed else None)
+
+    await asyncio.gather(*(delete(ids[i : i + batch_size]) for i in range(0, len(ids), batch_size)))
+    return job
+
+
+async def drain_delete(
+    fetch_page: Callable[[], Awaitable[List]],
+    delete_batch: Callable[[List], Awaitable[Optional[int]]],
+    job: Optional[Job] = None,
+    batch_size: int = 100,
+    concurrency: int = 4,
+    max_stale_rounds: int = 3,
+    stale_wait: float = 1.0,
+    count_remaining: Optional[Callable[[], Awaitable[Optional[int]]]] = None,
+) -> dict:
+    """
+    Deletes every entity of a collection by draining it one page at a time.
+
+    fetch_page() returns up to one page of ids that are still present, and each page is
+    deleted with delete_ids(). Deleted entities drop out of the next page, so no offset
+    (which would shift under the deletes and skip entities) is needed. Search indexes are only eventually consistent: ids
+    already handled are skipped, and a page with nothing new is fetched again after
+    `stale_wait` seconds, at most `max_stale_rounds` times. The drain then stops; unless
+    count_remaining() reports the collection empty, the result is marked "incomplete" with
+    the number of entities that may remain. Progress and failures are reported on `job`.
+    """
+    job = job or Job("delete_all")
+    seen = set()
+    stale_rounds = 0
+    remaining = 0
+
+    while True:
+        page = await fetch_page()
+        if not page:
+            break
+        fresh = [entity_id for entity_id in page if entity_id not in seen]
+        if not fresh:
+            stale_rounds += 1
+            if stale_rounds > max_stale_rounds:
+                remaining = await count_remaining() if count_remaining is not None else None
+                if remaining is None:
+                    remaining = max(job.total - job.processed, len(page)) if job.total is not None else len(page)
+                break
+            await asyncio.sleep(stale_wait)
+            continue
+        stale_rounds = 0
+        seen.update(fresh)
+        await delete_ids(fresh, delete_batch, job, batch_size, concurrency)
+        logger.debug("Deleted %d so far (%d failed)", job.processed, job.failed)
+
+    result = {"total_deleted": job.processed, "failed": job.failed}
+    if remaining:
+        logger.warning("Stopping with %d entities possibly left, still listed after their delete", remaining)
+        job.progress(error=f"Stopped with {remaining} entities possibly left; run the delete again")
+        result.update(incomplete=True, remaining=remaining)
+    return result
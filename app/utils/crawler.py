@@ -0,0 +1,279 @@
+import gzip
+import time
+import asyncio
+import logging
+import posixpath
+import xml.etree.ElementTree as ElementTree
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
+import httpx
+from app.config import settings
+from app.utils.metrics import CRAWL_FETCHES
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Sitemap indexes may nest; deeper trees are ignored
+MAX_SITEMAP_DEPTH = 3
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalizes a URL for deduplication: lowercase scheme and host, no default port, no fragment,
+    "." and ".." resolved, tracking parameters dropped and the remaining query sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    normalized = posixpath.normpath(path)
+    path = normalized + ("/" if path.endswith("/") and normalized != "/" else "")
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def is_http_url(url: str) -> bool:
+    """True for an absolute http(s) URL with a host and a valid port."""
+    try:
+        parts = urlsplit(url.strip())
+        parts.port
+    except ValueError:
+        return False
+    return parts.scheme.lower() in DEFAULT_PORTS and bool(parts.hostname)
+
+
+class CrawledPage:
+    def __init__(self, url: str, final_url: Optional[str] = None, status: Optional[int] = None,
+                 content_type: str = "", body: bytes = b"", error: Optional[str] = None):
+        self.url = url
+        self.final_url = final_url or url
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and 200 <= self.status < 300
+
+
+class HostLimits:
+    """Politeness state of one host: concurrent requests, spacing between them and robots.txt."""
+    def __init__(self, concurrency: int, delay: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.delay = delay
+        self.next_request = 0.0
+        self.robots: Optional[RobotFileParser] = None
+        self.robots_lock = asyncio.Lock()
+
+    async def wait_turn(self):
+        # Reserve the next slot before sleeping, so concurrent requests queue up behind each other
+        now = time.monotonic()
+        start = max(now, self.next_request)
+        self.next_request = start + self.delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class Crawler:
+    """
+    Fetches lists of pages concurrently over one pooled httpx.AsyncClient, politely.
+
+    At most `concurrency` requests are in flight overall and `per_host_concurrency` per host,
+    requests to a host are spaced `per_host_delay` seconds apart (or the robots.txt Crawl-delay,
+    if larger), and URLs disallowed by robots.txt are skipped. URLs are deduplicated by their
+    canonical form (see canonical_url) and responses larger than `max_page_bytes` are dropped.
+    expand() turns sitemaps (and sitemap indexes, gzipped or not) into page URLs; crawl() yields
+    pages as they arrive, in completion order. Use it as an async context manager.
+    """
+    def __init__(self, concurrency: int = 8, per_host_concurrency: int = 2, per_host_delay: float = 0.25,
+                 timeout: float = 15.0, max_pages: int = 2000, max_page_bytes: int = 5 * 1024 * 1024,
+                 user_agent: str = "chatbot-ingest/1.0", respect_robots: bool = True,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_delay = per_host_delay
+        self.max_pages = max_pages
+        self.max_page_bytes = max_page_bytes
+        self.user_agent = user_agent
+        self.respect_robots = respect_robots
+        self._hosts: Dict[str, HostLimits] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": user_agent},
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "Crawler":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    @classmethod
+    def from_settings(cls) -> "Crawler":
+        return cls(
+            concurrency=settings.CRAWL_CONCURRENCY,
+            per_host_concurrency=settings.CRAWL_PER_HOST_CONCURRENCY,
+            per_host_delay=settings.CRAWL_PER_HOST_DELAY,
+            timeout=settings.CRAWL_TIMEOUT,
+            max_pages=settings.CRAWL_MAX_PAGES,
+            max_page_bytes=settings.CRAWL_MAX_PAGE_BYTES,
+            user_agent=settings.CRAWL_USER_AGENT,
+            respect_robots=settings.CRAWL_RESPECT_ROBOTS,
+        )
+
+    def _host(self, url: str) -> HostLimits:
+        netloc = urlsplit(url).netloc
+        if netloc not in self._hosts:
+            self._hosts[netloc] = HostLimits(self.per_host_concurrency, self.per_host_delay)
+        return self._hosts[netloc]
+
+    async def _robots(self, url: str, host: HostLimits) -> RobotFileParser:
+        async with host.robots_lock:
+            if host.robots is None:
+                parts = urlsplit(url)
+                robots_url = urlunsplit((parts.scheme, parts.netloc, "/robots.txt", "", ""))
+                robots = RobotFileParser(robots_url)
+                try:
+                    response = await self._client.get(robots_url)
+                    if response.status_code in (401, 403):
+                        robots.disallow_all = True
+                    elif response.status_code < 400:
+                        robots.parse(response.text.splitlines())
+                    else:
+                        robots.parse([])
+                except httpx.HTTPError as e:
+                    logger.debug("No robots.txt for %s: %s", parts.netloc, e)
+                    robots.parse([])
+                delay = robots.crawl_delay(self.user_agent)
+                if delay:
+                    host.delay = max(host.delay, float(delay))
+                host.robots = robots
+            return host.robots
+
+    async def fetch(self, url: str) -> CrawledPage:
+        """
+        Fetches one URL within the politeness limits. Any error, including a malformed URL, is
+        returned on the page rather than raised, so one bad page cannot stop a crawl.
+        """
+        if not is_http_url(url):
+            CRAWL_FETCHES.labels("invalid_url").inc()
+            return CrawledPage(url, error="Not an absolute http(s) URL")
+        try:
+            host = self._host(url)
+            if self.respect_robots and not (await self._robots(url, host)).can_fetch(self.user_agent, url):
+                CRAWL_FETCHES.labels("robots_disallowed").inc()
+                return CrawledPage(url, error="Disallowed by robots.txt")
+            async with self._slots, host.semaphore:
+                await host.wait_turn()
+                async with self._client.stream("GET", url) as response:
+                    body = bytearray()
+                    async for block in response.aiter_bytes():
+                        body += block
+                        if len(body) > self.max_page_bytes:
+                            CRAWL_FETCHES.labels("too_large").inc()
+                            return CrawledPage(url, str(response.url), response.status_code,
+                                               error=f"Larger than {self.max_page_bytes} bytes")
+        except Exception as e:
+            CRAWL_FETCHES.labels("error").inc()
+            return CrawledPage(url, error=f"{type(e).__name__}: {e}")
+        CRAWL_FETCHES.labels(str(response.status_code)).inc()
+        page = CrawledPage(url, str(response.url), response.status_code, response.headers.get("content-type", ""), bytes(body))
+        if not page.ok:
+            page.error = f"HTTP {response.status_code}"
+        return page
+
+    async def expand(self, urls: Iterable[str] = (), sitemaps: Iterable[str] = ()) -> List[str]:
+        """Returns the deduplicated page URLs of `urls` plus every page listed in `sitemaps`."""
+        pages = list(urls)
+        pending = [(sitemap, 0) for sitemap in sitemaps]
+        seen_sitemaps = set()
+        while pending and len(pages) < self.max_pages:
+            sitemap, depth = pending.pop(0)
+            if not is_http_url(sitemap):
+                logger.warning("Skipping sitemap %s: not an absolute http(s) URL", sitemap)
+                continue
+            if canonical_url(sitemap) in seen_sitemaps or depth > MAX_SITEMAP_DEPTH:
+                continue
+            seen_sitemaps.add(canonical_url(sitemap))
+            page = await self.fetch(sitemap)
+            if not page.ok:
+                logger.warning("Skipping sitemap %s: %s", sitemap, page.error)
+                continue
+            try:
+                page_urls, child_sitemaps = parse_sitemap(page.body)
+            except ElementTree.ParseError as e:
+                logger.warning("Skipping unparsable sitemap %s: %s", sitemap, e)
+                continue
+            # <loc> must be absolute; anything else (relative paths, other schemes, bad ports) is skipped
+            pages.extend(url for url in page_urls if is_http_url(url))
+            pending.extend((child, depth + 1) for child in child_sitemaps if is_http_url(child))
+        return self.dedupe(pages)[:self.max_pages]
+
+    @staticmethod
+    def dedupe(urls: Iterable[str]) -> List[str]:
+        """Drops repeated URLs by canonical form; a URL that cannot be normalized is kept as is (fetch reports it)."""
+        seen = set()
+        unique = []
+        for url in urls:
+            try:
+                key = canonical_url(url)
+            except ValueError:
+                key = url
+            if key not in seen:
+                seen.add(key)
+                unique.append(url)
+        return unique
+
+    async def crawl(self, urls: Iterable[str]) -> AsyncIterator[CrawledPage]:
+        """
+        Fetches every URL (deduplicated) and yields each page as soon as it arrives. Only a
+        bounded number of fetches is scheduled ahead of the consumer.
+        """
+        urls = iter(self.dedupe(urls)[:self.max_pages])
+        in_flight = set()
+        while True:
+            while len(in_flight) < 2 * self.concurrency:
+                url = next(urls, None)
+                if url is None:
+                    break
+                in_flight.add(asyncio.ensure_future(self.fetch(url)))
+            if not in_flight:
+                return
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            try:
+                for task in done:
+                    yield task.result()
+            except BaseException:
+                for task in in_flight:
+                    task.cancel()
+                raise
+
+
+def parse_sitemap(body: bytes):
+    """Returns (page URLs, child sitemap URLs) of a sitemap or sitemap index, gzipped or not."""
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    root = ElementTree.fromstring(body)
+    locs = [
+        element.text.strip() for element in root.iter()
+        if element.tag.rsplit("}", 1)[-1] == "loc" and element.text and element.text.strip()
+    ]
+    if root.tag.rsplit("}", 1)[-1] == "sitemapindex":
+        return [], locs
+    return locs, []
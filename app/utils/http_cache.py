@@ -0,0 +1,139 @@
+import gzip
+import json
+import hashlib
+import logging
+from typing import Dict, Hashable, Optional, Tuple
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional: responses are then offered gzip-compressed only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+
+def json_body(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def body_digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+class EncodedPayload:
+    """
+    A JSON body serialized once, with its strong ETag and pre-compressed variants.
+    Each encoding gets its own ETag ("<hash>", "<hash>-gzip", "<hash>-br") as required for
+    strong validators, and If-None-Match matches any of them since the content is the same.
+    """
+    __slots__ = ("body", "digest", "encoded")
+
+    def __init__(self, payload, compress: bool = True):
+        self._encode(json_body(payload), compress)
+
+    @classmethod
+    def from_body(cls, body: bytes, compress: bool = True) -> "EncodedPayload":
+        encoded = cls.__new__(cls)
+        encoded._encode(body, compress)
+        return encoded
+
+    def _encode(self, body: bytes, compress: bool):
+        self.body = body
+        self.digest = body_digest(body)
+        self.encoded: Dict[str, bytes] = {}
+        if compress and len(self.body) >= MIN_COMPRESS_BYTES:
+            self.encoded["gzip"] = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(self.body, quality=11)
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag.strip('"').split("-")[0] == self.digest:
+                return True
+        return False
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> Optional[str]:
+    """Picks br over gzip among the available encodings the client accepts (q > 0)."""
+    if not accept_encoding or not available:
+        return None
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def cached_json_response(request: Request, payload: EncodedPayload, cache_control: str) -> Response:
+    """
+    Answers a GET with 304 Not Modified when the client's ETag matches, otherwise with the
+    pre-encoded body in the best encoding the client accepts.
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding"), payload.encoded)
+    headers = {
+        "ETag": payload.etag(encoding),
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if payload.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        return Response(payload.encoded[encoding], media_type="application/json", headers=headers)
+    return Response(payload.body, media_type="application/json", headers=headers)
+
+
+class PayloadCache:
+    """
+    Encoded payloads keyed by e.g. (provider, language). Most providers hand out the same list
+    object until their own cache refreshes, so get() first tries an identity check, which
+    skips re-serializing and hashing. A new object with the same content (e.g. a provider
+    that rebuilds its list per call) is matched by encode() on the body digest and reuses the
+    compressed variants; only changed content is compressed again.
+    """
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[object, EncodedPayload]] = {}
+
+    def get(self, key: Hashable, source) -> Optional[EncodedPayload]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is source:
+            return entry[1]
+        return None
+
+    def put(self, key: Hashable, source, payload: EncodedPayload):
+        # Holding a reference to `source` keeps its identity from being reused
+        self._entries[key] = (source, payload)
+
+    def encode(self, key: Hashable, source) -> EncodedPayload:
+        """Returns the payload for `source`, compressing it only if its content changed. Blocking."""
+        body = json_body(source)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1].digest == body_digest(body):
+            payload = entry[1]
+        else:
+            payload = EncodedPayload.from_body(body)
+        self.put(key, source, payload)
+        return payload
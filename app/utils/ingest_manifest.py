@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_hash(text: str) -> str:
+    """Stable content hash of one chunk; an unchanged chunk keeps its vector store entry."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class IngestManifest:
+    """
+    Which chunks each source (filename or URL) was last ingested as: source -> {chunk hash: id}
+    in the vector store, kept in a SQLite file shared by every worker process on the host
+    (in memory, per process, without a path).
+
+    Re-ingesting a source only embeds and inserts chunks whose hash is not in its entry and
+    deletes the ids of hashes that disappeared. Every read goes to the database and every
+    write only touches the rows of one source, so workers never ingest from a stale copy or
+    overwrite each other's sources. Ingestions of the same source are serialized, across
+    processes too, by lock(). Deleting chunks by other means must be reported here (forget_*),
+    otherwise a later re-ingest would skip chunks that no longer exist.
+
+    All methods except lock() block; call them through asyncio.to_thread.
+    """
+    def __init__(self, path: Optional[str] = None, lease: float = 60.0, poll_interval: float = 0.5):
+        self.path = path
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._owner = uuid.uuid4().hex
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock = threading.Lock()
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False, timeout=30, isolation_level=None)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        # doc_id has no declared type, so ids keep their type (int for Zilliz, str elsewhere)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_manifest ("
+            " source TEXT NOT NULL,"
+            " chunk TEXT NOT NULL,"
+            " doc_id NOT NULL,"
+            " PRIMARY KEY (source, chunk))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ingest_manifest_doc_id ON ingest_manifest (CAST(doc_id AS TEXT))")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_manifest_locks ("
+            " source TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires REAL NOT NULL)"
+        )
+
+    def load(self):
+        """Imports the manifest left by the former JSON format (same path, .json), if any."""
+        if not self.path:
+            return
+        legacy_path = os.path.splitext(self.path)[0] + ".json"
+        if legacy_path == self.path or not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                sources = json.load(f).get("sources", {})
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable ingest manifest %s: %s", legacy_path, e)
+            return
+        with self._transaction():
+            if self._conn.execute("SELECT 1 FROM ingest_manifest LIMIT 1").fetchone() is None:
+                self._conn.executemany(
+                    "INSERT INTO ingest_manifest (source, chunk, doc_id) VALUES (?, ?, ?)",
+                    [(source, key, doc_id) for source, chunks in sources.items() for key, doc_id in chunks.items()],
+                )
+                logger.info("Imported %d sources from %s", len(sources), legacy_path)
+        os.replace(legacy_path, legacy_path + ".imported")
+        logger.info("Ingest manifest at %s tracks %d sources", self.path, len(self))
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _try_lease(self, source: str) -> bool:
+        now = time.time()
+        with self._transaction():
+            row = self._conn.execute("SELECT owner, expires FROM ingest_manifest_locks WHERE source = ?", (source,)).fetchone()
+            if row is not None and row[0] != self._owner and row[1] > now:
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingest_manifest_locks (source, owner, expires) VALUES (?, ?, ?)",
+                (source, self._owner, now + self.lease),
+            )
+            return True
+
+    def _renew_lease(self, source: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_manifest_locks SET expires = ? WHERE source = ? AND owner = ?",
+                (time.time() + self.lease, source, self._owner),
+            )
+
+    def _release_lease(self, source: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM ingest_manifest_locks WHERE source = ? AND owner = ?", (source, self._owner))
+
+    async def _keep_lease(self, source: str):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await asyncio.to_thread(self._renew_lease, source)
+
+    @asynccontextmanager
+    async def lock(self, source: str):
+        """
+        Holds `source` for one ingestion: an asyncio lock within the process and a lease row
+        (renewed while held, taken over once expired if its process died) across processes.
+        """
+        async with self._locks.setdefault(source, asyncio.Lock()):
+            while not await asyncio.to_thread(self._try_lease, source):
+                await asyncio.sleep(self.poll_interval)
+            keeper = asyncio.create_task(self._keep_lease(source))
+            try:
+                yield
+            finally:
+                keeper.cancel()
+                await asyncio.to_thread(self._release_lease, source)
+
+    def get(self, source: str) -> Dict[str, object]:
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk, doc_id FROM ingest_manifest WHERE source = ?", (source,)).fetchall()
+        return dict(rows)
+
+    def add(self, source: str, chunks: Dict[str, object]):
+        """Records inserted chunks of a source, keeping its other entries."""
+        with self._transaction():
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ingest_manifest (source, chunk, doc_id) VALUES (?, ?, ?)",
+                [(source, key, doc_id) for key, doc_id in chunks.items()],
+            )
+
+    def set(self, source: str, chunks: Dict[str, object]):
+        """Replaces the entry of a source."""
+        with self._transaction():
+            self._conn.execute("DELETE FROM ingest_manifest WHERE source = ?", (source,))
+            self._conn.executemany(
+                "INSERT INTO ingest_manifest (source, chunk, doc_id) VALUES (?, ?, ?)",
+                [(source, key, doc_id) for key, doc_id in chunks.items()],
+            )
+
+    def forget_source(self, source: str, keep_ids: Iterable = ()):
+        """Drops the entries of a source whose chunks were deleted, except those in `keep_ids`."""
+        keep_ids = {str(doc_id) for doc_id in keep_ids}
+        with self._transaction():
+            rows = self._conn.execute("SELECT chunk, doc_id FROM ingest_manifest WHERE source = ?", (source,)).fetchall()
+            self._conn.executemany(
+                "DELETE FROM ingest_manifest WHERE source = ? AND chunk = ?",
+                [(source, key) for key, doc_id in rows if str(doc_id) not in keep_ids],
+            )
+
+    def forget_ids(self, ids: Iterable):
+        """Drops entries of chunks deleted by id (e.g. through document_delete)."""
+        with self._transaction():
+            self._conn.executemany(
+                "DELETE FROM ingest_manifest WHERE CAST(doc_id AS TEXT) = ?", [(str(doc_id),) for doc_id in ids]
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM ingest_manifest")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT source) FROM ingest_manifest").fetchone()[0]
@@ -0,0 +1,223 @@
+import os
+import json
+import shutil
+import time
+import uuid
+import asyncio
+import logging
+from typing import BinaryIO, List, Optional, Union
+from app.config import settings
+from app.utils.jobs import JobStore, job_status
+from app.utils.metrics import INGEST_JOBS
+from app.utils.scheduler import SchedulerSaturated
+
+logger = logging.getLogger(__name__)
+
+# Uploads are copied into the spool directory in blocks of this size
+SPOOL_BLOCK_BYTES = 1024 * 1024
+
+
+class IngestQueue:
+    """
+    Persistent ingestion queue of one provider, worked off by `workers` background tasks.
+
+    Endpoints enqueue a job (uploaded bytes are spooled to `spool_dir`) and return at once.
+    Each worker runs one job at a time through the provider's ingest chain, recording the stage
+    it reached and the chunk counts. Parsing and splitting run in threads and embedding holds
+    "ingest" scheduler slots, so with several workers one job is parsed while another embeds.
+    Jobs live in the shared JobStore (queue `name`) and are picked up again after a restart.
+    """
+    def __init__(self, name: str, ingest_chain, store: JobStore, spool_dir: str, workers: int = 2,
+                 lease: float = 60.0, poll_interval: float = 2.0, max_attempts: int = 3, retention: float = 7 * 86400):
+        self.name = name
+        self.ingest_chain = ingest_chain
+        self.store = store
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+    async def start(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        purged = await asyncio.to_thread(self.store.purge, time.time() - self.retention)
+        if purged:
+            logger.info("Purged %d finished ingest jobs from %s", purged, self.name)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info("Started %d ingest workers for %s", self.workers, self.name)
+
+    async def aclose(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.wait(self._tasks)
+        self._tasks = []
+
+    async def _enqueue(self, kind: str, source: str, replace: bool, payload_path: Optional[str] = None,
+                       job_id: Optional[str] = None) -> dict:
+        job = {
+            "id": job_id or uuid.uuid4().hex,
+            "queue": self.name,
+            "kind": kind,
+            "source": source,
+            "payload_path": payload_path,
+            "replace": int(replace),
+            "status": "queued",
+            "stage": None,
+            "created": time.time(),
+        }
+        await asyncio.to_thread(self.store.insert, job)
+        INGEST_JOBS.labels(self.name, "queued").inc()
+        self._wakeup.set()
+        return job_status(job)
+
+    async def submit_document(self, file_contents: Union[bytes, BinaryIO], filename: str, replace: bool = False) -> dict:
+        """
+        Spools the document and enqueues it. A file object (e.g. an upload's SpooledTemporaryFile)
+        is copied block by block, so large uploads are never held in memory as a whole.
+        """
+        job_id = uuid.uuid4().hex
+        payload_path = os.path.join(self.spool_dir, job_id)
+        await asyncio.to_thread(_write_file, payload_path, file_contents)
+        return await self._enqueue("document", filename, replace, payload_path, job_id)
+
+    async def submit_url(self, url: str, replace: bool = False) -> dict:
+        return await self._enqueue("url", url, replace)
+
+    async def submit_site(self, urls: List[str], sitemaps: List[str], replace: bool = False) -> dict:
+        """Enqueues a bulk ingestion of URLs and sitemaps; the lists are spooled as JSON."""
+        job_id = uuid.uuid4().hex
+        payload_path = os.path.join(self.spool_dir, job_id)
+        payload = json.dumps({"urls": urls, "sitemaps": sitemaps}).encode("utf-8")
+        await asyncio.to_thread(_write_file, payload_path, payload)
+        source = (sitemaps or urls)[0]
+        if len(urls) + len(sitemaps) > 1:
+            source += f" (+{len(urls) + len(sitemaps) - 1} more)"
+        return await self._enqueue("site", source, replace, payload_path, job_id)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await asyncio.to_thread(self.store.get, self.name, job_id)
+        return job_status(job) if job is not None else None
+
+    async def _next_job(self) -> dict:
+        while True:
+            job = await asyncio.to_thread(self.store.claim, self.name, time.time(), self.lease, self.max_attempts)
+            if job is not None:
+                return job
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await asyncio.to_thread(self.store.update, job_id, heartbeat=time.time())
+
+    async def _worker(self, number: int):
+        while True:
+            job = await self._next_job()
+            heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back so the next start (or another process) resumes it
+                self.store.update(job["id"], status="queued", stage=None, heartbeat=None)
+                raise
+            except Exception:
+                logger.exception("Ingest worker %d of %s failed on job %s", number, self.name, job["id"])
+            finally:
+                heartbeat.cancel()
+
+    async def _run(self, job: dict):
+        job_id = job["id"]
+        stats = {}
+        writes = []
+
+        def progress(stage: str, counts: dict):
+            # Called from the ingest chain; the write runs in the background, after the previous one
+            stats.update(counts)
+            fields = {"stage": stage, "stats": json.dumps(stats), "heartbeat": time.time()}
+            writes.append(asyncio.ensure_future(self._update_after(writes[-1] if writes else None, job_id, fields)))
+
+        logger.info("Ingest job %s (%s '%s') started, attempt %d", job_id, job["kind"], job["source"], job["attempts"])
+        try:
+            try:
+                if job["kind"] == "document":
+                    # The chain streams the spooled file: PDFs page by page, text in blocks
+                    with open(job["payload_path"], "rb") as file:
+                        result = await self.ingest_chain.ingest_document(file, job["source"], bool(job["replace"]), progress)
+                elif job["kind"] == "site":
+                    site = await asyncio.to_thread(_read_json, job["payload_path"])
+                    result = await self.ingest_chain.ingest_site(site["urls"], site["sitemaps"], bool(job["replace"]), progress)
+                else:
+                    result = await self.ingest_chain.ingest_url(job["source"], bool(job["replace"]), progress)
+            finally:
+                # The final status must not be overwritten by a late progress write
+                if writes:
+                    await asyncio.gather(writes[-1], return_exceptions=True)
+        except SchedulerSaturated as e:
+            # Upstream capacity is taken by chat traffic: retry later instead of failing the job
+            logger.info("Ingest job %s postponed, the ingest pool is saturated", job_id)
+            await asyncio.sleep(e.retry_after)
+            await asyncio.to_thread(self.store.update, job_id, status="queued", stage=None, attempts=job["attempts"] - 1)
+            return
+        except Exception as e:
+            logger.error("Ingest job %s failed: %s", job_id, e)
+            await asyncio.to_thread(
+                self.store.update, job_id, status="failed", error=str(e), finished=time.time(), stats=json.dumps(stats)
+            )
+            INGEST_JOBS.labels(self.name, "failed").inc()
+        else:
+            stats.update({key: value for key, value in result.items() if key not in ("status", "message")})
+            # e.g. a site job whose failing pages were skipped
+            status = "completed_with_errors" if stats.get("failed") else "completed"
+            await asyncio.to_thread(
+                self.store.update, job_id, status=status, stage="done", finished=time.time(), stats=json.dumps(stats)
+            )
+            INGEST_JOBS.labels(self.name, status).inc()
+            logger.info("Ingest job %s %s: %s", job_id, status, stats)
+        if job.get("payload_path"):
+            await asyncio.to_thread(_remove_file, job["payload_path"])
+
+    async def _update_after(self, previous: Optional[asyncio.Future], job_id: str, fields: dict):
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        await asyncio.to_thread(self.store.update, job_id, **fields)
+
+    @classmethod
+    def from_settings(cls, name: str, ingest_chain) -> "IngestQueue":
+        return cls(
+            name,
+            ingest_chain,
+            JobStore(settings.JOB_STORE_PATH),
+            spool_dir=settings.INGEST_SPOOL_DIR,
+            workers=settings.INGEST_WORKERS,
+            lease=settings.JOB_LEASE,
+        )
+
+
+def _write_file(path: str, data: Union[bytes, BinaryIO]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        if isinstance(data, bytes):
+            f.write(data)
+        else:
+            shutil.copyfileobj(data, f, SPOOL_BLOCK_BYTES)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
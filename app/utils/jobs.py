@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import deque
+from typing import Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS = (
+    "id", "queue", "kind", "source", "payload_path", "replace", "status", "stage", "stats", "error",
+    "attempts", "created", "started", "finished", "heartbeat",
+)
+
+# Statuses of a job that has ended
+FINISHED_STATUSES = ("completed", "completed_with_errors", "incomplete", "failed", "cancelled")
+
+
+class JobStore:
+    """
+    Background jobs (ingestion, bulk deletes) in a SQLite file, shared by every worker process
+    on the host, so any worker can report on a job and jobs outlive a restart.
+
+    Jobs are grouped in queues. A job is claimed with one IMMEDIATE transaction, so two workers
+    never run the same job. A claim is a lease kept alive by heartbeats: a job whose worker died
+    (crash, restart) is claimed again once its heartbeat is older than the lease.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " queue TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " payload_path TEXT,"
+            " replace INTEGER NOT NULL DEFAULT 0,"
+            " status TEXT NOT NULL,"
+            " stage TEXT,"
+            " stats TEXT,"
+            " error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created REAL NOT NULL,"
+            " started REAL,"
+            " finished REAL,"
+            " heartbeat REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (queue, status, created)")
+
+    def insert(self, job: dict):
+        columns = [column for column in JOB_COLUMNS if column in job]
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [job[column] for column in columns],
+            )
+
+    def claim(self, queue: str, now: float, lease: float, max_attempts: int) -> Optional[dict]:
+        """
+        Marks the oldest queued job (or running job with an expired lease) as running and
+        returns it. Expired jobs that were already attempted max_attempts times are failed.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished = ?, error = 'Abandoned after repeated worker failures'"
+                    " WHERE queue = ? AND status = 'running' AND heartbeat < ? AND attempts >= ?",
+                    (now, queue, now - lease, max_attempts),
+                )
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE queue = ? AND"
+                    " (status = 'queued' OR (status = 'running' AND heartbeat < ?))"
+                    " ORDER BY created LIMIT 1",
+                    (queue, now - lease),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', started = COALESCE(started, ?), heartbeat = ?,"
+                        " attempts = attempts + 1 WHERE id = ?",
+                        (now, now, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["status"] = "running"
+        return job
+
+    def abandon(self, queue: str, now: float, lease: float) -> int:
+        """Fails running jobs of a queue whose worker stopped heartbeating (jobs that are not resumed)."""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, error = 'Abandoned: the worker running it stopped'"
+                " WHERE queue = ? AND status = 'running' AND heartbeat < ?",
+                (now, queue, now - lease),
+            ).rowcount
+
+    def update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+
+    def get(self, queue: str, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE queue = ? AND id = ?", (queue, job_id)).fetchone()
+        return dict(row) if row is not None else None
+
+    def count(self, queue: str, status: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE queue = ? AND status = ?", (queue, status)
+            ).fetchone()[0]
+
+    def purge(self, before: float) -> int:
+        """Deletes finished jobs older than `before`."""
+        with self._lock:
+            return self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' for _ in FINISHED_STATUSES)}) AND finished < ?",
+                (*FINISHED_STATUSES, before),
+            ).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def job_status(job: dict) -> dict:
+    """
+    Public view of a job row, with elapsed time and throughput (items handled per second:
+    chunks for ingest jobs, entities for delete jobs).
+    """
+    stats = json.loads(job["stats"]) if job.get("stats") else {}
+    end = job.get("finished") or time.time()
+    elapsed = end - job["started"] if job.get("started") else 0.0
+    processed = stats.get("processed", stats.get("chunks", 0))
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "source": job["source"],
+        "replace": bool(job.get("replace")),
+        "status": job["status"],
+        "stage": job.get("stage"),
+        "stats": stats,
+        "attempts": job.get("attempts", 0),
+        "created": job["created"],
+        "started": job.get("started"),
+        "finished": job.get("finished"),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(processed / elapsed, 2) if processed and elapsed > 0 else None,
+        "error": job.get("error"),
+    }
+
+
+class Job:
+    """Progress handle of a running background job; the job function reports on it."""
+    def __init__(self, kind: str, source: str = ""):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.source = source
+        self.total: Optional[int] = None
+        self.processed = 0
+        self.failed = 0
+        self.errors = deque(maxlen=20)  # most recent error messages
+
+    def progress(self, processed: int = 0, failed: int = 0, error: Optional[str] = None):
+        self.processed += processed
+        self.failed += failed
+        if error:
+            self.errors.append(error)
+
+    def stats(self) -> dict:
+        return {"total": self.total, "processed": self.processed, "failed": self.failed, "errors": list(self.errors)}
+
+
+class JobRegistry:
+    """
+    Runs coroutines as background jobs in this process and records them in a JobStore, where
+    every worker can look them up. The job function receives the Job as its `job` keyword
+    argument to report progress, which is written to the store every `flush_interval` seconds
+    together with a heartbeat. Jobs are not resumed: one whose process stopped is reported as
+    failed once its heartbeat is older than `lease`.
+    """
+    def __init__(self, store: JobStore, queue: str = "background", lease: float = 60.0, flush_interval: float = 1.0):
+        self.store = store
+        self.queue = queue
+        self.lease = lease
+        self.flush_interval = flush_interval
+        self._tasks = {}
+
+    async def submit(self, kind: str, func, *args, source: str = "", **kwargs) -> dict:
+        job = Job(kind, source)
+        now = time.time()
+        row = {
+            "id": job.id,
+            "queue": self.queue,
+            "kind": kind,
+            "source": source,
+            "status": "running",
+            "stats": json.dumps(job.stats()),
+            "created": now,
+            "started": now,
+            "heartbeat": now,
+        }
+        await asyncio.to_thread(self.store.insert, row)
+        self._tasks[job.id] = asyncio.create_task(self._run(job, func, *args, **kwargs))
+        logger.info("Started %s job %s", kind, job.id)
+        return job_status(row)
+
+    async def _flush(self, job: Job):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.store.update, job.id, stats=json.dumps(job.stats()), heartbeat=time.time())
+
+    async def _run(self, job: Job, func, *args, **kwargs):
+        flush = asyncio.create_task(self._flush(job))
+        fields = {}
+        try:
+            result = await func(*args, job=job, **kwargs)
+            if (result or {}).get("incomplete"):
+                # e.g. a bulk delete that stopped while entities may remain
+                fields["status"] = "incomplete"
+            else:
+                fields["status"] = "completed_with_errors" if job.failed else "completed"
+            fields["stats"] = json.dumps({**job.stats(), **(result or {})})
+        except asyncio.CancelledError:
+            fields["status"] = "cancelled"
+            raise
+        except Exception as e:
+            logger.exception("%s job %s failed", job.kind, job.id)
+            fields["status"] = "failed"
+            fields["error"] = str(e)
+        finally:
+            flush.cancel()
+            await asyncio.gather(flush, return_exceptions=True)
+            fields.setdefault("stats", json.dumps(job.stats()))
+            fields["finished"] = time.time()
+            # Written in a thread that finishes even when this task is being cancelled
+            await asyncio.shield(asyncio.to_thread(self.store.update, job.id, **fields))
+            self._tasks.pop(job.id, None)
+            logger.info("%s job %s %s: %d processed, %d failed", job.kind, job.id, fields["status"], job.processed, job.failed)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        await asyncio.to_thread(self.store.abandon, self.queue, time.time(), self.lease)
+        job = await asyncio.to_thread(self.store.get, self.queue, job_id)
+        return job_status(job) if job is not None else None
+
+    async def aclose(self):
+        """Cancels jobs that are still running (on shutdown)."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    @classmethod
+    def from_settings(cls) -> "JobRegistry":
+        return cls(JobStore(settings.JOB_STORE_PATH), lease=settings.JOB_LEASE)
@@ -0,0 +1,333 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets (seconds) wide enough for both a cache hit and a slow LLM call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATE_BUCKETS = (1, 5, 10, 20, 30, 50, 75, 100, 150, 250)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    Base class for metrics with optional labels. Label combinations are created on first use
+    by labels(); a metric without labels is used directly.
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *labelvalues: str):
+        key = tuple(str(v) for v in labelvalues)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default_child(self):
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, child in list(self._children.items()):
+            lines.extend(child.samples(self.name, self.labelnames, labelvalues))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labelnames, labelvalues):
+        return [f"{name}_total{_format_labels(labelnames, labelvalues)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default_child().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def samples(self, name, labelnames, labelvalues):
+        return [f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default_child().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default_child().dec(amount)
+
+    def set(self, value: float):
+        self._default_child().set(value)
+
+    def track_inprogress(self):
+        return self._default_child().track_inprogress()
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self, name, labelnames, labelvalues):
+        with self._lock:
+            counts = list(self.counts)
+            total_sum = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + _format_value(float(bound)) + '"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, labelvalues, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, labelvalues)} {_format_value(total_sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS, registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default_child().observe(value)
+
+    def time(self):
+        return self._default_child().time()
+
+
+class Registry:
+    """
+    Holds metrics and renders them in the Prometheus text exposition format.
+    Collectors are callables returning {metric name: (type, help, value)} for values that are
+    already tracked elsewhere (e.g. cache hit counters) and are read only at scrape time.
+    """
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def register_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            values: Dict[str, Tuple[str, str, float]] = collector()
+            for name, (kind, documentation, value) in values.items():
+                sample_name = f"{name}_total" if kind == "counter" else name
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{sample_name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Metrics recorded across the request path ---
+
+EMBED_LATENCY = Histogram(
+    "chatbot_embed_seconds", "Time to embed a query.", ["purpose"],
+)
+VECTOR_SEARCH_LATENCY = Histogram(
+    "chatbot_vector_search_seconds", "Time to search an index with an embedded or tokenized query.", ["index"],
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "chatbot_llm_time_to_first_token_seconds", "Time from sending the prompt to the first streamed LLM token.",
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "chatbot_llm_tokens_per_second", "Streaming rate of an LLM generation after its first token.", buckets=RATE_BUCKETS,
+)
+STREAM_DURATION = Histogram(
+    "chatbot_stream_duration_seconds", "Total duration of a streamed answer, as seen by the asker.", ["outcome"],
+)
+STREAMS_IN_FLIGHT = Gauge(
+    "chatbot_streams_in_flight", "Answers currently being streamed to askers.",
+)
+GENERATIONS_IN_FLIGHT = Gauge(
+    "chatbot_llm_generations_in_flight", "LLM generations currently running.",
+)
+SSE_FRAMING_LATENCY = Histogram(
+    "chatbot_sse_framing_seconds", "Time per stream spent turning tokens into SSE events.",
+)
+STREAMS = Counter(
+    "chatbot_streams", "Chat streams by how they ended (completed, cancelled by the client, errored).", ["status"],
+)
+LLM_GENERATIONS = Counter(
+    "chatbot_llm_generations", "LLM generations by how they ended (completed, cancelled, errored).", ["status"],
+)
+SSE_FRAMES = Counter(
+    "chatbot_sse_frames", "SSE events written to chat streams, by framing mode.", ["framing"],
+)
+SCHEDULER_QUEUE_WAIT = Histogram(
+    "chatbot_scheduler_queue_wait_seconds", "Time an upstream LLM/embedding call waited for a scheduler slot.", ["scheduler", "pool"],
+)
+SCHEDULER_REJECTED = Counter(
+    "chatbot_scheduler_rejected", "Upstream calls rejected because the scheduler pool was saturated.", ["scheduler", "pool"],
+)
+SCHEDULER_IN_USE = Gauge(
+    "chatbot_scheduler_slots_in_use", "Scheduler slots currently held, by pool.", ["scheduler", "pool"],
+)
+SCHEDULER_QUEUED = Gauge(
+    "chatbot_scheduler_queued", "Calls waiting for a scheduler slot, by pool.", ["scheduler", "pool"],
+)
+TRANSLATION_BATCHES = Counter(
+    "chatbot_translation_batches", "Translation LLM calls by kind (batched, single, fallback to per-string calls).", ["kind"],
+)
+ZILLIZ_REQUEST_LATENCY = Histogram(
+    "chatbot_zilliz_request_seconds", "Latency of Zilliz REST calls (each attempt), by endpoint.", ["endpoint"],
+)
+ZILLIZ_RETRIES = Counter(
+    "chatbot_zilliz_retries", "Zilliz REST calls retried after a 429/5xx or transport error, by endpoint.", ["endpoint"],
+)
+RATE_LIMITED = Counter(
+    "chatbot_rate_limited", "API requests rejected by the per-IP rate limiter, by bucket (route suffix or default).", ["bucket"],
+)
+SEARCH_DATA_LATENCY = Histogram(
+    "chatbot_search_data_seconds", "Time per user query analytics search, by stage.", ["stage"],
+)
+INGEST_LATENCY = Histogram(
+    "chatbot_ingest_seconds", "Time per ingestion, by source kind and stage.", ["kind", "stage"],
+)
+INGEST_JOBS = Counter(
+    "chatbot_ingest_jobs", "Ingest jobs by queue (provider) and outcome (queued, completed, failed).", ["queue", "status"],
+)
+INGEST_WRITE_RETRIES = Counter(
+    "chatbot_ingest_write_retries", "Ingestion batches retried after a failed embedding or insert, by stage.", ["stage"],
+)
+CRAWL_FETCHES = Counter(
+    "chatbot_crawl_fetches", "Pages fetched for ingestion, by HTTP status or outcome (error, too_large, robots_disallowed).", ["outcome"],
+)
+TRANSCRIBE_LATENCY = Histogram(
+    "chatbot_transcribe_seconds", "Time to transcribe an audio clip.",
+)
+
+
+class StreamTimer:
+    """
+    Timestamps of one LLM generation. The chain marks llm_started (see mark_llm_start) and the
+    streaming loop marks the first token, so the per-token cost is a single None check.
+    """
+    __slots__ = ("started", "llm_started", "first_token")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.llm_started = None
+        self.first_token = None
+
+    def record(self, token_count: int):
+        """Records TTFT and tokens/sec once the generation has finished."""
+        if self.first_token is None:
+            return
+        finished = time.perf_counter()
+        LLM_TIME_TO_FIRST_TOKEN.observe(self.first_token - (self.llm_started or self.started))
+        streaming_time = finished - self.first_token
+        if token_count > 1 and streaming_time > 0:
+            LLM_TOKENS_PER_SECOND.observe((token_count - 1) / streaming_time)
+
+
+def mark_llm_start(prompt_value, config):
+    """
+    Pass-through chain step placed right before the LLM. Marks the StreamTimer passed in the run
+    metadata (config={"metadata": {"stream_timer": timer}}), so TTFT excludes retrieval.
+    """
+    timer = (config or {}).get("metadata", {}).get("stream_timer")
+    if timer is not None:
+        timer.llm_started = time.perf_counter()
+    return prompt_value
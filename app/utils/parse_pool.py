@@ -0,0 +1,58 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Default number of parser processes when PARSE_WORKERS is 0. Each one holds the parsing
+# libraries and the document it is parsing, so it is capped rather than one per core.
+DEFAULT_MAX_WORKERS = 4
+
+
+def parse_workers() -> int:
+    """Number of parser processes: PARSE_WORKERS, or if it is 0 one per CPU core up to DEFAULT_MAX_WORKERS."""
+    return settings.PARSE_WORKERS or min(os.cpu_count() or 1, DEFAULT_MAX_WORKERS)
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Returns the process pool shared by all ingestions, created by the first document that
+    needs it, or None if PARSE_POOL_ENABLED is off (documents are then parsed in a thread of
+    this process). The executor starts its processes on demand, as tasks are submitted.
+
+    Workers are spawned rather than forked: this process runs threads (event loop helpers,
+    SQLite, HTTP pools) whose locks a forked child could inherit in a held state. The tasks
+    are the functions of app.utils.parsers, which a spawned worker imports without the app.
+    """
+    global _pool
+    if not settings.PARSE_POOL_ENABLED:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=parse_workers(), mp_context=multiprocessing.get_context("spawn"))
+            logger.info("Started document parser pool with %d processes", parse_workers())
+        return _pool
+
+
+def shutdown_parse_pool(wait: bool = True):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=True)
+            _pool = None
+
+
+def discard_broken_parse_pool(error: Exception):
+    """A parser process that died (e.g. OOM-killed) breaks the whole pool; start over on next use."""
+    if isinstance(error, BrokenProcessPool):
+        logger.warning("Document parser pool is broken, it will be restarted: %s", error)
+        shutdown_parse_pool(wait=False)
+
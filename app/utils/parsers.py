@@ -0,0 +1,20 @@
+"""
+Document parsing functions run in the parser processes (see app.utils.parse_pool).
+
+A spawned parser process imports this module to unpickle the tasks, so it only depends on
+the parsing libraries: no settings, no providers, no endpoints.
+"""
+from typing import List
+from PyPDF2 import PdfReader
+from docx import Document as DocxDocument
+
+
+def parse_pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    """Extracts the text of pages [start, stop) of the PDF at `path`."""
+    reader = PdfReader(path)
+    return [(reader.pages[number].extract_text() or "") + "\n" for number in range(start, stop)]
+
+
+def parse_docx(path: str) -> List[str]:
+    """Extracts the paragraphs of the DOCX file at `path`."""
+    return [paragraph.text + "\n" for paragraph in DocxDocument(path).paragraphs]
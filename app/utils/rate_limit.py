@@ -0,0 +1,172 @@
+import os
+import math
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    """Tokens in a bucket that held `tokens` at `updated` and refills at `rate` per second."""
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def take(tokens: float, cost: float, rate: float) -> Tuple[bool, float, float]:
+    """Returns (allowed, tokens left, seconds until `cost` tokens are available)."""
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+class MemoryBackend:
+    """
+    Token buckets in a dict, private to one worker process.
+
+    Keys are kept in least-recently-used order. A bucket left idle long enough to refill
+    completely is indistinguishable from a new one, so such keys are evicted from the cold end
+    on every call, and `max_keys` bounds memory even under a flood of distinct clients.
+    """
+    blocking = False
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, capacity: float, rate: float, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            state = self._buckets.get(key)
+            tokens = capacity if state is None else refill(state[0], state[1], now, capacity, rate)
+            allowed, tokens, retry_after = take(tokens, cost, rate)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            self._evict(now - capacity / rate)
+        return allowed, retry_after
+
+    def _evict(self, idle_before: float):
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if updated >= idle_before and len(self._buckets) <= self.max_keys:
+                break
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBackend:
+    """
+    Token buckets in a SQLite file, shared by every worker process on the host.
+
+    Each call is one short IMMEDIATE transaction (read, refill, write), so concurrent workers
+    never double-spend a bucket. Idle, fully refilled buckets are deleted every
+    `sweep_interval` seconds.
+    """
+    blocking = True
+
+    def __init__(self, path: str, sweep_interval: float = 60.0):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " key TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated)")
+        logger.info("Rate limit buckets shared through %s", path)
+
+    def take(self, key: str, cost: float, capacity: float, rate: float, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = capacity if row is None else refill(row[0], row[1], now, capacity, rate)
+                allowed, tokens, retry_after = take(tokens, cost, rate)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now)
+                )
+                if now - self._last_sweep >= self.sweep_interval:
+                    self._last_sweep = now
+                    deleted = self._conn.execute(
+                        "DELETE FROM buckets WHERE updated < ?", (now - capacity / rate,)
+                    ).rowcount
+                    logger.debug("Rate limiter evicted %d idle buckets", deleted)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return allowed, retry_after
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter: each key may burst up to `capacity` requests and regains
+    `rate_per_minute` tokens per minute. Routes listed in `route_limits` (path suffix ->
+    (rate per minute, burst)) additionally get a bucket of their own per key, so an expensive
+    call such as a transcription is limited separately without using up the key's budget for
+    everything else. State per key is constant-size; the backend decides whether it is shared
+    between workers.
+    """
+    def __init__(self, backend, rate_per_minute: float, capacity: float,
+                 route_limits: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.backend = backend
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.route_limits = route_limits or {}
+
+    async def _take(self, key: str, capacity: float, rate: float, now: float) -> Tuple[bool, float]:
+        if self.backend.blocking:
+            return await asyncio.to_thread(self.backend.take, key, 1.0, capacity, rate, now)
+        return self.backend.take(key, 1.0, capacity, rate, now)
+
+    async def hit(self, key: str, path: str = "") -> Tuple[bool, int, str]:
+        """
+        Spends a token of `key`'s bucket for a request to `path`, after a token of the route's own
+        bucket if the route has one. Returns (allowed, Retry-After seconds, bucket), where bucket
+        is the route suffix or "default" (a fixed set, usable as a metric label).
+        """
+        now = time.time()
+        for suffix, (rate_per_minute, capacity) in self.route_limits.items():
+            if path.endswith(suffix):
+                allowed, retry_after = await self._take(f"{key}:{suffix}", capacity, rate_per_minute / 60.0, now)
+                if not allowed:
+                    return False, max(1, math.ceil(retry_after)), suffix
+                break
+        allowed, retry_after = await self._take(key, self.capacity, self.rate, now)
+        return allowed, (0 if allowed else max(1, math.ceil(retry_after))), "default"
+
+    @classmethod
+    def from_settings(cls) -> "RateLimiter":
+        if settings.RATE_LIMIT_BACKEND == "sqlite":
+            backend = SQLiteBackend(settings.RATE_LIMIT_SQLITE_PATH)
+        elif settings.RATE_LIMIT_BACKEND == "memory":
+            backend = MemoryBackend(settings.RATE_LIMIT_MAX_KEYS)
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{settings.RATE_LIMIT_BACKEND}'")
+        return cls(backend, settings.RATE_LIMIT_PER_MINUTE, settings.RATE_LIMIT_BURST, settings.RATE_LIMIT_ROUTE_LIMITS)
@@ -0,0 +1,211 @@
+import math
+import time
+import asyncio
+import bisect
+import logging
+import itertools
+from typing import Dict, Optional
+from contextlib import asynccontextmanager
+from app.config import settings
+from app.utils.metrics import SCHEDULER_QUEUE_WAIT, SCHEDULER_REJECTED, SCHEDULER_IN_USE, SCHEDULER_QUEUED
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first. Interactive chat always goes ahead of background work.
+POOL_PRIORITIES = {
+    "interactive": 0,
+    "translation": 1,
+    "ingest": 2,
+    "analytics": 3,
+}
+INTERACTIVE = "interactive"
+
+
+class SchedulerSaturated(Exception):
+    """Raised instead of queueing when a pool's queue is full or the wait would be too long."""
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"LLM scheduler pool '{pool}' is saturated, retry after {retry_after}s")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("pool", "future", "enqueued")
+
+    def __init__(self, pool: str, future: asyncio.Future):
+        self.pool = pool
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+
+class LLMScheduler:
+    """
+    Admission control for calls to the upstream LLM/embedding API.
+
+    All calls share `max_concurrency` upstream slots; each pool (interactive, translation, ingest,
+    analytics) is additionally capped by its own limit. Background pools may never take the last
+    `interactive_reserved` slots, and when a slot frees up it goes to the highest-priority waiter,
+    so chat traffic overtakes queued background work. Each pool's queue is bounded: a caller that
+    would exceed it, or wait longer than `queue_timeout`, gets SchedulerSaturated right away so the
+    endpoint can answer 503 instead of piling up requests behind upstream 429s.
+    """
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        pool_limits: Dict[str, int],
+        queue_limits: Dict[str, int],
+        interactive_reserved: int = 0,
+        queue_timeout: float = 10.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.pool_limits = pool_limits
+        self.queue_limits = queue_limits
+        self.interactive_reserved = interactive_reserved
+        self.queue_timeout = queue_timeout
+        self._in_use_total = 0
+        self._in_use = {pool: 0 for pool in POOL_PRIORITIES}
+        self._queued = {pool: 0 for pool in POOL_PRIORITIES}
+        self._waiters = []  # sorted by (priority, sequence)
+        self._sequence = itertools.count()
+        self._hold_time = {pool: 1.0 for pool in POOL_PRIORITIES}  # moving average of slot hold times
+
+    def _can_admit(self, pool: str) -> bool:
+        if self._in_use[pool] >= self.pool_limits.get(pool, self.max_concurrency):
+            return False
+        limit = self.max_concurrency if pool == INTERACTIVE else self.max_concurrency - self.interactive_reserved
+        return self._in_use_total < limit
+
+    def _has_waiters_ahead(self, pool: str) -> bool:
+        priority = POOL_PRIORITIES[pool]
+        return any(self._queued[other] for other, other_priority in POOL_PRIORITIES.items() if other_priority <= priority)
+
+    def _grant(self, pool: str):
+        self._in_use_total += 1
+        self._in_use[pool] += 1
+        SCHEDULER_IN_USE.labels(self.name, pool).set(self._in_use[pool])
+
+    def _dispatch(self):
+        """Hands free slots to queued waiters in priority order."""
+        index = 0
+        while index < len(self._waiters) and self._in_use_total < self.max_concurrency:
+            waiter = self._waiters[index][2]
+            if waiter.future.done():  # timed out or cancelled while queued
+                self._remove(index)
+                continue
+            if self._can_admit(waiter.pool):
+                self._remove(index)
+                self._grant(waiter.pool)
+                waiter.future.set_result(None)
+                continue
+            index += 1
+
+    def _discard(self, waiter: _Waiter):
+        for index, (_, _, queued) in enumerate(self._waiters):
+            if queued is waiter:
+                self._remove(index)
+                return
+
+    def _remove(self, index: int):
+        waiter = self._waiters.pop(index)[2]
+        self._queued[waiter.pool] -= 1
+        SCHEDULER_QUEUED.labels(self.name, waiter.pool).set(self._queued[waiter.pool])
+
+    def retry_after(self, pool: str) -> int:
+        """Rough seconds until the pool's queue would drain, for the Retry-After header."""
+        capacity = max(1, min(self.pool_limits.get(pool, self.max_concurrency), self.max_concurrency))
+        estimate = self._hold_time[pool] * (self._queued[pool] + 1) / capacity
+        return max(1, min(60, math.ceil(estimate)))
+
+    def _reject(self, pool: str):
+        SCHEDULER_REJECTED.labels(self.name, pool).inc()
+        retry_after = self.retry_after(pool)
+        logger.warning("Scheduler %s rejected a %s call (queued: %d, in use: %d/%d)",
+                       self.name, pool, self._queued[pool], self._in_use_total, self.max_concurrency)
+        raise SchedulerSaturated(pool, retry_after)
+
+    async def acquire(self, pool: str):
+        if pool not in POOL_PRIORITIES:
+            raise ValueError(f"Unknown scheduler pool '{pool}'")
+        if self._can_admit(pool) and not self._has_waiters_ahead(pool):
+            self._grant(pool)
+            SCHEDULER_QUEUE_WAIT.labels(self.name, pool).observe(0.0)
+            return
+        if self._queued[pool] >= self.queue_limits.get(pool, 0):
+            self._reject(pool)
+
+        waiter = _Waiter(pool, asyncio.get_running_loop().create_future())
+        bisect.insort(self._waiters, (POOL_PRIORITIES[pool], next(self._sequence), waiter))
+        self._queued[pool] += 1
+        SCHEDULER_QUEUED.labels(self.name, pool).set(self._queued[pool])
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self._reject(pool)
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(pool)  # granted just as the caller went away
+            else:
+                self._discard(waiter)
+            raise
+        finally:
+            SCHEDULER_QUEUE_WAIT.labels(self.name, pool).observe(time.perf_counter() - waiter.enqueued)
+
+    def release(self, pool: str, held: Optional[float] = None):
+        self._in_use_total -= 1
+        self._in_use[pool] -= 1
+        SCHEDULER_IN_USE.labels(self.name, pool).set(self._in_use[pool])
+        if held is not None:
+            self._hold_time[pool] = 0.8 * self._hold_time[pool] + 0.2 * held
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, pool: str):
+        await self.acquire(pool)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(pool, time.perf_counter() - started)
+
+    async def run(self, pool: str, func, *args, **kwargs):
+        """Awaits func(*args, **kwargs) while holding a slot in `pool`."""
+        async with self.slot(pool):
+            return await func(*args, **kwargs)
+
+    async def gather(self, pool: str, func, items) -> list:
+        """
+        Runs func(item) for every item, each call holding its own slot in `pool`. If any call
+        fails (e.g. is rejected), the calls still queued or running are cancelled instead of
+        spending upstream capacity on a response that can no longer be sent.
+        """
+        tasks = [asyncio.ensure_future(self.run(pool, func, item)) for item in items]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "in_use": self._in_use_total,
+            "max_concurrency": self.max_concurrency,
+            "pools": {
+                pool: {"in_use": self._in_use[pool], "queued": self._queued[pool], "limit": self.pool_limits.get(pool)}
+                for pool in POOL_PRIORITIES
+            },
+        }
+
+    @classmethod
+    def from_settings(cls, name: str) -> "LLMScheduler":
+        return cls(
+            name=name,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            pool_limits=settings.LLM_POOL_LIMITS,
+            queue_limits=settings.LLM_QUEUE_LIMITS,
+            interactive_reserved=settings.LLM_INTERACTIVE_RESERVED,
+            queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+        )
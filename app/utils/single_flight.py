@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class _SharedStream:
+    """Tokens produced so far by one upstream generation, plus a wake-up signal for readers."""
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        await self._changed.wait()
+
+
+class StreamCoalescer:
+    """
+    Single-flight coalescing for token streams.
+
+    The first subscriber for a key starts the upstream generator in a background task; every
+    subscriber that arrives while it is in flight reads the same tokens. Each subscriber keeps its
+    own read position over the shared token list, so a late joiner first receives the prefix that
+    was already produced and then live tokens, and a slow client never holds back the others.
+    When the last subscriber leaves before the stream is done, the upstream task is cancelled.
+    """
+    def __init__(self):
+        self._inflight = {}
+        self.started = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Key under which identical questions are coalesced (case and whitespace insensitive)."""
+        return " ".join(query.lower().split())
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def subscribe(self, key: str, producer_factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        stream = self._inflight.get(key)
+        if stream is None:
+            stream = _SharedStream()
+            self._inflight[key] = stream
+            stream.task = asyncio.create_task(self._pump(key, stream, producer_factory()))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.debug("Coalesced onto in-flight stream for '%s' (%d tokens already produced)", key, len(stream.tokens))
+
+        stream.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(stream.tokens):
+                    token = stream.tokens[position]
+                    position += 1
+                    yield token
+                elif stream.done:
+                    if stream.error is not None:
+                        raise stream.error
+                    break
+                else:
+                    await stream.wait()
+        finally:
+            stream.subscribers -= 1
+            if stream.subscribers == 0 and not stream.done:
+                # Nobody is listening any more: stop the generation instead of running it to the end
+                if self._inflight.get(key) is stream:
+                    del self._inflight[key]
+                stream.task.cancel()
+                self.cancelled += 1
+                logger.debug("Cancelled in-flight stream for '%s' after its last subscriber left", key)
+
+    async def _pump(self, key: str, stream: _SharedStream, producer: AsyncIterator[str]):
+        try:
+            async for token in producer:
+                stream.tokens.append(token)
+                stream.notify()
+        except Exception as e:
+            logger.error("Upstream stream for '%s' failed: %s", key, e)
+            stream.error = e
+        finally:
+            stream.done = True
+            stream.notify()
+            if self._inflight.get(key) is stream:
+                del self._inflight[key]
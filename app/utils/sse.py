@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from typing import AsyncIterator
+from fastapi import Request
+from app.utils.metrics import STREAMS
+from app.utils.scheduler import SchedulerSaturated
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+async def coalesce_tokens(tokens: AsyncIterator[str], flush_interval: float, flush_bytes: int) -> AsyncIterator[str]:
+    """
+    Re-chunks a token stream into fewer, larger pieces of text.
+
+    The first token is passed through immediately (so time-to-first-token is unchanged); after
+    that, tokens are accumulated and flushed once `flush_interval` seconds have passed since the
+    oldest buffered token or the buffer reaches `flush_bytes` UTF-8 bytes, whichever comes first.
+    The source is consumed by a separate task so a quiet upstream never holds back buffered text.
+    """
+    queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for token in tokens:
+                queue.put_nowait(token)
+        except Exception as e:
+            queue.put_nowait(e)
+        finally:
+            queue.put_nowait(_END)
+
+    pump_task = asyncio.create_task(pump())
+    loop = asyncio.get_running_loop()
+    buffer = []
+    buffered_bytes = 0
+    deadline = None
+    first = True
+    try:
+        while True:
+            if not buffer:
+                item = await queue.get()
+            elif not queue.empty():
+                item = queue.get_nowait()
+            else:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    item = None
+
+            if item is None or item is _END or isinstance(item, Exception):
+                if buffer:
+                    yield "".join(buffer)
+                    buffer, buffered_bytes, deadline = [], 0, None
+                if item is None:
+                    continue
+                if item is _END:
+                    break
+                raise item
+
+            buffer.append(item)
+            buffered_bytes += len(item.encode("utf-8"))
+            if first or buffered_bytes >= flush_bytes:
+                first = False
+                yield "".join(buffer)
+                buffer, buffered_bytes, deadline = [], 0, None
+            elif deadline is None:
+                deadline = loop.time() + flush_interval
+    finally:
+        if not pump_task.done():
+            # Cancelling the pump cancels the source stream (and so the upstream generation)
+            pump_task.cancel()
+            await asyncio.wait({pump_task})
+
+
+async def close_on_disconnect(request: Request, frames: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Passes SSE frames through until the client disconnects, then closes the frame generator.
+
+    Uvicorn silently drops writes to a closed connection, so without this check an abandoned
+    answer would be generated (and paid for) to the end. The disconnect check runs before every
+    frame; closing `frames` propagates down to the provider and the LLM stream.
+    Counts streams by how they ended: completed, cancelled, rejected (scheduler saturated) or errored.
+    """
+    status = "completed"
+    try:
+        async for frame in frames:
+            if await request.is_disconnected():
+                status = "cancelled"
+                logger.debug("Client disconnected from %s, cancelling the stream", request.url.path)
+                break
+            yield frame
+    except (GeneratorExit, asyncio.CancelledError):
+        status = "cancelled"
+        raise
+    except SchedulerSaturated:
+        status = "rejected"
+        raise
+    except Exception:
+        status = "errored"
+        raise
+    finally:
+        await frames.aclose()
+        STREAMS.labels(status).inc()
+
+
+async def prefetch_first(frames: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Waits for the first frame before the response is started, so errors raised before anything
+    is streamed (e.g. SchedulerSaturated) can still be answered with a proper status code.
+    Returns an iterator that replays the first frame and then continues with the rest.
+    """
+    try:
+        first = await frames.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def replay():
+        try:
+            if first is not None:
+                yield first
+                async for frame in frames:
+                    yield frame
+        finally:
+            await frames.aclose()
+
+    return replay()
@@ -0,0 +1,75 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StaleWhileRevalidate:
+    """
+    Async cache for a single value that is expensive to load (e.g. the FAQ list).
+
+    - Fresh (younger than `ttl`): returned as is.
+    - Stale: returned immediately while one background refresh runs.
+    - Never loaded: the first caller loads it and concurrent callers await the same load.
+
+    Only one load runs at a time (single flight). A failed refresh keeps serving the last good
+    value and is retried after `retry_interval` seconds, so an outage of the backing store
+    neither stalls readers nor turns into a retry storm. The same holds before the first
+    successful load: until the retry is due, callers get the last error instead of a new load.
+    """
+    def __init__(self, loader: Callable[[], Awaitable[Any]], ttl: float, retry_interval: float = 30.0, name: str = "value"):
+        self.loader = loader
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.name = name
+        self.value = None
+        self.loaded_at: Optional[float] = None
+        self._retry_at = 0.0
+        self._last_error: Optional[Exception] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    async def _refresh(self):
+        try:
+            value = await self.loader()
+        except Exception as e:
+            self.failures += 1
+            self._last_error = e
+            self._retry_at = time.monotonic() + self.retry_interval
+            if self.loaded_at is None:
+                raise
+            logger.warning("Refreshing %s failed, serving the cached value: %s", self.name, e)
+            return
+        self.value = value
+        self.loaded_at = time.monotonic()
+        self._last_error = None
+        self.refreshes += 1
+        logger.debug("Refreshed %s", self.name)
+
+    async def get(self):
+        if self.loaded_at is None:
+            refreshing = self._refresh_task is not None and not self._refresh_task.done()
+            if not refreshing and self._last_error is not None and time.monotonic() < self._retry_at:
+                # Drop the previous traceback so repeated raises do not keep growing it
+                raise self._last_error.with_traceback(None)
+            # shield: a caller that goes away must not cancel the load other callers wait for
+            await asyncio.shield(self._start_refresh())
+            return self.value
+        now = time.monotonic()
+        if now - self.loaded_at >= self.ttl and now >= self._retry_at:
+            self._start_refresh()
+        return self.value
+
+    def invalidate(self):
+        """Marks the value stale; the next get() still returns it and triggers a refresh."""
+        if self.loaded_at is not None:
+            self.loaded_at = float("-inf")
+        self._retry_at = 0.0
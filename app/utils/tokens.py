@@ -0,0 +1,43 @@
+import logging
+from functools import lru_cache
+import tiktoken
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used only when no tokenizer can be loaded
+APPROX_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str = settings.OPENAI_API_CHAT_MODEL_NAME):
+    """
+    Returns the tiktoken encoding for a model, or None if it cannot be loaded
+    (tiktoken downloads encodings on first use, which fails on offline hosts).
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("Could not load tokenizer for %s, approximating token counts: %s", model_name, e)
+        return None
+
+
+def count_tokens(text: str, model_name: str = settings.OPENAI_API_CHAT_MODEL_NAME) -> int:
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return (len(text) + APPROX_CHARS_PER_TOKEN - 1) // APPROX_CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str = settings.OPENAI_API_CHAT_MODEL_NAME) -> str:
+    """Returns the longest prefix of text that fits in max_tokens."""
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return text[: max_tokens * APPROX_CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
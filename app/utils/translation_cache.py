@@ -0,0 +1,145 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UnsupportedLanguage(ValueError):
+    """A translation target outside FAQ_TRANSLATION_LANGUAGES (answered with 400)."""
+
+
+def translation_language(lang: str) -> str:
+    """
+    Normalizes a requested FAQ language and checks it is "en" or one of FAQ_TRANSLATION_LANGUAGES.
+    Only those languages get a cache entry, a lock and LLM calls.
+    """
+    lang = lang.strip().lower()
+    if lang != "en" and lang not in settings.FAQ_TRANSLATION_LANGUAGES:
+        raise UnsupportedLanguage(f"Unsupported language '{lang}'")
+    return lang
+
+
+def faq_key(text: str) -> str:
+    """Content hash of one source FAQ; a translation is reused only while its source is unchanged."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def faqs_digest(texts: List[str]) -> str:
+    return hashlib.sha256("\0".join(texts).encode("utf-8")).hexdigest()
+
+
+class FaqTranslationCache:
+    """
+    Per-language FAQ translations keyed by a content hash of each source FAQ, persisted as JSON.
+
+    A request for a language whose FAQ list was already translated is answered from an
+    in-memory snapshot (one hash of the source list, no LLM calls). Otherwise only FAQs whose
+    source text is new or changed are sent to the translator, one translation per language at a
+    time so concurrent requests for the same language wait for the first one instead of
+    repeating it. Translations of FAQs that no longer exist are dropped.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._translations: Dict[str, Dict[str, str]] = {}  # lang -> {faq key: translation}
+        self._snapshots: Dict[str, Tuple[str, List[str]]] = {}  # lang -> (source digest, translated list)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._file_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.translated = 0
+
+    def load(self):
+        """Loads persisted translations, if the cache has a path and the file exists."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable FAQ translation cache %s: %s", self.path, e)
+            return
+        self._translations = stored.get("languages", {})
+        logger.info("Loaded FAQ translations for %d languages from %s", len(self._translations), self.path)
+
+    def save(self):
+        """Persists the translations (atomically) if the cache has a path."""
+        if not self.path:
+            return
+        data = {"languages": {lang: dict(entries) for lang, entries in self._translations.items()}}
+        with self._file_lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # A unique temp file in the same directory, so concurrent writers (threads or worker
+            # processes sharing the path) never interleave and os.replace stays atomic
+            fd, tmp_path = tempfile.mkstemp(dir=directory or None, prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def get(self, lang: str, faq_texts: List[str]) -> Optional[List[str]]:
+        """Returns the translated list if every FAQ in `faq_texts` is already translated."""
+        snapshot = self._snapshots.get(lang)
+        if snapshot is not None and snapshot[0] == faqs_digest(faq_texts):
+            self.hits += 1
+            return snapshot[1]
+        return None
+
+    async def translate(
+        self,
+        lang: str,
+        faq_texts: List[str],
+        translate_missing: Callable[[List[str], str], Awaitable[List[str]]],
+    ) -> List[str]:
+        """
+        Returns `faq_texts` translated to `lang`, calling translate_missing(texts, lang) only for
+        FAQs without a stored translation. The result is persisted before it is returned.
+        """
+        cached = self.get(lang, faq_texts)
+        if cached is not None:
+            return cached
+
+        async with self._locks.setdefault(lang, asyncio.Lock()):
+            # Another request may have translated this language while we waited
+            cached = self.get(lang, faq_texts)
+            if cached is not None:
+                return cached
+            self.misses += 1
+
+            stored = self._translations.get(lang, {})
+            keys = [faq_key(text) for text in faq_texts]
+            missing = [text for text, key in zip(faq_texts, keys) if key not in stored]
+            fresh = {}
+            if missing:
+                translations = await translate_missing(missing, lang)
+                fresh = {faq_key(text): translation for text, translation in zip(missing, translations)}
+                self.translated += len(missing)
+                logger.info("Translated %d new or changed FAQs to '%s'", len(missing), lang)
+
+            # Keep only translations of the current FAQs
+            entries = {key: fresh.get(key, stored.get(key)) for key in keys}
+            translated = [entries[key] for key in keys]
+            self._translations[lang] = entries
+            self._snapshots[lang] = (faqs_digest(faq_texts), translated)
+            if missing or len(stored) != len(entries):
+                await asyncio.to_thread(self.save)
+            return translated
+
+    def stats(self) -> dict:
+        return {
+            "languages": len(self._translations),
+            "hits": self.hits,
+            "misses": self.misses,
+            "translated": self.translated,
+        }
@@ -0,0 +1,155 @@
+import time
+import asyncio
+import logging
+from typing import Callable, List, Optional
+from app.utils.metrics import INGEST_WRITE_RETRIES
+from app.utils.scheduler import SchedulerSaturated
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBatch:
+    def __init__(self):
+        self.docs = []
+        self.keys = []
+        self.tokens = 0
+
+
+class WritePipeline:
+    """
+    Ingestion write path: embeds chunks in batches and bulk inserts them, overlapping the two.
+
+    Chunks added with add() are grouped into batches of at most `batch_tokens` embedding tokens
+    and `batch_size` chunks. Up to `embed_concurrency` batches are embedded at once while the
+    embedded batches are inserted one at a time, in order, so batch N is inserted while batch
+    N+1 embeds (double buffering). add() waits when that many batches are in flight, which keeps
+    memory bounded. A failed embedding or insert is retried for its batch alone; before an
+    insert is retried, writer.discard(docs, keep_ids) removes whatever the failed attempt may
+    have left behind, so retries are idempotent. on_inserted(docs, ids), a coroutine function,
+    is awaited after each insert. Call close() to flush and wait; it raises the first batch that failed for good.
+
+    `writer` provides embed(texts), insert(docs, vectors, keys) and discard(docs, keep_ids)
+    (see app/chains/ingest_writers.py); all three are blocking and run in threads.
+    """
+    def __init__(self, writer, on_inserted: Callable, scheduler=None,
+                 batch_tokens: int = 32000, batch_size: int = 64, embed_concurrency: int = 2,
+                 retries: int = 3, retry_backoff: float = 1.0):
+        self.writer = writer
+        self.on_inserted = on_inserted
+        self.scheduler = scheduler
+        self.batch_tokens = batch_tokens
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.stats = {"batches": 0, "retries": 0, "embed_s": 0.0, "insert_s": 0.0}
+        # Ids inserted by this pipeline. discard() only matches rows of this ingest run, so
+        # ids from earlier runs of the source would only lengthen its filter
+        self._inserted_ids = []
+        self._batch = WriteBatch()
+        # One slot per batch being embedded, plus the one being inserted
+        self._slots = asyncio.Semaphore(embed_concurrency + 1)
+        self._embedded = asyncio.Queue()
+        self._error: Optional[BaseException] = None
+        self._inserter = asyncio.ensure_future(self._insert_loop())
+
+    async def add(self, doc, tokens: int, key: str):
+        if self._batch.docs and (self._batch.tokens + tokens > self.batch_tokens or len(self._batch.docs) >= self.batch_size):
+            await self._flush()
+        self._batch.docs.append(doc)
+        self._batch.keys.append(key)
+        self._batch.tokens += tokens
+
+    async def close(self):
+        """Embeds and inserts what is left and waits for every batch."""
+        try:
+            if self._batch.docs:
+                await self._flush()
+        finally:
+            self._embedded.put_nowait(None)
+            await self._inserter
+        if self._error is not None:
+            raise self._error
+
+    def cancel(self):
+        """Abandons the batches in flight (e.g. the chunk source failed)."""
+        self._inserter.cancel()
+        while not self._embedded.empty():
+            item = self._embedded.get_nowait()
+            if item is not None:
+                item[1].cancel()
+
+    async def _flush(self):
+        batch, self._batch = self._batch, WriteBatch()
+        await self._slots.acquire()
+        if self._error is not None:
+            self._slots.release()
+            raise self._error
+        self._embedded.put_nowait((batch, asyncio.ensure_future(self._embed(batch))))
+
+    async def _embed(self, batch: WriteBatch) -> List[List[float]]:
+        texts = [doc.page_content for doc in batch.docs]
+
+        async def embed():
+            if self.scheduler is None:
+                return await asyncio.to_thread(self.writer.embed, texts)
+            return await self.scheduler.run("ingest", asyncio.to_thread, self.writer.embed, texts)
+
+        started = time.perf_counter()
+        vectors = await self._retry("embed", embed)
+        self.stats["embed_s"] += time.perf_counter() - started
+        return vectors
+
+    async def _insert(self, batch: WriteBatch, vectors) -> list:
+        attempts = 0
+
+        async def insert():
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                # The failed attempt may have written some rows; drop those we do not know about
+                await asyncio.to_thread(self.writer.discard, batch.docs, list(self._inserted_ids))
+            return await asyncio.to_thread(self.writer.insert, batch.docs, vectors, batch.keys)
+
+        started = time.perf_counter()
+        ids = await self._retry("insert", insert)
+        self.stats["insert_s"] += time.perf_counter() - started
+        return ids
+
+    async def _retry(self, stage: str, func):
+        for attempt in range(self.retries + 1):
+            try:
+                return await func()
+            except SchedulerSaturated:
+                # Not a failure of this batch: the caller decides when to try again
+                raise
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                logger.warning("Ingest %s batch failed (attempt %d), retrying in %.1fs: %s", stage, attempt + 1, delay, e)
+                self.stats["retries"] += 1
+                INGEST_WRITE_RETRIES.labels(stage).inc()
+                await asyncio.sleep(delay)
+
+    async def _insert_loop(self):
+        while True:
+            item = await self._embedded.get()
+            if item is None:
+                return
+            batch, embedding = item
+            try:
+                if self._error is not None:
+                    # A batch failed for good: drain the rest without writing it
+                    embedding.cancel()
+                    if embedding.done() and not embedding.cancelled():
+                        embedding.exception()
+                    continue
+                vectors = await embedding
+                ids = await self._insert(batch, vectors)
+                self._inserted_ids.extend(ids)
+                self.stats["batches"] += 1
+                await self.on_inserted(batch.docs, ids)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._slots.release()
@@ -0,0 +1,136 @@
+import time
+import random
+import asyncio
+import logging
+from typing import Optional
+import httpx
+from app.config import settings
+from app.utils.metrics import ZILLIZ_REQUEST_LATENCY, ZILLIZ_RETRIES
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class ZillizError(RuntimeError):
+    """Raised when Zilliz answers a request with a non-zero error code."""
+    def __init__(self, endpoint: str, code, message: str):
+        super().__init__(f"Zilliz {endpoint} failed with code {code}: {message}")
+        self.endpoint = endpoint
+        self.code = code
+
+
+class ZillizRestClient:
+    """
+    Shared async client for the Zilliz Cloud REST API (/v2/vectordb/...).
+
+    One httpx.AsyncClient per process keeps TLS connections alive between calls (optionally
+    over HTTP/2). Requests that fail with 429/5xx or a transport error are retried up to
+    `max_retries` times with full-jitter exponential backoff, honouring Retry-After up to
+    `max_retry_delay` seconds (the request timeout by default); a longer Retry-After falls back
+    to the backoff, so one 429 cannot stall a caller for minutes. Latency is
+    recorded per endpoint. Created in the app lifespan and closed on shutdown.
+    """
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 20,
+        http2: bool = False,
+        max_retries: int = 3,
+        backoff: float = 0.25,
+        max_retry_delay: Optional[float] = None,
+    ):
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("ZILLIZ_HTTP2 is set but the 'h2' package is missing; using HTTP/1.1")
+                http2 = False
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_delay = timeout if max_retry_delay is None else max_retry_delay
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/") + "/v2/vectordb/",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            http2=http2,
+        )
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after and retry_after.isdigit() and float(retry_after) <= self.max_retry_delay:
+                return float(retry_after)
+        return random.uniform(0, min(self.backoff * (2 ** attempt), self.max_retry_delay))
+
+    async def post(self, endpoint: str, payload: dict) -> dict:
+        """
+        POSTs `payload` to e.g. "entities/query" and returns the decoded JSON body.
+        Raises httpx.HTTPStatusError for HTTP errors and ZillizError for Zilliz error codes.
+        """
+        attempt = 0
+        while True:
+            response = None
+            started = time.perf_counter()
+            try:
+                response = await self._client.post(endpoint, json=payload)
+                retryable = response.status_code in RETRY_STATUS_CODES
+            except httpx.TransportError as e:
+                retryable = True
+                error = e
+            finally:
+                ZILLIZ_REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+
+            if not retryable or attempt >= self.max_retries:
+                if response is None:
+                    raise error
+                break
+            delay = self._retry_delay(attempt, response)
+            attempt += 1
+            ZILLIZ_RETRIES.labels(endpoint).inc()
+            logger.warning("Zilliz %s %s, retry %d/%d in %.2fs", endpoint,
+                           response.status_code if response is not None else error, attempt, self.max_retries, delay)
+            await asyncio.sleep(delay)
+
+        response.raise_for_status()
+        result = response.json()
+        if result.get("code", 0) != 0:
+            raise ZillizError(endpoint, result.get("code"), result.get("message", ""))
+        return result
+
+    async def query(self, collection: str, output_fields: list, filter: str = "", limit: Optional[int] = None) -> list:
+        payload = {"collectionName": collection, "outputFields": output_fields}
+        if filter:
+            payload["filter"] = filter
+        if limit is not None:
+            payload["limit"] = limit
+        return (await self.post("entities/query", payload)).get("data", [])
+
+    async def search(self, payload: dict) -> list:
+        return (await self.post("entities/search", payload)).get("data", [])
+
+    async def delete(self, collection: str, filter: str) -> dict:
+        return await self.post("entities/delete", {"collectionName": collection, "filter": filter})
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    @classmethod
+    def from_settings(cls) -> "ZillizRestClient":
+        return cls(
+            settings.ZILLIZ_URL,
+            settings.ZILLIZ_AUTH_TOKEN,
+            timeout=settings.ZILLIZ_TIMEOUT,
+            connect_timeout=settings.ZILLIZ_CONNECT_TIMEOUT,
+            max_connections=settings.ZILLIZ_MAX_CONNECTIONS,
+            http2=settings.ZILLIZ_HTTP2,
+            max_retries=settings.ZILLIZ_MAX_RETRIES,
+        )
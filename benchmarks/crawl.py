@@ -0,0 +1,200 @@
+"""
+Offline benchmark for site ingestion (POST /ingest_site): the crawler plus the ingestion chain.
+
+A static site is generated into a temp directory and served by a local threaded HTTP server
+with a configurable response latency: a sitemap index pointing at a plain and a gzipped
+sitemap, a robots.txt that disallows /private/, "print" copies of some pages that declare the
+original as <link rel="canonical">, and a directory URL that redirects to its trailing-slash
+form. Pages are split across two host names of the same server (127.0.0.1 and localhost) so
+the per-host limits can be observed. Chunks are embedded with deterministic fake embeddings
+into an in-process LocalVectorStore, so no network access or API keys are needed.
+
+Reports pages/s, page counts (ingested, duplicates, failed), the peak number of concurrent
+requests the server saw per host, and runs the crawl a second time to show that unchanged
+pages are skipped by the ingest manifest.
+
+Usage (from the repository root):
+    python -m benchmarks.crawl --pages 400 --latency-ms 50
+    python -m benchmarks.crawl --concurrency 16 --per-host-concurrency 4 --per-host-delay 0
+"""
+import os
+import gzip
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from functools import partial
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from benchmarks.fakes import WORDS
+
+HOSTS = ("127.0.0.1", "localhost")
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+class ConcurrencyTracker:
+    """Counts the requests in flight per Host header and keeps the peak of each."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.requests = 0
+
+    def enter(self, host: str):
+        with self.lock:
+            self.requests += 1
+            self.current[host] += 1
+            self.peak[host] = max(self.peak[host], self.current[host])
+
+    def leave(self, host: str):
+        with self.lock:
+            self.current[host] -= 1
+
+
+def make_handler(directory: str, latency: float, tracker: ConcurrencyTracker):
+    class Handler(SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            host = (self.headers.get("Host") or "").split(":")[0]
+            tracker.enter(host)
+            try:
+                if latency:
+                    time.sleep(latency)
+                super().do_GET()
+            finally:
+                tracker.leave(host)
+
+        def log_message(self, format, *args):
+            pass
+
+    return partial(Handler, directory=directory)
+
+
+def page_html(index: int, words: int, canonical: str = "") -> str:
+    body = " ".join(WORDS[(index * 7 + offset) % len(WORDS)] for offset in range(words))
+    link = f'<link rel="canonical" href="{canonical}">' if canonical else ""
+    return (f"<html><head><meta charset=\"utf-8\"><title>Page {index}</title>{link}</head>"
+            f"<body><h1>Page {index}</h1><p>Page {index}: {body}</p></body></html>")
+
+
+def urlset(urls) -> bytes:
+    entries = "".join(f"<url><loc>{url}</loc></url>" for url in urls)
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_NS}">{entries}</urlset>'.encode("utf-8")
+
+
+def build_site(root: str, base_urls, args) -> dict:
+    """Writes the static site and returns what the crawl is expected to find."""
+    os.makedirs(os.path.join(root, "pages"))
+    os.makedirs(os.path.join(root, "private"))
+    os.makedirs(os.path.join(root, "section"))
+    listed = []
+    for index in range(args.pages):
+        base = base_urls[index % len(base_urls)]
+        with open(os.path.join(root, "pages", f"page-{index}.html"), "w") as f:
+            f.write(page_html(index, args.words))
+        listed.append(f"{base}/pages/page-{index}.html")
+    duplicates = 0
+    for index in range(0, args.pages, 10):
+        base = base_urls[index % len(base_urls)]
+        with open(os.path.join(root, "pages", f"page-{index}-print.html"), "w") as f:
+            f.write(page_html(index, args.words, canonical=f"{base}/pages/page-{index}.html"))
+        listed.append(f"{base}/pages/page-{index}-print.html")
+        duplicates += 1
+    for index in range(args.private_pages):
+        with open(os.path.join(root, "private", f"page-{index}.html"), "w") as f:
+            f.write(page_html(index, args.words))
+        listed.append(f"{base_urls[0]}/private/page-{index}.html")
+    with open(os.path.join(root, "section", "index.html"), "w") as f:
+        f.write(page_html(args.pages, args.words))
+    with open(os.path.join(root, "robots.txt"), "w") as f:
+        f.write("User-agent: *\nDisallow: /private/\n")
+
+    half = len(listed) // 2
+    with open(os.path.join(root, "sitemap-1.xml"), "wb") as f:
+        f.write(urlset(listed[:half]))
+    with open(os.path.join(root, "sitemap-2.xml.gz"), "wb") as f:
+        f.write(gzip.compress(urlset(listed[half:])))
+    index = "".join(f"<sitemap><loc>{base_urls[0]}/{name}</loc></sitemap>" for name in ("sitemap-1.xml", "sitemap-2.xml.gz"))
+    with open(os.path.join(root, "sitemap.xml"), "wb") as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="{SITEMAP_NS}">{index}</sitemapindex>'.encode("utf-8"))
+
+    return {
+        "sitemaps": [f"{base_urls[0]}/sitemap.xml"],
+        # The directory URL redirects to /section/, which is also listed
+        "urls": [f"{base_urls[0]}/section", f"{base_urls[0]}/section/"],
+        "expected_ingested": args.pages + 1,
+        "expected_duplicates": duplicates + 1,
+        "expected_failed": args.private_pages,
+    }
+
+
+async def run(args, site: dict) -> list:
+    from app.config import settings
+    from app.chains import initialize_ingest_chain, KeyedIngestWriter
+    from app.chains.vector_store_local import LocalVectorStore
+    from app.utils.ingest_manifest import IngestManifest
+    from benchmarks.fakes import FakeEmbeddings
+
+    settings.CRAWL_CONCURRENCY = args.concurrency
+    settings.CRAWL_PER_HOST_CONCURRENCY = args.per_host_concurrency
+    settings.CRAWL_PER_HOST_DELAY = args.per_host_delay
+    settings.CRAWL_INGEST_CONCURRENCY = args.ingest_concurrency
+    settings.CRAWL_MAX_PAGES = args.pages * 2 + args.private_pages + 10
+
+    embeddings = FakeEmbeddings(dim=args.embedding_dim, latency=args.embed_latency_ms / 1000.0)
+    vector_store = LocalVectorStore(embedding_function=embeddings, collection_name="crawl_bench")
+    chain = await initialize_ingest_chain(vector_store, manifest=IngestManifest(),
+                                          writer=KeyedIngestWriter(vector_store, embeddings))
+    results = []
+    for _ in range(2):
+        started = time.perf_counter()
+        result = await chain.ingest_site(site["urls"], site["sitemaps"])
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="distinct pages on the site")
+    parser.add_argument("--private-pages", type=int, default=5, help="listed pages disallowed by robots.txt")
+    parser.add_argument("--words", type=int, default=400, help="words per page")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="server response latency")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--per-host-concurrency", type=int, default=2)
+    parser.add_argument("--per-host-delay", type=float, default=0.0)
+    parser.add_argument("--ingest-concurrency", type=int, default=4)
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    tracker = ConcurrencyTracker()
+    with tempfile.TemporaryDirectory(prefix="crawl-bench-") as root:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(root, args.latency_ms / 1000.0, tracker))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_urls = [f"http://{host}:{server.server_port}" for host in HOSTS]
+        site = build_site(root, base_urls, args)
+        try:
+            first, second = asyncio.run(run(args, site))
+        finally:
+            server.shutdown()
+
+    report = {
+        "pages_per_s": first["pages_per_s"],
+        "seconds": first["seconds"],
+        "server_requests": tracker.requests,
+        "peak_concurrent_requests_per_host": dict(tracker.peak),
+        "first_run": {key: first[key] for key in ("pages", "fetched", "ingested", "duplicates", "failed", "chunks", "inserted")},
+        "second_run": {key: second[key] for key in ("ingested", "inserted", "skipped")},
+        "expected": {key: site[key] for key in ("expected_ingested", "expected_duplicates", "expected_failed")},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Stand-ins for the external services the QA path talks to, used only by the benchmarks:
+  - FakeStreamingChatModel: a chat model with a configurable time-to-first-token and token rate
+  - FakeEmbeddings: deterministic, hash-seeded embeddings with a configurable latency
+  - FakeOpenAIClient: the slice of the OpenAI client used by ZillizProvider.search_data
+  - create_fake_zilliz_app: the Zilliz REST endpoints (/v2/vectordb/entities/query|search|delete)
+"""
+import time
+import asyncio
+import hashlib
+import random
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from fastapi import FastAPI, Request
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+WORDS = (
+    "the university offers advising tutoring housing parking financial aid scholarships "
+    "registration deadlines library hours campus dining transcripts enrollment courses"
+).split()
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Streams `response_tokens` word tokens after waiting `ttft` seconds, then one token every
+    1 / tokens_per_second seconds. A newline is emitted every `newline_every` tokens so the SSE
+    newline framing is exercised too. Non-streaming calls echo the last message.
+    """
+    ttft: float = 0.3
+    tokens_per_second: float = 50.0
+    response_tokens: int = 120
+    newline_every: int = 25
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming-chat"
+
+    def _token(self, index: int) -> str:
+        if self.newline_every and index and index % self.newline_every == 0:
+            return "\n"
+        return WORDS[index % len(WORDS)] + " "
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = str(messages[-1].content) if messages else ""
+        time.sleep(self.ttft + len(content.split()) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.ttft)
+        for index in range(self.response_tokens):
+            if index:
+                time.sleep(1.0 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=self._token(index)))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.ttft)
+        for index in range(self.response_tokens):
+            if index:
+                await asyncio.sleep(1.0 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=self._token(index)))
+
+
+class FakeEmbeddings(Embeddings):
+    """Unit vectors seeded from a hash of the text, so equal texts always embed identically."""
+    def __init__(self, dim: int = 256, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._vector(text)
+
+
+class FakeOpenAIClient:
+    """Implements client.embeddings.create(input=..., model=...) on top of FakeEmbeddings."""
+    def __init__(self, embeddings: FakeEmbeddings):
+        def create(input, model=None, **kwargs):
+            texts = [input] if isinstance(input, str) else list(input)
+            vectors = embeddings.embed_documents(texts)
+            return SimpleNamespace(data=[SimpleNamespace(embedding=vector) for vector in vectors])
+        self.embeddings = SimpleNamespace(create=create)
+
+
+def create_fake_zilliz_app(faqs: List[str], latency: float = 0.0, search_days: int = 14) -> FastAPI:
+    """
+    FastAPI app answering the Zilliz REST calls the providers make, after `latency` seconds.
+    Searches return `limit` user queries with timestamps spread over the last `search_days` days.
+    """
+    app = FastAPI()
+    now = int(time.time())
+
+    async def respond(data):
+        if latency:
+            await asyncio.sleep(latency)
+        return {"code": 0, "data": data}
+
+    @app.post("/v2/vectordb/entities/query")
+    async def query(request: Request):
+        body = await request.json()
+        fields = body.get("outputFields") or ["faq"]
+        return await respond([{field: faq for field in fields} for faq in faqs])
+
+    @app.post("/v2/vectordb/entities/search")
+    async def search(request: Request):
+        body = await request.json()
+        rng = random.Random(str(body.get("data"))[:64])
+        limit = int(body.get("limit", 100))
+        return await respond([
+            {"pk": index, "distance": 0.9, "timestamp": now - rng.randrange(search_days * 86400)}
+            for index in range(limit)
+        ])
+
+    @app.post("/v2/vectordb/entities/delete")
+    async def delete(request: Request):
+        return await respond({})
+
+    return app
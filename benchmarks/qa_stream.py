@@ -0,0 +1,404 @@
+"""
+Offline benchmark for the QA streaming path and the other hot /wsu/api endpoints.
+
+The FastAPI app is booted in a child process with its lifespan replaced: the Zilliz provider
+is built on an in-process LocalVectorStore with deterministic fake embeddings, a fake streaming
+chat model (configurable TTFT and token rate) and a local fake of the Zilliz REST endpoints, so
+no network access or API keys are needed. The parent process drives the endpoints over real
+sockets at a fixed concurrency and reports throughput, p50/p95/p99 time-to-first-byte (TTFT),
+total latency and server RSS growth per open connection.
+
+Usage (from the repository root):
+    python -m benchmarks.qa_stream --concurrency 32 --requests 256
+    python -m benchmarks.qa_stream --save-baseline benchmarks/baseline.json
+    python -m benchmarks.qa_stream --compare benchmarks/baseline.json
+
+--compare exits with status 1 when a metric regressed by more than --threshold percent.
+"""
+import os
+import sys
+import math
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import threading
+import subprocess
+from contextlib import asynccontextmanager
+from typing import Callable, List, Optional
+
+import httpx
+
+SCENARIOS = ("qa_stream", "faqs", "faqs_translate", "data_search")
+
+# Metrics compared against a baseline, and whether lower values are better
+COMPARED_METRICS = {
+    "throughput_rps": False,
+    "ttft_p50_ms": True,
+    "ttft_p95_ms": True,
+    "ttft_p99_ms": True,
+    "latency_p50_ms": True,
+    "latency_p99_ms": True,
+    "rss_per_connection_kb": True,
+}
+
+# Settings the app requires at import time; the benchmark never talks to these services
+DUMMY_ENVIRONMENT = {
+    "OPENAI_API_KEY": "bench",
+    "ZILLIZ_AUTH_TOKEN": "bench",
+    "ZILLIZ_URL": "http://127.0.0.1:1",
+    "AZURE_OPENAI_ENDPOINT": "http://127.0.0.1:1",
+    "AZURE_OPENAI_API_KEY": "bench",
+    "AZURE_AI_SEARCH_ENDPOINT": "http://127.0.0.1:1",
+    "AZURE_AI_SEARCH_API_KEY": "bench",
+    "AZURE_MONGO_CONNECTION_STRING": "mongodb://127.0.0.1:1",
+    "AZURE_SPEECH_API_KEY": "bench",
+    "AZURE_SPEECH_ENDPOINT": "http://127.0.0.1:1",
+}
+
+BENCH_FAQS = [
+    "How do I apply for admission?",
+    "When is the deadline to register for classes?",
+    "Where can I find my financial aid status?",
+    "How do I request an official transcript?",
+    "What dining options are on campus?",
+    "How do I get a parking permit?",
+    "Where is the academic advising office?",
+    "How do I reset my student account password?",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def read_rss_kb(pid: int) -> int:
+    """Resident set size of a process in kB (Linux /proc; returns 0 elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+# --- Server side (child process) ---
+
+async def build_provider(args, rest_client):
+    """Builds a ZillizProvider whose chains run against local fakes instead of OpenAI and Zilliz."""
+    from app.config import settings
+    from app.providers import ZillizProvider
+    from app.chains import retrieval_chain_zilliz, translation_chain_openai_api
+    from app.chains import initialize_retrieval_chain_zilliz, initialize_translation_chain_openai_api, initialize_ingest_chain
+    from app.chains.vector_store_local import LocalVectorStore
+    from app.chains.lexical_index import LexicalIndex
+    from benchmarks.fakes import FakeStreamingChatModel, FakeEmbeddings, FakeOpenAIClient, WORDS
+    from langchain_core.documents import Document
+
+    settings.ANSWER_CACHE_ENABLED = args.answer_cache
+    settings.STREAM_COALESCING_ENABLED = args.coalescing
+
+    def fake_llm(**kwargs):
+        return FakeStreamingChatModel(
+            ttft=args.ttft_ms / 1000.0,
+            tokens_per_second=args.tokens_per_second,
+            response_tokens=args.response_tokens,
+        )
+
+    def fake_user_queries_store(embedding_function, collection_name, **kwargs):
+        return LocalVectorStore(embedding_function=embedding_function, collection_name=collection_name)
+
+    retrieval_chain_zilliz.ChatOpenAI = fake_llm
+    retrieval_chain_zilliz.Zilliz = fake_user_queries_store
+    translation_chain_openai_api.ChatOpenAI = fake_llm
+
+    embeddings = FakeEmbeddings(dim=args.embedding_dim, latency=args.embed_latency_ms / 1000.0)
+    vector_store = LocalVectorStore(embedding_function=embeddings, collection_name="bench")
+    docs = []
+    for index in range(args.corpus_size):
+        words = [WORDS[(index * 7 + offset) % len(WORDS)] for offset in range(args.chunk_words)]
+        docs.append(Document(page_content=f"Chunk {index}: " + " ".join(words), metadata={"name": f"doc-{index // 10}"}))
+    ids = vector_store.add_documents(docs)
+    lexical_index = LexicalIndex()
+    lexical_index.add_documents(docs, ids)
+
+    provider = ZillizProvider(rest_client)
+    provider.client = FakeOpenAIClient(embeddings)
+    provider.lexical_index = lexical_index
+    provider.retrieval_chain = await initialize_retrieval_chain_zilliz(vector_store, embeddings, lexical_index)
+    provider.ingest_chain = await initialize_ingest_chain(vector_store, lexical_index=lexical_index)
+    provider.translation_chain = await initialize_translation_chain_openai_api()
+    provider.faq_translations.path = None  # keep the benchmark from writing into .cache/
+    return provider
+
+
+def serve(args):
+    """Child process entry point: fake Zilliz REST server in a thread, the app in the main thread."""
+    import uvicorn
+    from app.config import settings
+    from benchmarks.fakes import create_fake_zilliz_app
+
+    zilliz_app = create_fake_zilliz_app(BENCH_FAQS, latency=args.zilliz_latency_ms / 1000.0)
+    zilliz_server = uvicorn.Server(uvicorn.Config(zilliz_app, host="127.0.0.1", port=args.zilliz_port, log_level="warning"))
+    threading.Thread(target=zilliz_server.run, daemon=True).start()
+    settings.ZILLIZ_URL = f"http://127.0.0.1:{args.zilliz_port}"
+
+    import app.main as app_main
+    # The per-IP API rate limit would otherwise reject most benchmark requests
+    settings.RATE_LIMIT_ENABLED = False
+
+    @asynccontextmanager
+    async def bench_lifespan(app):
+        from app.utils.zilliz_client import ZillizRestClient
+        rest_client = ZillizRestClient.from_settings()
+        app.state.zilliz_provider = await build_provider(args, rest_client)
+        yield
+        await rest_client.aclose()
+
+    app_main.app.router.lifespan_context = bench_lifespan
+    uvicorn.run(app_main.app, host="127.0.0.1", port=args.port, log_level="warning", backlog=4096)
+
+
+# --- Load driver (parent process) ---
+
+class Sample:
+    __slots__ = ("ttft", "latency", "events", "ok")
+
+    def __init__(self, ttft: Optional[float], latency: float, events: int, ok: bool):
+        self.ttft = ttft
+        self.latency = latency
+        self.events = events
+        self.ok = ok
+
+
+async def stream_request(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> Sample:
+    """Sends one request and times the first body chunk (TTFT) and the complete response."""
+    started = time.perf_counter()
+    ttft = None
+    events = 0
+    try:
+        async with client.stream(method, url, **kwargs) as response:
+            async for chunk in response.aiter_bytes():
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                events += chunk.count(b"data:")
+            ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    return Sample(ttft, time.perf_counter() - started, events, ok)
+
+
+def scenario_request(name: str, index: int, args) -> Callable[[httpx.AsyncClient], "asyncio.Future"]:
+    query_index = index % args.distinct_queries if args.distinct_queries else index
+    query = f"What are the admission requirements for program {query_index}?"
+    if name == "qa_stream":
+        return lambda client: stream_request(client, "POST", "/wsu/api/qa/stream", json={"userMessage": query, "framing": args.framing})
+    if name == "faqs":
+        return lambda client: stream_request(client, "GET", "/wsu/api/faqs")
+    if name == "faqs_translate":
+        return lambda client: stream_request(client, "GET", "/wsu/api/faqs/translate", params={"lang": "es"})
+    return lambda client: stream_request(client, "GET", "/wsu/api/data_search", params={"query": query})
+
+
+async def run_scenario(name: str, base_url: str, server_pid: int, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    samples: List[Sample] = []
+    next_index = 0
+    rss_before = read_rss_kb(server_pid)
+    rss_peak = rss_before
+    sampling = True
+
+    async def sample_rss():
+        nonlocal rss_peak
+        while sampling:
+            rss_peak = max(rss_peak, read_rss_kb(server_pid))
+            await asyncio.sleep(0.02)
+
+    async def worker(client):
+        nonlocal next_index
+        while next_index < args.requests:
+            index = next_index
+            next_index += 1
+            samples.append(await scenario_request(name, index, args)(client))
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        # Warm up connections and any lazily initialized state outside the measurement
+        await asyncio.gather(*(scenario_request(name, -1 - i, args)(client) for i in range(min(args.concurrency, 4))))
+        sampler = asyncio.create_task(sample_rss())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        sampling = False
+        await sampler
+
+    ok = [s for s in samples if s.ok]
+    ttfts = [s.ttft * 1000 for s in ok if s.ttft is not None]
+    latencies = [s.latency * 1000 for s in ok]
+    result = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "rss_before_kb": rss_before,
+        "rss_peak_kb": rss_peak,
+        "rss_per_connection_kb": round((rss_peak - rss_before) / args.concurrency, 1),
+    }
+    for q in (50, 95, 99):
+        result[f"ttft_p{q}_ms"] = round(percentile(ttfts, q), 2) if ttfts else None
+        result[f"latency_p{q}_ms"] = round(percentile(latencies, q), 2) if latencies else None
+    if name == "qa_stream":
+        result["sse_events_per_response"] = round(sum(s.events for s in ok) / len(ok), 1) if ok else 0
+    return result
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Benchmark server exited during startup")
+        try:
+            if httpx.get(f"{base_url}/metrics", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Benchmark server did not become ready")
+
+
+def start_server(args) -> subprocess.Popen:
+    env = {**DUMMY_ENVIRONMENT, **os.environ}
+    command = [sys.executable, "-m", "benchmarks.qa_stream", "--serve", "--port", str(args.port), "--zilliz-port", str(args.zilliz_port)]
+    command += forwarded_server_args(args)
+    return subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def forwarded_server_args(args) -> List[str]:
+    forwarded = [
+        "--ttft-ms", str(args.ttft_ms),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--response-tokens", str(args.response_tokens),
+        "--embed-latency-ms", str(args.embed_latency_ms),
+        "--zilliz-latency-ms", str(args.zilliz_latency_ms),
+        "--corpus-size", str(args.corpus_size),
+        "--chunk-words", str(args.chunk_words),
+        "--embedding-dim", str(args.embedding_dim),
+    ]
+    forwarded.append("--answer-cache" if args.answer_cache else "--no-answer-cache")
+    forwarded.append("--coalescing" if args.coalescing else "--no-coalescing")
+    return forwarded
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Prints a comparison table and returns the list of regressions."""
+    regressions = []
+    print(f"\n{'scenario':<16}{'metric':<24}{'baseline':>12}{'current':>12}{'change':>10}")
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        for metric, lower_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if old in (None, 0) or new is None:
+                continue
+            change = (new - old) / abs(old) * 100.0
+            worse = change > threshold if lower_is_better else change < -threshold
+            flag = "  REGRESSION" if worse else ""
+            print(f"{scenario:<16}{metric:<24}{old:>12}{new:>12}{change:>+9.1f}%{flag}")
+            if worse:
+                regressions.append(f"{scenario}.{metric}: {old} -> {new} ({change:+.1f}%)")
+    return regressions
+
+
+async def drive(args) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    process = start_server(args)
+    try:
+        await asyncio.to_thread(wait_until_ready, base_url, process)
+        results = {
+            "config": {key: value for key, value in vars(args).items() if key not in ("save_baseline", "compare", "serve", "port", "zilliz_port")},
+            "python": platform.python_version(),
+            "timestamp": int(time.time()),
+            "scenarios": {},
+        }
+        for name in args.scenarios:
+            results["scenarios"][name] = await run_scenario(name, base_url, process.pid, args)
+            print(f"{name}: {json.dumps(results['scenarios'][name])}")
+        return results
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=256, help="Requests per scenario")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--distinct-queries", type=int, default=0, help="Cycle through N questions (0 = every question unique)")
+    parser.add_argument("--framing", choices=("text", "json"), default="json", help="SSE framing requested from /qa/stream")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Fake LLM time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Fake LLM token rate")
+    parser.add_argument("--response-tokens", type=int, default=120, help="Tokens per fake answer")
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--zilliz-latency-ms", type=float, default=15.0)
+    parser.add_argument("--corpus-size", type=int, default=2000, help="Chunks in the fake document index")
+    parser.add_argument("--chunk-words", type=int, default=120)
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--answer-cache", action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument("--coalescing", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent for --compare")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="Compare the results against a baseline JSON file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--zilliz-port", type=int, default=0, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve:
+        serve(args)
+        return
+    args.port = args.port or free_port()
+    args.zilliz_port = args.zilliz_port or free_port()
+
+    results = asyncio.run(drive(args))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions beyond the threshold.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@
   // Constants and state variables
   const MAX_RECORDING_TIME = 10000; // 10 seconds
   const COOLDOWN_TIME = 5000; // 5 seconds cooldown
-  const NEWLINE_PLACEHOLDER = "__NEWLINE__"; // Defined in IIFE scope
   let isRecording = false;
   let isFirstOpen = true;
   let mediaStream;
@@ -413,7 +412,7 @@
         'Content-Type': 'application/json',
         'Accept': 'text/event-stream'
       },
-      body: JSON.stringify({ userMessage: message }),
+      body: JSON.stringify({ userMessage: message, framing: 'json' }), // JSON frames carry raw newlines
     });
 
     const reader = response.body.getReader();
@@ -427,8 +426,8 @@
     let sseBuffer = ''; 
     let fullTextMessageContent = ''; // Accumulates all text for final markdown parsing
     let chunkBuffer = "";
-    const TOKENS_PER_CHUNK = 40;     // tweak to taste
-    let tokenCount = 0;              // reset every flush
+    // Counted in characters, not frames: a frame holds however many tokens the server coalesced
+    const CHARS_PER_CHUNK = 160;     // ~40 tokens of English text, tweak to taste
     let currentP = null;
 
     function renderMarkdownChunk(isHardBreak = false) {
@@ -446,7 +445,7 @@
       currentP = null;             // next text starts a fresh <p>
       } 
       else {
-        // mid‑paragraph flush (40 tokens) → inline parse
+        // mid‑paragraph flush (~40 tokens) → inline parse
         if (!currentP) {
           currentP = document.createElement("p");
           botTextDiv.appendChild(currentP);
@@ -485,27 +484,28 @@
 
       for (const sseMessage of sseMessages) {
         if (!sseMessage.startsWith('data: ')) continue;
-        let token = sseMessage.slice(6); 
-        
-        if (token === 'end-of-stream') {
+        const frame = JSON.parse(sseMessage.slice(6)); // {"t": text} or {"done": true}
+
+        if (frame.done) {
           continue; 
         }
-        
-        fullTextMessageContent += (token === NEWLINE_PLACEHOLDER) ? "\n" : token;
-        
-        if (token === NEWLINE_PLACEHOLDER) {
-          renderMarkdownChunk(true);             // flush & animate this block
-          tokenCount = 0
-          } 
-        else {
-          chunkBuffer += token;              // keep accumulating
-          ++tokenCount
-
-          if (tokenCount >= TOKENS_PER_CHUNK) {
-            renderMarkdownChunk(false);
-            tokenCount = 0;                     // start a fresh buffer
+
+        const text = frame.t || "";
+        fullTextMessageContent += text;
+
+        // A frame holds every token produced in the server's flush window, newlines included
+        const segments = text.split("\n");
+        segments.forEach((segment, index) => {
+          if (index > 0) {
+            renderMarkdownChunk(true);             // flush & animate this block
           }
-        }
+          if (!segment) return;
+          chunkBuffer += segment;              // keep accumulating
+
+          if (chunkBuffer.length >= CHARS_PER_CHUNK) {
+            renderMarkdownChunk(false);         // also starts a fresh buffer
+          }
+        });
       }
     }
 